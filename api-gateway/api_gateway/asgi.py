@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_gateway.settings')
 
 application = get_asgi_application()
+
+if settings.GATEWAY_PROXY_MODE == 'asgi':
+    # El cuerpo de las peticiones al proxy se reenvía en streaming (ver api_gateway.streaming)
+    from api_gateway.autenticacion import lista_revocacion
+    from api_gateway.streaming import ProxyASGIHandler
+
+    application = ProxyASGIHandler()
+    # El proxy asíncrono no carga la lista en la petición: se carga ya en su hilo
+    lista_revocacion.precargar()
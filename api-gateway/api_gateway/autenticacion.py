@@ -0,0 +1,83 @@
+"""
+Autenticación en el gateway.
+
+Si la petición trae ``Authorization: Bearer <jwt>``, el gateway valida el
+token (firma, expiración, tipo ``access`` y revocación) antes de reenviarla.
+Un token inválido se responde con 401 sin llegar a ningún servicio; uno válido
+se reenvía junto con la cabecera ``X-Identidad`` firmada (ver ``compartido.identidad``),
+con la que los servicios autentican sin volver a validar el JWT. Los tokens ya
+validados se guardan en un LRU hasta que expiran. Si todavía no se ha podido
+cargar la lista de revocados, los tokens se rechazan con 503. El proxy
+asíncrono llama con ``cargar=False``: la lista solo se consulta en memoria y
+nunca se pide a usuarios desde el bucle de eventos.
+"""
+import jwt
+from django.conf import settings
+from django.http import JsonResponse
+
+from compartido import identidad
+from compartido.jwt_local import CacheTokens, ListaRevocacion, RevocacionNoDisponible
+
+from .upstream import get_upstream
+
+
+def _revocaciones(desde=None):
+    response = get_upstream('usuarios').request(
+        'GET', 'api/auth/revocados/',
+        params={'desde': desde} if desde else None,
+        headers={'X-Servicio-Token': settings.TOKEN_SERVICIOS_INTERNOS},
+    )
+    response.raise_for_status()
+    datos = response.json()
+    return [(r['jti'], r['expira']) for r in datos['revocados']], datos['hasta']
+
+
+cache_tokens = CacheTokens()
+lista_revocacion = ListaRevocacion(_revocaciones)
+
+
+def _no_autorizado(mensaje):
+    return JsonResponse({'detail': mensaje, 'code': 'token_not_valid'}, status=401)
+
+
+def _validar(raw_token):
+    claims = cache_tokens.obtener(raw_token)
+    if claims is None:
+        config = settings.GATEWAY_JWT
+        claims = jwt.decode(
+            raw_token,
+            config['SIGNING_KEY'],
+            algorithms=[config['ALGORITHM']],
+            options={'require': ['exp', 'user_id']},
+        )
+        if claims.get('token_type') != 'access':
+            raise jwt.InvalidTokenError('No es un access token')
+        cache_tokens.guardar(raw_token, claims)
+    return claims
+
+
+def autenticar(request, cargar=True):
+    """
+    Devuelve ``(cabeceras, None)`` con las cabeceras a añadir a la petición
+    reenviada, o ``(None, respuesta)`` si hay que rechazarla. Con
+    ``cargar=False`` no se hace ninguna llamada de red (ver ``ListaRevocacion.revocado``).
+    """
+    tipo, _, valor = request.headers.get('Authorization', '').partition(' ')
+    if tipo != 'Bearer':
+        # Sin token (o con otro esquema): la petición sigue sin identidad
+        return {}, None
+    try:
+        claims = _validar(valor.strip().encode())
+    except jwt.PyJWTError:
+        return None, _no_autorizado('Token inválido o expirado')
+    try:
+        revocado = lista_revocacion.revocado(claims.get('jti'), cargar=cargar)
+    except RevocacionNoDisponible as exc:
+        return None, JsonResponse({'detail': exc.detail, 'code': exc.default_code}, status=exc.status_code)
+    if revocado:
+        return None, _no_autorizado('Token revocado')
+    return {
+        identidad.CABECERA: identidad.firmar(
+            claims['user_id'], claims.get('username', ''), claims['exp'], claims.get('jti'),
+        )
+    }, None
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import path
+
+from api_gateway import upstream
+from api_gateway.streaming import proxy_view_async
+from api_gateway.urls import proxy_view
+
+
+class UrlsSync:
+    urlpatterns = [path('api/<str:service>/<path:path>', proxy_view)]
+
+
+class UrlsAsgi:
+    urlpatterns = [path('api/<str:service>/<path:path>', proxy_view_async)]
+
+
+class UpstreamFalso:
+    """Servidor HTTP/1.1 keep-alive mínimo que responde JSON tras una latencia fija."""
+
+    def __init__(self, latencia, tamano):
+        self.latencia = latencia
+        fila = {'id': 1, 'codigo_vuelo': 'IB1234', 'precio_base': '99.90'}
+        self.cuerpo = json.dumps([fila] * tamano).encode()
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+        self.loop = asyncio.new_event_loop()
+        self.puerto = None
+
+    async def _atender(self, reader, writer):
+        try:
+            while True:
+                cabeceras = await reader.readuntil(b'\r\n\r\n')
+                largo = 0
+                for linea in cabeceras.split(b'\r\n'):
+                    if linea.lower().startswith(b'content-length:'):
+                        largo = int(linea.split(b':', 1)[1])
+                if largo:
+                    await reader.readexactly(largo)
+
+                self.en_vuelo += 1
+                self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+                await asyncio.sleep(self.latencia)
+                self.en_vuelo -= 1
+
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: ' + str(len(self.cuerpo)).encode() + b'\r\n\r\n' + self.cuerpo
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def iniciar(self):
+        listo = threading.Event()
+
+        async def arrancar():
+            servidor = await asyncio.start_server(self._atender, '127.0.0.1', 0, backlog=4096)
+            self.puerto = servidor.sockets[0].getsockname()[1]
+            listo.set()
+
+        def correr():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(arrancar())
+            self.loop.run_forever()
+
+        threading.Thread(target=correr, daemon=True).start()
+        listo.wait()
+
+
+def resumen(modo, latencias, duracion, upstream_falso):
+    latencias.sort()
+    p = lambda q: latencias[min(len(latencias) - 1, int(q * len(latencias)))] * 1000
+    return (
+        f"{modo:<6} {len(latencias) / duracion:>9.1f} req/s  "
+        f"p50={p(0.50):7.1f}ms  p99={p(0.99):7.1f}ms  "
+        f"media={statistics.fmean(latencias) * 1000:7.1f}ms  "
+        f"max en vuelo upstream={upstream_falso.max_en_vuelo}"
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compara el proxy síncrono (WSGI) con el proxy en streaming (ASGI) contra un upstream simulado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=2000)
+        parser.add_argument('--hilos', type=int, default=32,
+                            help='Hilos de worker para el modo sync')
+        parser.add_argument('--concurrencia', type=int, default=1000,
+                            help='Peticiones simultáneas en vuelo para el modo asgi')
+        parser.add_argument('--latencia-ms', type=float, default=50)
+        parser.add_argument('--filas', type=int, default=50,
+                            help='Tamaño de la respuesta JSON del upstream')
+
+    def handle(self, *args, **options):
+        upstream_falso = UpstreamFalso(options['latencia_ms'] / 1000, options['filas'])
+        upstream_falso.iniciar()
+
+        upstreams = {
+            nombre: dict(config) for nombre, config in settings.GATEWAY_UPSTREAMS.items()
+        }
+        upstreams['vuelos'].update(
+            URL=f'http://127.0.0.1:{upstream_falso.puerto}',
+            POOL_SIZE=options['hilos'],
+            ASYNC_MAX_CONNECTIONS=options['concurrencia'],
+        )
+        ruta = '/api/vuelos/api/vuelos/?origen=MAD&destino=BCN'
+        n = options['peticiones']
+
+        self.stdout.write(
+            f"{n} peticiones, latencia upstream {options['latencia_ms']}ms, "
+            f"{options['filas']} filas por respuesta\n"
+        )
+
+        for modo in ('sync', 'asgi'):
+            upstream._upstreams.clear()
+            upstream_falso.max_en_vuelo = 0
+            if modo == 'sync':
+                ajustes = {'ROOT_URLCONF': UrlsSync}
+            else:
+                ajustes = {'ROOT_URLCONF': UrlsAsgi, 'MIDDLEWARE': settings.GATEWAY_ASGI_MIDDLEWARE}
+            with override_settings(GATEWAY_UPSTREAMS=upstreams, ALLOWED_HOSTS=['*'], **ajustes):
+                if modo == 'sync':
+                    latencias, duracion = self._medir_sync(ruta, n, options['hilos'])
+                else:
+                    latencias, duracion = asyncio.run(self._medir_asgi(ruta, n, options['concurrencia']))
+            self.stdout.write(resumen(modo, latencias, duracion, upstream_falso))
+
+    def _medir_sync(self, ruta, n, hilos):
+        local = threading.local()
+
+        def una(_):
+            client = getattr(local, 'client', None) or Client()
+            local.client = client
+            inicio = time.perf_counter()
+            response = client.get(ruta)
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            latencias = list(pool.map(una, range(n)))
+        return latencias, time.perf_counter() - inicio
+
+    async def _medir_asgi(self, ruta, n, concurrencia):
+        client = AsyncClient()
+        semaforo = asyncio.Semaphore(concurrencia)
+
+        async def una():
+            async with semaforo:
+                inicio = time.perf_counter()
+                response = await client.get(ruta)
+                assert response.status_code == 200, response.content
+                b''.join([chunk async for chunk in response.streaming_content])
+                return time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        latencias = await asyncio.gather(*(una() for _ in range(n)))
+        duracion = time.perf_counter() - inicio
+        await upstream.get_upstream('vuelos').aclose()
+        return list(latencias), duracion
@@ -0,0 +1,134 @@
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Tramos más cortos que esto (en segundos) no se muestran
+MINIMO = 0.00005
+
+
+def leer_spans(rutas):
+    trazas = defaultdict(dict)
+    for ruta in rutas:
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                for linea in f:
+                    if not linea.strip():
+                        continue
+                    span = json.loads(linea)
+                    span['fin'] = span['inicio'] + span['duracion_ms'] / 1000
+                    trazas[span['trace_id']][span['span_id']] = span
+        except OSError as e:
+            raise CommandError(f'No se puede leer {ruta}: {e}')
+    return trazas
+
+
+def ruta_critica(span, hijos, hasta=None):
+    """
+    Tramos ``(span, segundos)`` de la ruta crítica de ``span`` en orden
+    cronológico. Se recorre desde el final hacia atrás: en cada punto manda el
+    hijo que termina más tarde; el tiempo sin ningún hijo activo es propio del
+    span. Los relojes de procesos distintos pueden no coincidir del todo, así
+    que cada hijo se recorta a los límites de su padre.
+    """
+    cursor = span['fin'] if hasta is None else min(span['fin'], hasta)
+    tramos = []
+    for hijo in sorted(hijos.get(span['span_id'], ()), key=lambda h: h['fin'], reverse=True):
+        if hijo['inicio'] >= cursor:
+            continue
+        fin_hijo = min(hijo['fin'], cursor)
+        tramos.append((span, cursor - fin_hijo))
+        tramos.extend(reversed(ruta_critica(hijo, hijos, fin_hijo)))
+        cursor = max(hijo['inicio'], span['inicio'])
+        if cursor <= span['inicio']:
+            break
+    tramos.append((span, cursor - span['inicio']))
+
+    # Tramos consecutivos del mismo span se juntan
+    resultado = []
+    for span_, segundos in reversed(tramos):
+        if resultado and resultado[-1][0] is span_:
+            resultado[-1] = (span_, resultado[-1][1] + segundos)
+        else:
+            resultado.append((span_, segundos))
+    return [(span_, segundos) for span_, segundos in resultado if segundos > MINIMO]
+
+
+def raices(spans):
+    """Spans sin padre conocido: normalmente uno, el del gateway."""
+    return sorted(
+        (span for span in spans.values() if span['padre'] not in spans),
+        key=lambda span: span['inicio'],
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye las trazas a partir de los ficheros JSONL de spans (TRAZAS_ARCHIVO) '
+        'del gateway y de los servicios, muestra la ruta crítica de las peticiones más '
+        'lentas y agrega el tiempo propio en ruta crítica por servicio y operación.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('ficheros', nargs='+')
+        parser.add_argument('--top', type=int, default=10, help='Peticiones más lentas a detallar')
+        parser.add_argument('--traza', help='Detalla solo esta traza (trace_id)')
+        parser.add_argument('--min-ms', type=float, default=0, help='Ignora peticiones más rápidas')
+
+    def handle(self, *args, **options):
+        trazas = leer_spans(options['ficheros'])
+        if options['traza']:
+            if options['traza'] not in trazas:
+                raise CommandError(f"La traza {options['traza']} no está en los ficheros")
+            trazas = {options['traza']: trazas[options['traza']]}
+
+        peticiones = []
+        for spans in trazas.values():
+            hijos = defaultdict(list)
+            for span in spans.values():
+                if span['padre'] in spans:
+                    hijos[span['padre']].append(span)
+            for raiz in raices(spans):
+                if raiz['duracion_ms'] >= options['min_ms']:
+                    peticiones.append((raiz, ruta_critica(raiz, hijos)))
+        if not peticiones:
+            self.stdout.write('No hay spans que analizar')
+            return
+
+        peticiones.sort(key=lambda peticion: peticion[0]['duracion_ms'], reverse=True)
+        for raiz, tramos in peticiones[:options['top']]:
+            self._detalle(raiz, tramos)
+        self._puntos_calientes(peticiones)
+
+    def _detalle(self, raiz, tramos):
+        total = raiz['duracion_ms']
+        self.stdout.write(
+            f"\n== {raiz['trace_id']}  {raiz['servicio']} {raiz['nombre']}  {total:.1f} ms"
+        )
+        for span, segundos in tramos:
+            ms = segundos * 1000
+            status = span['atributos'].get('status', '')
+            self.stdout.write(
+                f"  {ms:9.2f} ms {ms / total * 100 if total else 0:5.1f}%  "
+                f"{span['servicio']:<9} {span['nombre']} {status}".rstrip()
+            )
+
+    def _puntos_calientes(self, peticiones):
+        acumulado = defaultdict(float)
+        apariciones = defaultdict(int)
+        total = 0.0
+        for _, tramos in peticiones:
+            for span, segundos in tramos:
+                clave = (span['servicio'], span['nombre'])
+                acumulado[clave] += segundos * 1000
+                apariciones[clave] += 1
+                total += segundos * 1000
+
+        self.stdout.write(
+            f'\n== Tiempo propio en ruta crítica ({len(peticiones)} peticiones, {total:.1f} ms)'
+        )
+        for (servicio, nombre), ms in sorted(acumulado.items(), key=lambda item: item[1], reverse=True)[:20]:
+            self.stdout.write(
+                f'  {ms:10.1f} ms {ms / total * 100:5.1f}%  {apariciones[(servicio, nombre)]:6d}x  '
+                f'{servicio:<9} {nombre}'
+            )
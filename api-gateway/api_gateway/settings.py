@@ -3,7 +3,10 @@ Django settings for api_gateway project.
 ...
 """
 
+import os
 from pathlib import Path
+
+from compartido.basedatos import configuracion
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +28,7 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
+    'api_gateway',
     'corsheaders',
     'rest_framework',
     'django.contrib.admin',
@@ -36,7 +40,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'compartido.trazas.TrazasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'compartido.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,6 +52,23 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Middleware del modo 'asgi' (sustituye a MIDDLEWARE, ver más abajo). Cada
+# middleware basado en MiddlewareMixin que no es asíncrono obliga a saltar a un
+# hilo y volver en cada petición, lo que anula la ventaja del proxy en
+# streaming. Solo se quitan los que no hacen nada en este gateway:
+# - Sessions, Auth y Messages: solo los usaría el admin, que no tiene ruta; la
+#   autenticación del proxy es la del JWT (ver api_gateway.autenticacion).
+# - Security: no hay ningún ajuste SECURE_* activo; HTTPS y HSTS, si los hay,
+#   los pone el servidor web que está delante.
+# - Common: APPEND_SLASH no aplica a rutas del proxy, que se reenvían tal cual.
+# - XFrameOptions: las respuestas son JSON, no páginas que se puedan enmarcar.
+# CORS, trazas y métricas sí hacen falta, y los tres admiten ASGI sin cambiar de hilo.
+GATEWAY_ASGI_MIDDLEWARE = [
+    'compartido.trazas.TrazasMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'compartido.metricas.MetricasMiddleware',
+]
+
 # Configuración de CORS más segura
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOW_CREDENTIALS = True 
@@ -80,14 +103,60 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
-REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+# El gateway valida los JWT antes de reenviar (ver api_gateway.autenticacion).
+# Clave y algoritmo deben coincidir con SIMPLE_JWT del servicio de usuarios.
+GATEWAY_JWT = {
+    'SIGNING_KEY': 'ClaveSuperSecreta123',
+    'ALGORITHM': 'HS256',
 }
+JWT_CACHE_MAX_ENTRADAS = 10000
+REVOCACION_REFRESCO_SEGUNDOS = 30
+
+# Firma de la cabecera X-Identidad que reciben los servicios (ver
+# compartido.identidad). Debe coincidir con IDENTIDAD_CLAVE de cada servicio.
+IDENTIDAD_CLAVE = os.environ.get('IDENTIDAD_CLAVE', 'ClaveIdentidadGateway123')
+
+# Para leer la lista de tokens revocados del servicio de usuarios
+TOKEN_SERVICIOS_INTERNOS = 'TokenServiciosInternos123'
 
 ROOT_URLCONF = 'api_gateway.urls'
 
+# Modo del proxy: 'sync' (WSGI, decodifica y re-serializa JSON) o 'asgi'
+# (streaming sin parsear; requiere servidor ASGI, p. ej. uvicorn)
+GATEWAY_PROXY_MODE = os.environ.get('GATEWAY_PROXY_MODE', 'sync')
+
+if GATEWAY_PROXY_MODE == 'asgi':
+    MIDDLEWARE = GATEWAY_ASGI_MIDDLEWARE
+
+# Servicios detrás del gateway. Cada uno mantiene su propio pool de conexiones
+# keep-alive: POOL_SIZE conexiones como máximo; si todas están ocupadas la
+# petición espera hasta POOL_TIMEOUT segundos antes de responder 503.
+# ASYNC_MAX_CONNECTIONS limita las conexiones simultáneas en modo 'asgi'.
+GATEWAY_UPSTREAMS = {
+    'usuarios': {
+        'URL': 'http://localhost:8001',
+        'CONNECT_TIMEOUT': 3,
+        'READ_TIMEOUT': 10,
+        'POOL_SIZE': 20,
+        'POOL_TIMEOUT': 5,
+    },
+    'vuelos': {
+        'URL': 'http://localhost:8000',
+        'CONNECT_TIMEOUT': 3,
+        'READ_TIMEOUT': 10,
+        'POOL_SIZE': 50,
+        'POOL_TIMEOUT': 5,
+        'ASYNC_MAX_CONNECTIONS': 2000,
+    },
+    'reservas': {
+        'URL': 'http://localhost:8002',
+        'CONNECT_TIMEOUT': 3,
+        'READ_TIMEOUT': 10,
+        'POOL_SIZE': 20,
+        'POOL_TIMEOUT': 5,
+    },
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -109,11 +178,10 @@ WSGI_APPLICATION = 'api_gateway.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil elegido con DB_PERFIL: sqlite (WAL, por defecto) o postgres (con pool).
+# Ver compartido.basedatos
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion(BASE_DIR, 'gateway'),
 }
 
 
@@ -156,4 +224,15 @@ STATIC_URL = 'static/'
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Trazas distribuidas (ver compartido.trazas). El contexto (cabecera traceparent)
+# se propaga siempre; los spans solo se registran si hay ARCHIVO (JSONL) o
+# COLECTOR (URL que recibe lotes por POST). El gateway decide qué
+# peticiones se muestrean; los servicios respetan su decisión.
+TRAZAS = {
+    'SERVICIO': 'gateway',
+    'MUESTREO': float(os.environ.get('TRAZAS_MUESTREO', '0.1')),
+    'ARCHIVO': os.environ.get('TRAZAS_ARCHIVO'),
+    'COLECTOR': os.environ.get('TRAZAS_COLECTOR'),
+}
@@ -0,0 +1,183 @@
+"""
+Modo de proxy asíncrono (ASGI) del gateway.
+
+A diferencia de ``proxy_view``, no decodifica ni re-serializa nada: el cuerpo
+de la petición se reenvía tal cual en bloques y la respuesta del servicio se
+devuelve en streaming con su status, cabeceras y content-type originales.
+Requiere ejecutar el gateway con un servidor ASGI (``uvicorn api_gateway.asgi:application``).
+
+El ``ASGIHandler`` de Django lee el cuerpo entero a un fichero temporal antes
+de llamar a la vista. ``ProxyASGIHandler`` (la aplicación de ``asgi.py`` en
+este modo) no lo hace en las rutas del proxy: la vista lo va leyendo del canal
+``receive`` a medida que lo envía al servicio, tenga ``Content-Length`` o venga
+con ``Transfer-Encoding: chunked``.
+"""
+import asyncio
+import logging
+import time
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.core.exceptions import RequestAborted
+from django.core.handlers.asgi import ASGIHandler
+from django.http import JsonResponse, StreamingHttpResponse
+
+from compartido import identidad, trazas
+from compartido.metricas import llamadas_servicio
+
+from .autenticacion import autenticar
+from .upstream import get_upstream
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Rutas cuyo cuerpo se reenvía en streaming (ver urls.py)
+PREFIJO_PROXY = '/api/'
+# Clave del scope ASGI con el cuerpo sin leer de la petición
+CLAVE_CUERPO = 'gateway.cuerpo'
+
+# Cabeceras hop-by-hop (RFC 9110 §7.6.1) más Host, que no deben reenviarse
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade', 'host',
+}
+
+
+def _request_headers(request, extra):
+    # La identidad y el contexto de traza los pone el gateway: se descartan los del cliente
+    propias = {identidad.CABECERA.lower(), trazas.CABECERA}
+    return [
+        (key, value) for key, value in request.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() not in propias
+    ] + list(extra.items())
+
+
+class CuerpoEnStreaming:
+    """
+    Cuerpo de una petición leído del canal ``receive`` de ASGI.
+
+    A Django se le da un ``receive`` (``receive_django``) que entrega un cuerpo
+    vacío; después, la única llamada que hace es la que espera la desconexión
+    del cliente, y esa se pasa al canal real cuando el cuerpo ya se ha leído.
+    """
+
+    def __init__(self, receive):
+        self._receive = receive
+        self._entregado = False
+        self._leido = asyncio.Event()
+
+    async def receive_django(self):
+        if not self._entregado:
+            self._entregado = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self._leido.wait()
+        return await self._receive()
+
+    async def bloques(self):
+        try:
+            while True:
+                message = await self._receive()
+                if message['type'] == 'http.disconnect':
+                    raise RequestAborted()
+                if message.get('body'):
+                    yield message['body']
+                if not message.get('more_body', False):
+                    return
+        finally:
+            self._leido.set()
+
+
+class ProxyASGIHandler(ASGIHandler):
+    """
+    ``ASGIHandler`` que deja sin leer el cuerpo de las peticiones al proxy para
+    que ``proxy_view_async`` lo reenvíe en streaming. El resto de rutas se
+    atienden igual que con el handler de Django.
+    """
+
+    async def handle(self, scope, receive, send):
+        if not scope['path'].startswith(PREFIJO_PROXY):
+            return await super().handle(scope, receive, send)
+        cuerpo = CuerpoEnStreaming(receive)
+        await super().handle({**scope, CLAVE_CUERPO: cuerpo}, cuerpo.receive_django, send)
+
+
+def _tiene_cuerpo(request):
+    # Con Transfer-Encoding: chunked no hay Content-Length
+    return request.headers.get('Content-Length', '0') != '0' or 'Transfer-Encoding' in request.headers
+
+
+async def _request_body(request):
+    cuerpo = request.scope.get(CLAVE_CUERPO)
+    if cuerpo is not None:
+        async for chunk in cuerpo.bloques():
+            yield chunk
+        return
+    # Con el ASGIHandler de Django (p. ej. AsyncClient) el cuerpo ya está en un
+    # fichero temporal, que puede estar en disco: se lee fuera del event loop
+    leer = sync_to_async(request.read, thread_sensitive=False)
+    while chunk := await leer(CHUNK_SIZE):
+        yield chunk
+
+
+async def _response_body(upstream_response):
+    try:
+        async for chunk in upstream_response.content.iter_chunked(CHUNK_SIZE):
+            yield chunk
+    finally:
+        upstream_response.release()
+
+
+async def proxy_view_async(request, service, path):
+    upstream = get_upstream(service)
+    if upstream is None:
+        return JsonResponse({'error': f'Servicio desconocido: {service}'}, status=404)
+
+    # Sin llamadas bloqueantes en el bucle: la lista de revocados la carga su hilo
+    identidad_headers, rechazo = autenticar(request, cargar=False)
+    if rechazo is not None:
+        return rechazo
+
+    url = f"/{path}"
+    query_string = request.META.get('QUERY_STRING', '')
+    if query_string:
+        url = f"{url}?{query_string}"
+
+    has_body = _tiene_cuerpo(request)
+    inicio = time.perf_counter()
+    try:
+        # El span cubre hasta recibir las cabeceras de la respuesta
+        with trazas.span(f'proxy {service}', tipo='cliente', ruta=path) as span:
+            upstream_response = await upstream.async_client().request(
+                request.method,
+                url,
+                headers=_request_headers(request, {**identidad_headers, **trazas.cabeceras()}),
+                data=_request_body(request) if has_body else None,
+                allow_redirects=False,
+            )
+            if span is not None:
+                span.atributos['status'] = upstream_response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        llamadas_servicio.observar((service, request.method, 'error'), time.perf_counter() - inicio)
+        logger.error(f"Error during proxy request: {e}")
+        return JsonResponse({'error': f'Request failed: {e}'}, status=502)
+    # Hasta recibir las cabeceras: el cuerpo se reenvía en streaming después
+    llamadas_servicio.observar((service, request.method, upstream_response.status), time.perf_counter() - inicio)
+
+    response = StreamingHttpResponse(
+        _response_body(upstream_response),
+        status=upstream_response.status,
+    )
+    # StreamingHttpResponse trae su propio Content-Type por defecto
+    del response['Content-Type']
+    for key, value in upstream_response.headers.items():
+        lower = key.lower()
+        if lower in HOP_BY_HOP_HEADERS:
+            continue
+        if lower == 'set-cookie':
+            response.cookies.load(value)
+        elif key in response:
+            response[key] = f"{response[key]}, {value}"
+        else:
+            response[key] = value
+    return response
@@ -0,0 +1,396 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import jwt
+from django.conf import settings
+from django.http import JsonResponse
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from django.urls import path
+from requests.exceptions import ConnectionError
+
+from compartido import identidad, trazas
+
+from . import autenticacion, streaming, upstream
+
+
+def token_acceso(**claims):
+    """Access token firmado como los del servicio de usuarios."""
+    claims = {
+        'token_type': 'access', 'exp': int(time.time()) + 300, 'jti': uuid.uuid4().hex,
+        'user_id': '42', 'username': 'jperez', **claims,
+    }
+    return jwt.encode(claims, settings.GATEWAY_JWT['SIGNING_KEY'], algorithm=settings.GATEWAY_JWT['ALGORITHM'])
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _leer_cuerpo(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            partes = []
+            while True:
+                tamano = int(self.rfile.readline().split(b';')[0], 16)
+                if not tamano:
+                    self.rfile.readline()
+                    return b''.join(partes)
+                partes.append(self.rfile.read(tamano))
+                self.rfile.readline()
+        longitud = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(longitud) if longitud else b''
+
+    def _responder(self):
+        peticion = {
+            'metodo': self.command,
+            'ruta': self.path,
+            'cabeceras': {clave.lower(): valor for clave, valor in self.headers.items()},
+            'cuerpo': self._leer_cuerpo(),
+        }
+        self.server.peticiones.append(peticion)
+        status, datos, cabeceras = self.server.responder(peticion)
+        cuerpo = json.dumps(datos).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        for clave, valor in cabeceras.items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _responder
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorPrueba:
+    """Servicio HTTP real (keep-alive) en un puerto libre, que registra lo que recibe."""
+
+    def __init__(self):
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Manejador)
+        self.servidor.daemon_threads = True
+        self.servidor.peticiones = []
+        self.servidor.responder = self.responder
+        self.respuesta = (200, {'ok': True}, {})
+        self.hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self.hilo.start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.servidor.server_address[1]}'
+
+    @property
+    def peticiones(self):
+        return self.servidor.peticiones
+
+    def responder(self, peticion):
+        if peticion['ruta'].startswith('/api/auth/revocados/'):
+            return 200, {'revocados': [], 'hasta': 0}, {}
+        respuesta = self.respuesta
+        return respuesta(peticion) if callable(respuesta) else respuesta
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class GatewayTestCase(SimpleTestCase):
+    """Gateway con todos los servicios apuntando a un ``ServidorPrueba``."""
+    config_upstream = {}
+
+    def setUp(self):
+        self.servicio = ServidorPrueba()
+        self.addCleanup(self.servicio.parar)
+        config = {'URL': self.servicio.url, **self.config_upstream}
+        ajustes = override_settings(GATEWAY_UPSTREAMS={
+            nombre: config for nombre in ('usuarios', 'vuelos', 'reservas')
+        })
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        # Los Upstream se crean una vez por proceso: cada test parte de cero
+        upstream._upstreams.clear()
+        self.addCleanup(upstream._upstreams.clear)
+
+
+class MetricasGatewayTest(GatewayTestCase):
+    def test_metricas_de_peticiones_y_llamadas(self):
+        self.client.get('/health/')
+        self.assertEqual(self.client.get('/api/vuelos/api/vuelos/').status_code, 200)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = response.content.decode()
+        self.assertIn('http_peticion_segundos_count{metodo="GET",ruta="health/",status="200"}', texto)
+        self.assertIn(
+            'http_peticion_segundos_count{metodo="GET",ruta="api/<str:service>/<path:path>",status="200"}', texto,
+        )
+        self.assertIn('llamada_servicio_segundos_count{servicio="vuelos",metodo="GET",status="200"}', texto)
+
+
+class TrazasGatewayTest(GatewayTestCase):
+    def traceparent_reenviado(self, **cabeceras):
+        self.assertEqual(self.client.get('/api/vuelos/api/vuelos/', **cabeceras).status_code, 200)
+        recibidas = [valor for clave, valor in self.servicio.peticiones[-1]['cabeceras'].items()
+                     if clave == trazas.CABECERA]
+        self.assertEqual(len(recibidas), 1)
+        contexto = trazas.parsear(recibidas[0])
+        self.assertIsNotNone(contexto)
+        return recibidas[0], contexto
+
+    def test_sin_traceparent_el_gateway_abre_la_traza(self):
+        _, (trace_id, _, _) = self.traceparent_reenviado()
+        _, (otro_trace_id, _, _) = self.traceparent_reenviado()
+        self.assertNotEqual(trace_id, otro_trace_id)
+
+    def test_continua_la_traza_del_cliente_con_un_span_propio(self):
+        cliente = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+        valor, (trace_id, padre, muestreado) = self.traceparent_reenviado(HTTP_TRACEPARENT=cliente)
+        self.assertNotEqual(valor, cliente)
+        self.assertEqual(trace_id, '0af7651916cd43dd8448eb211c80319c')
+        self.assertNotEqual(padre, 'b7ad6b7169203331')
+        self.assertTrue(muestreado)
+
+    def test_traceparent_invalido_del_cliente_no_se_reenvia(self):
+        cliente = '00-00000000000000000000000000000000-b7ad6b7169203331-01'
+        valor, (trace_id, _, _) = self.traceparent_reenviado(HTTP_TRACEPARENT=cliente)
+        self.assertNotEqual(valor, cliente)
+        self.assertNotEqual(trace_id, '0' * 32)
+
+
+class RevocacionGatewayTest(GatewayTestCase):
+    def test_sin_lista_de_revocados_responde_503(self):
+        lista = autenticacion.lista_revocacion
+        cargar = mock.Mock(side_effect=ConnectionError('usuarios caído'))
+        parches = {'cargar': cargar, 'ultima_carga': None, '_ultimo_intento': None, '_arrancar': mock.DEFAULT}
+        with mock.patch.multiple(lista, **parches), self.assertLogs('compartido.jwt_local', 'WARNING'):
+            response = self.client.get(
+                '/api/reservas/api/reservas/', HTTP_AUTHORIZATION=f'Bearer {token_acceso()}',
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['code'], 'revocacion_no_disponible')
+        self.assertEqual(self.servicio.peticiones, [])
+
+    def test_proxy_asincrono_no_carga_la_lista_en_la_peticion(self):
+        lista = autenticacion.lista_revocacion
+        cargar = mock.Mock(return_value=([], 1.0))
+        request = mock.Mock(headers={'Authorization': f'Bearer {token_acceso()}'})
+        parches = {'cargar': cargar, 'ultima_carga': None, '_hilo': None, '_arrancar': mock.DEFAULT}
+        with mock.patch.multiple(lista, **parches) as mocks:
+            cabeceras, rechazo = autenticacion.autenticar(request, cargar=False)
+
+        self.assertIsNone(cabeceras)
+        self.assertEqual(rechazo.status_code, 503)
+        cargar.assert_not_called()
+        # La primera carga queda para el hilo de refresco
+        mocks['_arrancar'].assert_called_once_with()
+
+
+class AutenticacionGatewayTest(GatewayTestCase):
+    def proxy(self, **cabeceras):
+        return self.client.get('/api/reservas/api/reservas/', **cabeceras)
+
+    def peticiones_reenviadas(self):
+        return [p for p in self.servicio.peticiones if not p['ruta'].startswith('/api/auth/revocados/')]
+
+    def test_token_invalido_o_expirado_no_llega_al_servicio(self):
+        tokens = (
+            'no-es-un-jwt',
+            token_acceso(exp=int(time.time()) - 10),
+            token_acceso(token_type='refresh'),
+            token_acceso()[:-2] + 'xx',
+        )
+        for token in tokens:
+            response = self.proxy(HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(response.status_code, 401, token)
+            self.assertEqual(response.json()['code'], 'token_not_valid')
+        self.assertEqual(self.peticiones_reenviadas(), [])
+
+    def test_token_valido_reenvia_identidad_firmada(self):
+        response = self.proxy(HTTP_AUTHORIZATION=f'Bearer {token_acceso(jti="jti-1")}')
+
+        self.assertEqual(response.status_code, 200)
+        claims = identidad.verificar(self.peticiones_reenviadas()[-1]['cabeceras']['x-identidad'])
+        self.assertEqual((claims['user_id'], claims['username'], claims['jti']), (42, 'jperez', 'jti-1'))
+
+    def test_x_identidad_del_cliente_se_descarta(self):
+        # Aunque esté bien firmada: solo vale la que pone el gateway
+        falsa = identidad.firmar(1, 'admin', time.time() + 60, 'jti-falso')
+
+        self.assertEqual(self.proxy(HTTP_X_IDENTIDAD=falsa).status_code, 200)
+        self.assertNotIn('x-identidad', self.peticiones_reenviadas()[-1]['cabeceras'])
+
+        self.proxy(HTTP_X_IDENTIDAD=falsa, HTTP_AUTHORIZATION=f'Bearer {token_acceso()}')
+        claims = identidad.verificar(self.peticiones_reenviadas()[-1]['cabeceras']['x-identidad'])
+        self.assertEqual(claims['user_id'], 42)
+
+
+class PoolConexionesTest(GatewayTestCase):
+    config_upstream = {'POOL_SIZE': 1, 'POOL_TIMEOUT': 0.2}
+
+    def test_aciertos_y_fallos_del_pool(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/vuelos/api/vuelos/').status_code, 200)
+
+        # Una conexión TCP nueva y dos reutilizadas (keep-alive)
+        stats = self.client.get('/stats/').json()['pools']
+        self.assertEqual(stats['vuelos'], {'hits': 2, 'misses': 1, 'waits': 0})
+        self.assertNotIn('reservas', stats)
+
+    def test_pool_agotado_espera_y_responde_503(self):
+        liberar = threading.Event()
+        ocupado = threading.Event()
+
+        def lenta(peticion):
+            ocupado.set()
+            liberar.wait(5)
+            return 200, {'lenta': True}, {}
+
+        self.servicio.respuesta = lenta
+        respuestas = []
+        hilo = threading.Thread(target=lambda: respuestas.append(self.client.get('/api/vuelos/api/vuelos/')))
+        hilo.start()
+        self.addCleanup(hilo.join)
+        self.addCleanup(liberar.set)
+        self.assertTrue(ocupado.wait(5))
+
+        # La única conexión está ocupada: se espera POOL_TIMEOUT y se responde 503
+        with self.assertLogs('api_gateway.urls', 'WARNING'):
+            response = self.client.get('/api/vuelos/api/vuelos/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'error': 'Servicio saturado, intente de nuevo'})
+
+        liberar.set()
+        hilo.join()
+        self.assertEqual(respuestas[0].status_code, 200)
+        self.assertEqual(
+            self.client.get('/stats/').json()['pools']['vuelos'], {'hits': 0, 'misses': 1, 'waits': 1},
+        )
+
+    def test_stats_sin_trafico(self):
+        self.assertEqual(self.client.get('/stats/').json(), {'pools': {}})
+
+
+class UrlsAsgi:
+    urlpatterns = [
+        path('api/<str:service>/<path:path>', streaming.proxy_view_async),
+        path('health/', lambda r: JsonResponse({'status': 'ok'})),
+    ]
+
+
+@override_settings(ROOT_URLCONF=UrlsAsgi, MIDDLEWARE=settings.GATEWAY_ASGI_MIDDLEWARE)
+class ProxyAsincronoTest(GatewayTestCase):
+    async def asgi(self, metodo, ruta, cabeceras=(), bloques=()):
+        """
+        Una petición a ``ProxyASGIHandler`` con el cuerpo en ``bloques``, como
+        los entrega un servidor ASGI. Devuelve el status, las cabeceras y el cuerpo
+        de la respuesta, y cuántos mensajes se habían leído al entrar en la vista.
+        """
+        mensajes = asyncio.Queue()
+        for bloque in bloques:
+            mensajes.put_nowait({'type': 'http.request', 'body': bloque, 'more_body': True})
+        mensajes.put_nowait({'type': 'http.request', 'body': b'', 'more_body': False})
+        total = mensajes.qsize()
+        enviados = []
+
+        async def send(mensaje):
+            enviados.append(mensaje)
+
+        leidos_en_la_vista = []
+        autenticar = streaming.autenticar
+
+        def autenticar_y_contar(request, **kwargs):
+            leidos_en_la_vista.append(total - mensajes.qsize())
+            return autenticar(request, **kwargs)
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': metodo, 'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(),
+            'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+            'headers': [(b'host', b'testserver')] + [(k.lower().encode(), v.encode()) for k, v in cabeceras],
+        }
+        with mock.patch.object(streaming, 'autenticar', autenticar_y_contar):
+            # Tras el cuerpo, receive() espera como un cliente que sigue conectado
+            await streaming.ProxyASGIHandler()(scope, mensajes.get, send)
+        await upstream.get_upstream('vuelos').aclose()
+
+        inicio = enviados[0]
+        cabeceras_respuesta = {k.decode().lower(): v.decode() for k, v in inicio['headers']}
+        cuerpo = b''.join(m.get('body', b'') for m in enviados[1:])
+        return inicio['status'], cabeceras_respuesta, cuerpo, leidos_en_la_vista
+
+    async def test_subida_chunked_sin_content_length(self):
+        self.servicio.respuesta = (201, {'creado': True}, {'ETag': '"v1"'})
+        bloques = [b'{"asientos": ', b'2, "nombre": ', b'"Ana"}']
+
+        status, cabeceras, cuerpo, leidos = await self.asgi(
+            'POST', '/api/vuelos/api/vuelos/1/retener/',
+            cabeceras=[('Content-Type', 'application/json'), ('Transfer-Encoding', 'chunked')],
+            bloques=bloques,
+        )
+
+        self.assertEqual(status, 201)
+        self.assertEqual(json.loads(cuerpo), {'creado': True})
+        self.assertEqual(cabeceras['etag'], '"v1"')
+        recibida = self.servicio.peticiones[-1]
+        self.assertEqual(recibida['metodo'], 'POST')
+        self.assertEqual(recibida['cuerpo'], b''.join(bloques))
+        self.assertEqual(recibida['cabeceras']['content-type'], 'application/json')
+        # Django no ha leído el cuerpo antes de la vista: se lee del canal al reenviarlo
+        self.assertEqual(leidos, [0])
+
+    async def test_cuerpo_grande_con_content_length(self):
+        bloques = [bytes([i]) * 100_000 for i in range(3)]
+
+        status, _, _, leidos = await self.asgi(
+            'PUT', '/api/vuelos/api/vuelos/1/',
+            cabeceras=[('Content-Type', 'application/octet-stream'), ('Content-Length', '300000')],
+            bloques=bloques,
+        )
+
+        self.assertEqual(status, 200)
+        self.assertEqual(self.servicio.peticiones[-1]['cuerpo'], b''.join(bloques))
+        self.assertEqual(leidos, [0])
+
+    async def test_get_sin_cuerpo_y_cabeceras_propias_del_gateway(self):
+        status, _, cuerpo, _ = await self.asgi(
+            'GET', '/api/vuelos/api/vuelos/',
+            cabeceras=[
+                ('X-Identidad', identidad.firmar(1, 'admin', time.time() + 60, 'jti')),
+                ('Traceparent', '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'),
+            ],
+        )
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(cuerpo), {'ok': True})
+        recibida = self.servicio.peticiones[-1]
+        self.assertEqual(recibida['cuerpo'], b'')
+        self.assertNotIn('x-identidad', recibida['cabeceras'])
+        self.assertNotEqual(
+            recibida['cabeceras']['traceparent'], '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01',
+        )
+
+    async def test_rutas_fuera_del_proxy(self):
+        status, _, cuerpo, _ = await self.asgi('GET', '/health/')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(cuerpo), {'status': 'ok'})
+
+    async def test_servicio_caido_responde_502(self):
+        self.servicio.parar()
+        status, _, _, _ = await self.asgi('GET', '/api/vuelos/api/vuelos/')
+        self.assertEqual(status, 502)
+
+    async def test_cuerpo_ya_leido_por_el_handler_de_django(self):
+        # AsyncClient usa el handler de Django, que guarda antes el cuerpo entero
+        response = await AsyncClient().post(
+            '/api/vuelos/api/vuelos/1/retener/', {'asientos': 2}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        b''.join([chunk async for chunk in response.streaming_content])
+        await upstream.get_upstream('vuelos').aclose()
+        self.assertEqual(json.loads(self.servicio.peticiones[-1]['cuerpo']), {'asientos': 2})
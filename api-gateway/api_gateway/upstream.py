@@ -0,0 +1,165 @@
+"""
+Sesiones HTTP persistentes hacia los servicios que están detrás del gateway.
+
+Cada servicio (usuarios, vuelos, reservas) tiene su propia ``requests.Session``
+con un pool de conexiones keep-alive, de forma que las peticiones proxied
+reutilizan conexiones TCP en lugar de abrir una nueva por cada llamada.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from http.cookiejar import DefaultCookiePolicy
+
+import aiohttp
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+from compartido.metricas import llamadas_servicio
+
+
+class PoolStats:
+    """Contadores de uso del pool de un servicio (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0      # conexión viva reutilizada
+        self.misses = 0    # hubo que abrir una conexión TCP nueva
+        self.waits = 0     # el pool estaba agotado y la petición tuvo que esperar
+
+    def incr(self, campo):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'waits': self.waits}
+
+
+class _CountingPoolMixin:
+    stats = None
+    pool_timeout = None
+
+    def _get_conn(self, timeout=None):
+        if timeout is None:
+            timeout = self.pool_timeout
+        if self.block and self.pool is not None and self.pool.empty():
+            self.stats.incr('waits')
+
+        conn = super()._get_conn(timeout=timeout)
+
+        # Una conexión sin socket (nueva o descartada por caída) implica un connect()
+        if getattr(conn, 'sock', None) is None:
+            self.stats.incr('misses')
+        else:
+            self.stats.incr('hits')
+        return conn
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter cuyos pools de urllib3 registran hits, misses y esperas."""
+
+    def __init__(self, stats, pool_timeout=None, **kwargs):
+        self.stats = stats
+        self.pool_timeout = pool_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        extra = {'stats': self.stats, 'pool_timeout': self.pool_timeout}
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('CountingHTTPConnectionPool', (_CountingPoolMixin, HTTPConnectionPool), extra),
+            'https': type('CountingHTTPSConnectionPool', (_CountingPoolMixin, HTTPSConnectionPool), extra),
+        }
+
+
+class Upstream:
+    def __init__(self, nombre, config):
+        self.nombre = nombre
+        self.url = config['URL'].rstrip('/')
+        self.timeout = (config.get('CONNECT_TIMEOUT', 3), config.get('READ_TIMEOUT', 10))
+        self.pool_timeout = config.get('POOL_TIMEOUT', 5)
+        self.async_max_connections = config.get('ASYNC_MAX_CONNECTIONS', 1000)
+        self.stats = PoolStats()
+        # Un AsyncClient por event loop: sus conexiones no pueden cruzar loops
+        self._async_clients = weakref.WeakKeyDictionary()
+
+        pool_size = config.get('POOL_SIZE', 10)
+        adapter = PooledAdapter(
+            self.stats,
+            pool_timeout=self.pool_timeout,
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=config.get('POOL_BLOCK', True),
+            max_retries=0,
+        )
+
+        session = requests.Session()
+        # La sesión se comparte entre usuarios: no debe guardar cookies de nadie
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        # Evita leer proxies y .netrc del entorno en cada petición
+        session.trust_env = False
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        self.session = session
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        inicio = time.perf_counter()
+        status = 'error'
+        try:
+            response = self.session.request(method=method, url=f"{self.url}/{path}", **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            llamadas_servicio.observar((self.nombre, method, status), time.perf_counter() - inicio)
+
+    def async_client(self):
+        """Sesión aiohttp con pool keep-alive para el event loop actual."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            connect, read = self.timeout
+            client = aiohttp.ClientSession(
+                base_url=self.url,
+                connector=aiohttp.TCPConnector(limit=self.async_max_connections),
+                # 'connect' incluye la espera por una conexión libre del pool
+                timeout=aiohttp.ClientTimeout(
+                    connect=self.pool_timeout + connect, sock_connect=connect, sock_read=read,
+                ),
+                cookie_jar=aiohttp.DummyCookieJar(),
+                # Los cuerpos se reenvían tal cual: sin descomprimir ni añadir cabeceras propias
+                auto_decompress=False,
+                skip_auto_headers=('Accept', 'Accept-Encoding', 'User-Agent'),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def aclose(self):
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(service):
+    """Devuelve el ``Upstream`` del servicio, o ``None`` si no está configurado."""
+    upstream = _upstreams.get(service)
+    if upstream is None:
+        config = settings.GATEWAY_UPSTREAMS.get(service)
+        if config is None:
+            return None
+        with _upstreams_lock:
+            upstream = _upstreams.get(service)
+            if upstream is None:
+                upstream = _upstreams[service] = Upstream(service, config)
+    return upstream
+
+
+def pool_stats():
+    return {nombre: upstream.stats.snapshot() for nombre, upstream in _upstreams.items()}
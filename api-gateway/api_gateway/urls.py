@@ -1,23 +1,49 @@
+from django.conf import settings
 from django.urls import path
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse
 import requests
 import json
 import logging
+from urllib3.exceptions import EmptyPoolError
+
+from compartido import identidad, trazas
+from compartido.metricas import vista_metricas
+
+from .autenticacion import autenticar
+from .streaming import proxy_view_async
+from .upstream import get_upstream, pool_stats
 
 # Configurar el logger
 logger = logging.getLogger(__name__)
 
+# Cabeceras de caché HTTP de los servicios que llegan sin tocar al cliente:
+# con ellas el navegador puede revalidar (If-None-Match / If-Modified-Since)
+CABECERAS_CACHE = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+
+def _con_cabeceras_cache(response, upstream_response):
+    for cabecera in CABECERAS_CACHE:
+        if cabecera in upstream_response.headers:
+            response[cabecera] = upstream_response.headers[cabecera]
+    return response
+
+
 def proxy_view(request, service, path):
-    SERVICE_URLS = {
-        'usuarios': 'http://localhost:8001',
-        'vuelos': 'http://localhost:8000',
-        'reservas': 'http://localhost:8002'
-    }
+    upstream = get_upstream(service)
+    if upstream is None:
+        return JsonResponse({'error': f'Servicio desconocido: {service}'}, status=404)
 
-    # Eliminar encabezados que pueden causar problemas
+    identidad_headers, rechazo = autenticar(request)
+    if rechazo is not None:
+        return rechazo
+
+    # Eliminar encabezados que pueden causar problemas; la identidad solo la pone el gateway
     headers_to_send = {key: value for key, value in request.headers.items()}
     headers_to_send.pop('Host', None)
     headers_to_send.pop('Connection', None)
+    headers_to_send.pop(identidad.CABECERA, None)
+    headers_to_send.pop('Traceparent', None)
+    headers_to_send.update(identidad_headers)
 
     request_body_data = None
     if request.method in ['POST', 'PUT', 'PATCH']:
@@ -30,30 +56,40 @@ def proxy_view(request, service, path):
             request_body_data = request.body
 
 
-    target_url = f"{SERVICE_URLS[service]}/{path}"
-    logger.info(f"Proxying request to: {target_url} with method: {request.method}")
+    logger.info(f"Proxying request to: {upstream.url}/{path} with method: {request.method}")
 
     try:
-        response = requests.request(
-            method=request.method,
-            url=target_url,
-            headers=headers_to_send,
-            data=request_body_data if not isinstance(request_body_data, dict) else None,
-            json=request_body_data if isinstance(request_body_data, dict) else None,
-            params=request.GET,
-            timeout=10
-        )
+        with trazas.span(f'proxy {service}', tipo='cliente', ruta=path) as span:
+            headers_to_send.update(trazas.cabeceras())
+            response = upstream.request(
+                request.method,
+                path,
+                headers=headers_to_send,
+                data=request_body_data if not isinstance(request_body_data, dict) else None,
+                json=request_body_data if isinstance(request_body_data, dict) else None,
+                params=request.GET,
+            )
+            if span is not None:
+                span.atributos['status'] = response.status_code
 
+        # 304: sin cuerpo que decodificar, el cliente reutiliza el que ya tiene
+        if response.status_code == 304:
+            return _con_cabeceras_cache(HttpResponseNotModified(), response)
         try:
             response_json = response.json()
             # CORRECCIÓN: Si la respuesta es una lista, usa safe=False
             if isinstance(response_json, list):
-                return JsonResponse(response_json, status=response.status_code, safe=False)
+                return _con_cabeceras_cache(
+                    JsonResponse(response_json, status=response.status_code, safe=False), response
+                )
             else:
-                return JsonResponse(response_json, status=response.status_code)
+                return _con_cabeceras_cache(JsonResponse(response_json, status=response.status_code), response)
         except requests.exceptions.JSONDecodeError:
             # Si no es un JSON válido, devolvemos el texto de la respuesta
             return JsonResponse({'message': response.text}, status=response.status_code)
+    except EmptyPoolError:
+        logger.warning(f"Connection pool exhausted for service: {service}")
+        return JsonResponse({'error': 'Servicio saturado, intente de nuevo'}, status=503)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error during proxy request: {e}")
         return JsonResponse({'error': f'Request failed: {e}'}, status=502)
@@ -61,7 +97,14 @@ def proxy_view(request, service, path):
         logger.error(f"Internal server error: {e}")
         return JsonResponse({'error': 'Internal server error'}, status=500)
 
+PROXY_VIEWS = {
+    'sync': proxy_view,
+    'asgi': proxy_view_async,
+}
+
 urlpatterns = [
-    path('api/<str:service>/<path:path>', proxy_view),
+    path('api/<str:service>/<path:path>', PROXY_VIEWS[settings.GATEWAY_PROXY_MODE]),
     path('health/', lambda r: JsonResponse({'status': 'ok'})),
+    path('stats/', lambda r: JsonResponse({'pools': pool_stats()})),
+    path('metrics', vista_metricas),
 ]
@@ -0,0 +1,7 @@
+"""
+Código común del gateway y de los servicios (usuarios, vuelos, reservas).
+
+Cada proyecto lo instala desde su ``requirements.txt`` (``-e`` con la ruta a
+esta carpeta) y lo importa como ``compartido.<módulo>``; los módulos solo
+dependen de los settings de Django que lee cada uno.
+"""
@@ -0,0 +1,74 @@
+"""
+Perfiles de base de datos, elegidos con la variable de entorno ``DB_PERFIL``.
+
+* ``sqlite`` (por defecto): fichero local en modo WAL, para desarrollo y
+  despliegues pequeños. Los lectores no bloquean al escritor y las
+  transacciones empiezan con ``BEGIN IMMEDIATE``: una escritura que tiene que
+  esperar lo hace al principio (hasta ``timeout``) en lugar de fallar con
+  "database is locked" al intentar pasar de lectura a escritura.
+* ``sqlite-basico``: SQLite sin ajustes (journal de rollback, transacciones
+  diferidas). Solo como referencia para comparar en pruebas de carga.
+* ``postgres``: PostgreSQL con un pool de conexiones por proceso (psycopg 3,
+  ``DB_POOL_MAX`` conexiones). Con ``DB_POOL_MAX=0`` no hay pool y se usan
+  conexiones persistentes (``CONN_MAX_AGE``), p. ej. detrás de pgbouncer.
+
+Conexión: ``DB_NOMBRE`` (fichero o base de datos), ``DB_USUARIO``,
+``DB_PASSWORD``, ``DB_HOST`` y ``DB_PUERTO``.
+
+Lo usan los ``settings.py`` de todos los servicios y del gateway.
+"""
+import os
+
+PERFILES = ('sqlite', 'sqlite-basico', 'postgres')
+
+PRAGMAS_SQLITE = (
+    'PRAGMA journal_mode=WAL',
+    # Con WAL, NORMAL solo sincroniza en los checkpoints: no se corrompe ante
+    # un corte, como mucho se pierden las últimas transacciones
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-20000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=134217728',
+)
+
+
+def configuracion(base_dir, servicio, perfil=None):
+    """``DATABASES['default']``. ``servicio`` es el nombre por defecto de la base de datos en PostgreSQL."""
+    perfil = perfil or os.environ.get('DB_PERFIL', 'sqlite')
+    if perfil not in PERFILES:
+        raise ValueError(f'DB_PERFIL desconocido: {perfil} (opciones: {", ".join(PERFILES)})')
+
+    if perfil == 'postgres':
+        pool_max = int(os.environ.get('DB_POOL_MAX', 10))
+        opciones = {}
+        if pool_max:
+            opciones['pool'] = {'min_size': min(2, pool_max), 'max_size': pool_max, 'timeout': 10}
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NOMBRE', servicio),
+            'USER': os.environ.get('DB_USUARIO', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PUERTO', '5432'),
+            # El pool y las conexiones persistentes son excluyentes
+            'CONN_MAX_AGE': 0 if pool_max else 60,
+            'CONN_HEALTH_CHECKS': not pool_max,
+            'OPTIONS': opciones,
+        }
+
+    datos = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NOMBRE', base_dir / 'db.sqlite3'),
+        'OPTIONS': {
+            # Espera hasta 10 segundos si la base de datos está bloqueada
+            'timeout': 10,
+        },
+    }
+    if perfil == 'sqlite':
+        # Conexiones persistentes: los PRAGMA se ejecutan una vez por conexión
+        datos['CONN_MAX_AGE'] = 60
+        datos['OPTIONS'].update({
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(PRAGMAS_SQLITE),
+        })
+    return datos
@@ -0,0 +1,196 @@
+"""
+Verificación local de JWT, sin llamar al servicio de usuarios.
+
+Todos los servicios comparten la clave de firma (``SIMPLE_JWT['SIGNING_KEY']``),
+así que cada uno valida los tokens por su cuenta. Encima de la validación de
+simplejwt hay dos piezas:
+
+* ``CacheTokens``: LRU acotado (``JWT_CACHE_MAX_ENTRADAS``) de tokens ya
+  validados, indexado por la firma y guardado hasta que el token expira. Un
+  token repetido no vuelve a pasar por HMAC ni por la decodificación.
+* ``ListaRevocacion``: los ``jti`` de los tokens revocados antes de expirar
+  (logout). Un hilo en segundo plano la actualiza cada
+  ``REVOCACION_REFRESCO_SEGUNDOS`` pidiendo solo las revocaciones nuevas; las
+  peticiones solo consultan un diccionario en memoria. Si el origen deja de
+  responder se sigue usando la última lista conocida, pero sin ninguna lista
+  no se puede saber si un token está revocado: mientras no se consiga la
+  primera carga, los tokens se rechazan con ``RevocacionNoDisponible`` (503).
+  En las vistas síncronas la primera carga se hace en la petición que la
+  necesita; el proxy asíncrono del gateway no llama nunca al origen desde el
+  bucle de eventos (``revocado(jti, cargar=False)``) y la deja al hilo, que se
+  arranca al iniciar la aplicación con ``precargar()``.
+
+Lo usan el servicio de usuarios, el de reservas y el gateway; este último solo
+``CacheTokens`` y ``ListaRevocacion``, porque valida los tokens con PyJWT (ver
+``api_gateway.autenticacion``) y no tiene simplejwt.
+"""
+import hmac
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre intentos de la primera carga: si el origen está caído, no se
+# le llama en cada petición
+REINTENTO_PRIMERA_CARGA = 1
+
+
+class RevocacionNoDisponible(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'No se puede comprobar si el token está revocado. Inténtalo más tarde.'
+    default_code = 'revocacion_no_disponible'
+
+
+class CacheTokens:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # firma -> (raw_token, expira, token)
+
+    @staticmethod
+    def _firma(raw_token):
+        return raw_token.rsplit(b'.', 1)[-1]
+
+    def obtener(self, raw_token):
+        firma = self._firma(raw_token)
+        with self._lock:
+            entrada = self._entradas.get(firma)
+            if entrada is None:
+                return None
+            guardado, expira, token = entrada
+            if expira <= time.time():
+                del self._entradas[firma]
+                return None
+            self._entradas.move_to_end(firma)
+        # Misma firma no basta: el token entero debe ser idéntico
+        return token if hmac.compare_digest(guardado, raw_token) else None
+
+    def guardar(self, raw_token, token):
+        maximo = getattr(settings, 'JWT_CACHE_MAX_ENTRADAS', 10000)
+        with self._lock:
+            self._entradas[self._firma(raw_token)] = (raw_token, token['exp'], token)
+            while len(self._entradas) > maximo:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+class ListaRevocacion:
+    """
+    ``cargar(desde)`` devuelve ``(revocados, nuevo_desde)``: los pares
+    ``(jti, expira)`` revocados a partir de ``desde`` (None = todos los
+    vigentes) y el valor de ``desde`` para la siguiente llamada.
+    """
+
+    def __init__(self, cargar):
+        self.cargar = cargar
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+        self._jtis = {}  # jti -> expira (timestamp)
+        self._desde = None
+        self._hilo = None
+        self._ultimo_intento = None
+        self.ultima_carga = None
+
+    def revocado(self, jti, cargar=True):
+        """
+        Con ``cargar=False`` solo se lee la lista en memoria: si todavía no
+        hay ninguna, se responde ``RevocacionNoDisponible`` sin esperar al origen.
+        """
+        if self._hilo is None:
+            self._arrancar()
+        if self.ultima_carga is None:
+            if not cargar:
+                raise RevocacionNoDisponible()
+            self._primera_carga()
+        expira = self._jtis.get(jti)
+        return expira is not None and expira > time.time()
+
+    def _primera_carga(self):
+        # Una sola petición carga la lista; las demás esperan su resultado
+        with self._lock_carga:
+            if self.ultima_carga is not None:
+                return
+            ahora = time.monotonic()
+            if self._ultimo_intento is not None and ahora - self._ultimo_intento < REINTENTO_PRIMERA_CARGA:
+                raise RevocacionNoDisponible()
+            self._ultimo_intento = ahora
+            try:
+                self.actualizar()
+            except Exception as exc:
+                logger.warning('No se pudo cargar la lista de tokens revocados', exc_info=True)
+                raise RevocacionNoDisponible() from exc
+
+    def actualizar(self):
+        revocados, desde = self.cargar(self._desde)
+        ahora = time.time()
+        with self._lock:
+            jtis = {jti: expira for jti, expira in self._jtis.items() if expira > ahora}
+            jtis.update(revocados)
+            # Se sustituye el diccionario entero: las lecturas no necesitan el lock
+            self._jtis = jtis
+            self._desde = desde
+        self.ultima_carga = ahora
+
+    def precargar(self):
+        """Arranca el hilo, que hace la primera carga sin esperar a ninguna petición."""
+        self._arrancar()
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name='lista-revocacion', daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            try:
+                # Con el lock, una petición que esté haciendo la primera carga no la repite
+                with self._lock_carga:
+                    if self.ultima_carga is None:
+                        self._ultimo_intento = time.monotonic()
+                    self.actualizar()
+            except Exception:
+                logger.warning('No se pudo actualizar la lista de tokens revocados', exc_info=True)
+            finally:
+                # El hilo no pasa por el ciclo de petición que cierra las conexiones caducadas
+                close_old_connections()
+            # Sin primera carga se reintenta pronto; después, cada REVOCACION_REFRESCO_SEGUNDOS
+            if self.ultima_carga is None:
+                time.sleep(REINTENTO_PRIMERA_CARGA)
+            else:
+                time.sleep(getattr(settings, 'REVOCACION_REFRESCO_SEGUNDOS', 30))
+
+    def snapshot(self):
+        return {'revocados': len(self._jtis), 'ultima_carga': self.ultima_carga}
+
+
+cache_tokens = CacheTokens()
+
+
+class VerificacionLocalMixin:
+    """
+    Para subclases de ``JWTAuthentication``: tokens validados en caché y
+    comprobación de revocación. La subclase define ``lista_revocacion``.
+    """
+    lista_revocacion = None
+
+    def get_validated_token(self, raw_token):
+        # Importado aquí: el gateway usa este módulo sin tener simplejwt
+        from rest_framework_simplejwt.exceptions import InvalidToken
+
+        token = cache_tokens.obtener(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            cache_tokens.guardar(raw_token, token)
+        if self.lista_revocacion is not None and self.lista_revocacion.revocado(token.get('jti')):
+            raise InvalidToken('Token revocado')
+        return token
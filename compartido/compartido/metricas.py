@@ -0,0 +1,205 @@
+"""
+Métricas de rendimiento por petición, expuestas en ``/metrics`` con el formato
+de texto de Prometheus.
+
+``MetricasMiddleware`` registra por endpoint (la plantilla de la URL, no la
+ruta concreta, para no disparar la cardinalidad):
+
+* ``http_peticion_segundos``: histograma de latencia por método, ruta y status.
+* ``bd_consultas_por_peticion``: histograma del número de consultas a la BD.
+* ``bd_segundos_total`` / ``bd_consultas_total``: tiempo y consultas acumulados.
+
+Las llamadas a otros servicios se registran en ``llamada_servicio_segundos``
+desde el cliente HTTP de cada servicio.
+
+Registrar una observación cuesta una búsqueda en un diccionario, un ``bisect``
+y un lock sin contención, para poder dejarlo activo en producción (ver el
+comando ``bench_metricas`` del servicio de vuelos). Cada proceso lleva su
+propio registro: con varios workers Prometheus agrega las series de cada uno.
+
+Lo usan todos los servicios y el gateway: ``compartido.metricas.MetricasMiddleware``
+en ``MIDDLEWARE`` y ``vista_metricas`` en ``/metrics``.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+from django.http import HttpResponse
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=''):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def incr(self, etiquetas=(), valor=1):
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + valor
+
+    def lineas(self):
+        with self._lock:
+            valores = list(self._valores.items())
+        for etiquetas, valor in valores:
+            yield f'{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {valor}'
+
+
+class Histograma:
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # etiquetas -> [cuentas por bucket (+Inf al final), suma, total]
+
+    def observar(self, etiquetas, valor):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def lineas(self):
+        with self._lock:
+            series = [
+                (etiquetas, list(cuentas), suma, total)
+                for etiquetas, (cuentas, suma, total) in self._series.items()
+            ]
+        for etiquetas, cuentas, suma, total in series:
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + ('+Inf',), cuentas):
+                acumulado += cuenta
+                le = f'le="{limite}"'
+                yield f'{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, le)} {acumulado}'
+            yield f'{self.nombre}_sum{_etiquetas(self.etiquetas, etiquetas)} {suma}'
+            yield f'{self.nombre}_count{_etiquetas(self.etiquetas, etiquetas)} {total}'
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = []
+
+    def contador(self, *args, **kwargs):
+        metrica = Contador(*args, **kwargs)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, *args, **kwargs):
+        metrica = Histograma(*args, **kwargs)
+        self._metricas.append(metrica)
+        return metrica
+
+    def exponer(self):
+        lineas = []
+        for metrica in self._metricas:
+            lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+            lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+            lineas.extend(metrica.lineas())
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()
+
+peticiones = registro.histograma(
+    'http_peticion_segundos', 'Latencia de las peticiones HTTP', ('metodo', 'ruta', 'status'),
+)
+consultas_por_peticion = registro.histograma(
+    'bd_consultas_por_peticion', 'Consultas a la BD por petición', ('ruta',), buckets=BUCKETS_CONSULTAS,
+)
+bd_segundos = registro.contador('bd_segundos_total', 'Tiempo acumulado en consultas a la BD', ('ruta',))
+bd_consultas = registro.contador('bd_consultas_total', 'Consultas a la BD', ('ruta',))
+llamadas_servicio = registro.histograma(
+    'llamada_servicio_segundos', 'Latencia de las llamadas a otros servicios', ('servicio', 'metodo', 'status'),
+)
+
+
+class _ContadorBD:
+    """Para ``connection.execute_wrapper``: número de consultas y tiempo."""
+    __slots__ = ('consultas', 'segundos')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def _ruta(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'sin_ruta'
+
+
+class MetricasMiddleware:
+    """
+    Compatible con WSGI y ASGI. En modo asíncrono no se cuentan consultas (el
+    proxy asíncrono del gateway no usa la BD) y, con respuestas en streaming,
+    la latencia es la del envío de las cabeceras.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        bd = _ContadorBD()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(bd):
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        ruta = _ruta(request)
+        peticiones.observar((request.method, ruta, response.status_code), duracion)
+        consultas_por_peticion.observar((ruta,), bd.consultas)
+        if bd.consultas:
+            bd_consultas.incr((ruta,), bd.consultas)
+            bd_segundos.incr((ruta,), bd.segundos)
+        return response
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        response = await self.get_response(request)
+        peticiones.observar((request.method, _ruta(request), response.status_code), time.perf_counter() - inicio)
+        return response
+
+
+def vista_metricas(request):
+    return HttpResponse(registro.exponer(), content_type=CONTENT_TYPE)
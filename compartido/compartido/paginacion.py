@@ -0,0 +1,131 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+El cursor guarda los valores de la última fila servida para todas las columnas
+de ordenación (siempre terminadas en ``id`` como desempate), y la página
+siguiente se pide con ``WHERE (col1, ..., id) > (v1, ..., vid)``. El coste de
+cada página no depende de lo lejos que se haya llegado, a diferencia de OFFSET.
+
+Un cursor que no se puede decodificar, que es de otra ordenación o cuyos
+valores no son válidos para sus columnas se responde con 400.
+
+La usan los listados de vuelos y de reservas.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    # Orden por defecto si ni el queryset (p. ej. vía OrderingFilter) ni el
+    # atributo ``ordering`` de la vista indican otro
+    ordering = ('id',)
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_actual = self.get_ordering(queryset, view)
+        queryset = queryset.order_by(*self.ordering_actual)
+
+        posicion = self.decode_cursor(request, queryset.model)
+        if posicion is not None:
+            queryset = queryset.filter(self.filtro_siguiente(posicion))
+
+        # Una fila de más indica si hay página siguiente
+        resultados = list(queryset[:self.page_size + 1])
+        self.posicion_siguiente = None
+        if len(resultados) > self.page_size:
+            resultados = resultados[:self.page_size]
+            self.posicion_siguiente = [
+                self._valor(resultados[-1], campo) for campo in self.ordering_actual
+            ]
+        return resultados
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset, view=None):
+        ordering = (
+            list(queryset.query.order_by)
+            or list(getattr(view, 'ordering', None) or self.ordering)
+        )
+        if not any(campo.lstrip('-') in ('id', 'pk') for campo in ordering):
+            # El desempate sigue el sentido de la última columna
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return tuple(ordering)
+
+    def filtro_siguiente(self, posicion):
+        """
+        Expande ``(c1, c2, ..., id) > (v1, v2, ..., vid)`` respetando el sentido de
+        cada columna. Se añade ``c1 >= v1`` para que el planificador pueda
+        recorrer el índice de la primera columna como un rango.
+        """
+        filtro = Q()
+        iguales = {}
+        for campo, valor in zip(self.ordering_actual, posicion):
+            nombre = campo.lstrip('-')
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            filtro |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+            iguales[nombre] = valor
+
+        primero = self.ordering_actual[0]
+        operador = 'lte' if primero.startswith('-') else 'gte'
+        return Q(**{f'{primero.lstrip("-")}__{operador}': posicion[0]}) & filtro
+
+    def _valor(self, obj, campo):
+        valor = getattr(obj, campo.lstrip('-'))
+        if isinstance(valor, int):
+            return valor
+        return valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+
+    def encode_cursor(self, posicion):
+        datos = {'o': list(self.ordering_actual), 'p': posicion}
+        return base64.urlsafe_b64encode(json.dumps(datos, separators=(',', ':')).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            ordering, posicion = tuple(datos['o']), datos['p']
+            # Un cursor solo vale para la misma ordenación con la que se generó
+            if ordering != self.ordering_actual or len(posicion) != len(ordering):
+                raise ValueError
+            valores = []
+            for campo, valor in zip(ordering, posicion):
+                field = model._meta.get_field(campo.lstrip('-'))
+                valor = field.to_python(valor)
+                # Rango de la columna: un entero fuera de rango haría fallar la consulta
+                field.run_validators(valor)
+                valores.append(valor)
+            return valores
+        except (TypeError, ValueError, KeyError, AttributeError, ValidationError):
+            raise ParseError(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.posicion_siguiente is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.posicion_siguiente))
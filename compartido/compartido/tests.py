@@ -0,0 +1,172 @@
+"""
+Tests del código común. Se ejecutan desde cualquiera de los proyectos:
+
+    python manage.py test compartido
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from .basedatos import PRAGMAS_SQLITE, configuracion
+from .jwt_local import REINTENTO_PRIMERA_CARGA, ListaRevocacion, RevocacionNoDisponible
+
+
+class PerfilesBaseDatosTest(SimpleTestCase):
+    def setUp(self):
+        self.directorio = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directorio)
+
+    def configuracion(self, **entorno):
+        with mock.patch.dict(os.environ, entorno, clear=True):
+            return configuracion(self.directorio, 'prueba')
+
+    def pragmas(self, datos):
+        """Valores de los PRAGMA en una conexión real abierta con ``datos``."""
+        # Alias propio: SimpleTestCase solo bloquea los de settings.DATABASES
+        conexion = ConnectionHandler({'default': {}, 'perfil': datos})['perfil']
+        self.addCleanup(conexion.close)
+        with conexion.cursor() as cursor:
+            valores = {}
+            for pragma in ('journal_mode', 'synchronous', 'cache_size', 'temp_store', 'mmap_size'):
+                cursor.execute(f'PRAGMA {pragma}')
+                valores[pragma] = cursor.fetchone()[0]
+        return conexion, valores
+
+    def test_sqlite_por_defecto_en_wal(self):
+        datos = self.configuracion()
+
+        self.assertEqual(datos['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(datos['NAME'], self.directorio / 'db.sqlite3')
+        self.assertEqual(datos['CONN_MAX_AGE'], 60)
+        self.assertEqual(datos['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(datos['OPTIONS']['init_command'], ';'.join(PRAGMAS_SQLITE))
+
+        conexion, valores = self.pragmas(datos)
+        self.assertEqual(valores, {
+            'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -20000, 'temp_store': 2, 'mmap_size': 134217728,
+        })
+        self.assertEqual(conexion.transaction_mode, 'IMMEDIATE')
+
+    def test_sqlite_basico_sin_ajustes(self):
+        nombre = str(self.directorio / 'basico.sqlite3')
+        datos = self.configuracion(DB_PERFIL='sqlite-basico', DB_NOMBRE=nombre)
+
+        self.assertEqual(datos, {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': nombre, 'OPTIONS': {'timeout': 10},
+        })
+
+        conexion, valores = self.pragmas(datos)
+        self.assertEqual(valores['journal_mode'], 'delete')
+        self.assertEqual(valores['synchronous'], 2)
+        self.assertIsNone(conexion.transaction_mode)
+
+    def test_postgres_con_pool(self):
+        datos = self.configuracion(
+            DB_PERFIL='postgres', DB_POOL_MAX='5', DB_NOMBRE='reservas', DB_HOST='bd', DB_PUERTO='6432',
+        )
+
+        self.assertEqual(datos['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(
+            (datos['NAME'], datos['USER'], datos['HOST'], datos['PORT']), ('reservas', 'postgres', 'bd', '6432'),
+        )
+        self.assertEqual(datos['OPTIONS'], {'pool': {'min_size': 2, 'max_size': 5, 'timeout': 10}})
+        self.assertEqual(datos['CONN_MAX_AGE'], 0)
+        self.assertFalse(datos['CONN_HEALTH_CHECKS'])
+        # Sin PRAGMA ni opciones de SQLite
+        self.assertNotIn('init_command', datos['OPTIONS'])
+
+    def test_postgres_sin_pool_usa_conexiones_persistentes(self):
+        datos = self.configuracion(DB_PERFIL='postgres', DB_POOL_MAX='0')
+
+        self.assertEqual(datos['NAME'], 'prueba')
+        self.assertEqual(datos['OPTIONS'], {})
+        self.assertEqual(datos['CONN_MAX_AGE'], 60)
+        self.assertTrue(datos['CONN_HEALTH_CHECKS'])
+
+    def test_perfil_desconocido(self):
+        with self.assertRaisesMessage(ValueError, 'DB_PERFIL desconocido: mysql'):
+            self.configuracion(DB_PERFIL='mysql')
+
+
+class ListaRevocacionTest(SimpleTestCase):
+    def lista(self, cargar):
+        lista = ListaRevocacion(cargar)
+        # Sin hilo de refresco
+        patcher = mock.patch.object(lista, '_arrancar')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return lista
+
+    def test_primera_carga_en_la_peticion(self):
+        ahora = time.time()
+        cargar = mock.Mock(return_value=([('revocado', ahora + 60), ('caducado', ahora - 1)], ahora))
+        lista = self.lista(cargar)
+
+        self.assertTrue(lista.revocado('revocado'))
+        self.assertFalse(lista.revocado('caducado'))
+        self.assertFalse(lista.revocado('otro'))
+        cargar.assert_called_once_with(None)
+
+    def test_sin_lista_no_se_acepta_ningun_token(self):
+        cargar = mock.Mock(side_effect=OSError('origen caído'))
+        lista = self.lista(cargar)
+
+        with self.assertLogs('compartido.jwt_local', 'WARNING'), self.assertRaises(RevocacionNoDisponible):
+            lista.revocado('jti')
+        # Dentro del intervalo de reintento no se vuelve a llamar al origen
+        with self.assertRaises(RevocacionNoDisponible):
+            lista.revocado('jti')
+        self.assertEqual(cargar.call_count, 1)
+
+        cargar.side_effect = None
+        cargar.return_value = ([], time.time())
+        lista._ultimo_intento -= REINTENTO_PRIMERA_CARGA
+        self.assertFalse(lista.revocado('jti'))
+        self.assertEqual(cargar.call_count, 2)
+
+    def test_sin_carga_en_la_peticion(self):
+        cargar = mock.Mock(return_value=([('revocado', time.time() + 60)], 1.0))
+        lista = self.lista(cargar)
+
+        with self.assertRaises(RevocacionNoDisponible):
+            lista.revocado('revocado', cargar=False)
+        cargar.assert_not_called()
+
+        lista.actualizar()
+        self.assertTrue(lista.revocado('revocado', cargar=False))
+        self.assertEqual(cargar.call_count, 1)
+
+    def test_precargar_hace_la_primera_carga_en_el_hilo(self):
+        cargado = threading.Event()
+
+        def cargar(desde):
+            cargado.set()
+            return [('revocado', time.time() + 60)], 1.0
+
+        lista = ListaRevocacion(cargar)
+        lista.precargar()
+
+        self.assertTrue(cargado.wait(5))
+        for _ in range(50):
+            if lista.ultima_carga is not None:
+                break
+            time.sleep(0.01)
+        self.assertTrue(lista.revocado('revocado', cargar=False))
+
+    def test_fallo_de_un_refresco_mantiene_la_ultima_lista(self):
+        cargar = mock.Mock(return_value=([('revocado', time.time() + 60)], 1.0))
+        lista = self.lista(cargar)
+        lista.actualizar()
+
+        cargar.side_effect = OSError('origen caído')
+        with self.assertRaises(OSError):
+            lista.actualizar()
+        self.assertTrue(lista.revocado('revocado'))
+        self.assertEqual(cargar.call_count, 2)
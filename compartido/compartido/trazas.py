@@ -0,0 +1,243 @@
+"""
+Propagación de contexto de traza (W3C Trace Context) y registro de spans.
+
+Cada petición lleva la cabecera ``traceparent``:
+
+    00-<trace_id: 32 hex>-<span padre: 16 hex>-<flags: 01 = muestreada>
+
+El gateway la genera (o continúa la que envía el cliente si es válida) y cada
+servicio la recibe en ``TrazasMiddleware``, que abre el span de servidor de la
+petición. Dentro de la petición, ``span(nombre)`` abre spans hijos (llamadas a
+otros servicios, tramos de una vista) y ``cabeceras()`` devuelve el
+``traceparent`` que hay que enviar en una llamada saliente.
+
+Quien decide el muestreo es el primer salto (``TRAZAS['MUESTREO']``); los
+siguientes respetan el flag recibido. Los spans muestreados se exportan en
+segundo plano, una línea JSON por span, a ``TRAZAS['ARCHIVO']`` y/o por POST
+a ``TRAZAS['COLECTOR']``; sin ninguno de los dos el contexto se propaga pero
+no se registra nada. El comando ``rutas_criticas`` del gateway reconstruye
+cada traza a partir de los ficheros de todos los servicios.
+
+Lo usan todos los servicios y el gateway: ``compartido.trazas.TrazasMiddleware``
+en ``MIDDLEWARE``.
+"""
+import contextvars
+import json
+import logging
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CABECERA = 'traceparent'
+_FORMATO = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+_actual = contextvars.ContextVar('span', default=None)
+
+CONFIG_POR_DEFECTO = {
+    'SERVICIO': 'desconocido',
+    'MUESTREO': 1.0,
+    'ARCHIVO': None,
+    'COLECTOR': None,
+    'COLA': 10000,
+    'LOTE': 200,
+}
+
+
+def config():
+    return {**CONFIG_POR_DEFECTO, **getattr(settings, 'TRAZAS', {})}
+
+
+def parsear(valor):
+    """``(trace_id, span_padre, muestreado)`` de un ``traceparent`` válido, o None."""
+    match = _FORMATO.match((valor or '').strip().lower())
+    if match is None:
+        return None
+    trace_id, padre, flags = match.groups()
+    if trace_id == '0' * 32 or padre == '0' * 16:
+        return None
+    return trace_id, padre, bool(int(flags, 16) & 1)
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'padre', 'nombre', 'tipo', 'muestreado', 'atributos', 'inicio', '_t0')
+
+    def __init__(self, trace_id, padre, nombre, tipo, muestreado, atributos=None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.padre = padre
+        self.nombre = nombre
+        self.tipo = tipo
+        self.muestreado = muestreado
+        self.atributos = atributos or {}
+        # Hora de reloj para ordenar spans de procesos distintos; la duración
+        # se mide con perf_counter
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.muestreado else '00'}"
+
+    def terminar(self):
+        if not self.muestreado or not exportador.activo:
+            return
+        exportador.exportar({
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'padre': self.padre,
+            'servicio': exportador.servicio,
+            'nombre': self.nombre,
+            'tipo': self.tipo,
+            'inicio': self.inicio,
+            'duracion_ms': round((time.perf_counter() - self._t0) * 1000, 3),
+            'atributos': self.atributos,
+        })
+
+
+def actual():
+    return _actual.get()
+
+
+@contextmanager
+def span(nombre, tipo='interno', **atributos):
+    """Span hijo del actual. Fuera de una traza no hace nada y devuelve None."""
+    padre = _actual.get()
+    if padre is None:
+        yield None
+        return
+    hijo = Span(padre.trace_id, padre.span_id, nombre, tipo, padre.muestreado, atributos)
+    token = _actual.set(hijo)
+    try:
+        yield hijo
+    finally:
+        _actual.reset(token)
+        hijo.terminar()
+
+
+def cabeceras():
+    """Cabeceras de contexto para una llamada saliente desde el span actual."""
+    actual_ = _actual.get()
+    return {CABECERA: actual_.traceparent()} if actual_ is not None else {}
+
+
+def _span_servidor(request):
+    contexto = parsear(request.headers.get(CABECERA))
+    if contexto is None:
+        trace_id, padre = secrets.token_hex(16), None
+        muestreado = random.random() < config()['MUESTREO']
+    else:
+        trace_id, padre, muestreado = contexto
+    return Span(trace_id, padre, request.method, 'servidor', muestreado)
+
+
+def _cerrar_servidor(span_, request, response):
+    match = getattr(request, 'resolver_match', None)
+    span_.nombre = f"{request.method} {match.route if match is not None else request.path}"
+    span_.atributos['status'] = response.status_code
+    span_.terminar()
+
+
+class TrazasMiddleware:
+    """Abre el span de servidor de cada petición. Compatible con WSGI y ASGI."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        span_ = _span_servidor(request)
+        token = _actual.set(span_)
+        try:
+            response = self.get_response(request)
+        finally:
+            _actual.reset(token)
+        _cerrar_servidor(span_, request, response)
+        return response
+
+    async def __acall__(self, request):
+        span_ = _span_servidor(request)
+        token = _actual.set(span_)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _actual.reset(token)
+        _cerrar_servidor(span_, request, response)
+        return response
+
+
+class Exportador:
+    """Cola acotada vaciada por un hilo; exportar nunca bloquea una petición."""
+
+    def __init__(self):
+        self._cola = None
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.descartados = 0
+
+    @property
+    def servicio(self):
+        return config()['SERVICIO']
+
+    @property
+    def activo(self):
+        cfg = config()
+        return bool(cfg['ARCHIVO'] or cfg['COLECTOR'])
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._cola = queue.Queue(maxsize=config()['COLA'])
+                self._hilo = threading.Thread(target=self._vaciar, name='exportador-trazas', daemon=True)
+                self._hilo.start()
+
+    def exportar(self, datos):
+        if self._hilo is None:
+            self._arrancar()
+        try:
+            self._cola.put_nowait(datos)
+        except queue.Full:
+            with self._lock:
+                self.descartados += 1
+
+    def _vaciar(self):
+        while True:
+            lote = [self._cola.get()]
+            while len(lote) < config()['LOTE']:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._escribir(lote)
+            except Exception:
+                # Un lote que no se puede exportar no debe parar el hilo
+                logger.warning('No se pudieron exportar %d spans', len(lote), exc_info=True)
+
+    def _escribir(self, lote):
+        cfg = config()
+        if cfg['ARCHIVO']:
+            with open(cfg['ARCHIVO'], 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(datos, ensure_ascii=False, default=str) + '\n' for datos in lote))
+        if cfg['COLECTOR']:
+            peticion = urllib.request.Request(
+                cfg['COLECTOR'], data=json.dumps(lote, default=str).encode(),
+                headers={'Content-Type': 'application/json'}, method='POST',
+            )
+            urllib.request.urlopen(peticion, timeout=5).close()
+
+
+exportador = Exportador()
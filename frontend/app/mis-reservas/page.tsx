@@ -2,7 +2,7 @@
 
 import { useEffect, useState, useCallback } from 'react';
 import { useRouter } from 'next/navigation';
-import { getReservations, getFlightDetails, cancelReservation, type Reserva, type Vuelo } from '@/lib/api/client';
+import { getReservations, getFlightsByIds, cancelReservation, type Reserva, type Vuelo } from '@/lib/api/client';
 import { verifySession } from '@/lib/auth';
 import Link from 'next/link';
 
@@ -48,18 +48,18 @@ export default function MisReservasPage() {
       }
 
       const data = await getReservations();
-      const reservationsWithFlightInfo = await Promise.all(data.map(async (reserva) => {
-        if (reserva.vuelo_id) {
-          try {
-            const vuelo = await getFlightDetails(reserva.vuelo_id);
-            return { ...reserva, vuelo };
-          } catch (flightErr) {
-            console.error(`Error fetching flight details for reservation ${reserva.id}:`, flightErr);
-            return reserva;
-          }
-        }
-        return reserva;
-      }));
+      // Los vuelos de todas las reservas, en lotes (ver getFlightsByIds)
+      let vuelos = new Map<number, Vuelo>();
+      try {
+        const lista = await getFlightsByIds(data.filter((r) => r.vuelo_id).map((r) => r.vuelo_id));
+        vuelos = new Map(lista.map((vuelo) => [vuelo.id, vuelo]));
+      } catch (flightErr) {
+        console.error('Error fetching flight details for reservations:', flightErr);
+      }
+      const reservationsWithFlightInfo = data.map((reserva) => {
+        const vuelo = vuelos.get(reserva.vuelo_id);
+        return vuelo ? { ...reserva, vuelo } : reserva;
+      });
       setReservas(reservationsWithFlightInfo);
     } catch (err: any) {
       console.error('Error fetching reservations:', err);
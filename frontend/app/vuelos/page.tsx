@@ -35,6 +35,10 @@ interface Vuelo {
 export default function VuelosPage() {
   const [flights, setFlights] = useState<Vuelo[]>([]);
   const [loading, setLoading] = useState(true);
+  // Cursor de la página siguiente y filtros con los que se pidió la primera
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [filtrosActuales, setFiltrosActuales] = useState<{ origen?: string; destino?: string; fecha?: string }>({});
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [userProfile, setUserProfile] = useState<UserProfile | null>(null);
   const [isDropdownOpen, setIsDropdownOpen] = useState(false);
@@ -57,7 +61,9 @@ export default function VuelosPage() {
 
     try {
       const data = await getFlights(filters);
-      setFlights(data);
+      setFlights(data.results);
+      setCursor(data.cursor);
+      setFiltrosActuales(filters);
     } catch (err: any) {
       console.error('Error fetching flights:', err);
       setError('No se pudieron cargar los vuelos. Inténtalo de nuevo más tarde.');
@@ -70,6 +76,21 @@ export default function VuelosPage() {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!cursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await getFlights(filtrosActuales, cursor);
+      setFlights((anteriores) => [...anteriores, ...data.results]);
+      setCursor(data.cursor);
+    } catch (err: any) {
+      console.error('Error fetching more flights:', err);
+      setError('No se pudieron cargar más vuelos. Inténtalo de nuevo más tarde.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchFlights();
 
@@ -264,6 +285,19 @@ export default function VuelosPage() {
           ))}
         </div>
       )}
+
+      {!loading && !error && cursor && (
+        <div className="mt-8 text-center">
+          <button
+            type="button"
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+            className="px-8 py-2.5 bg-sky-600 text-white rounded-lg shadow-md hover:bg-sky-700 transition-colors duration-200 disabled:opacity-60 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-sky-500"
+          >
+            {loadingMore ? 'Cargando...' : 'Cargar más vuelos'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
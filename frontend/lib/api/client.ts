@@ -50,6 +50,23 @@ export interface Reserva {
   pasajeros: Pasajero[];
 }
 
+// Respuesta de los listados paginados por cursor
+export interface Paginated<T> {
+  next: string | null;
+  results: T[];
+}
+
+// Una página de un listado y el cursor para pedir la siguiente (null si es la última)
+export interface Pagina<T> {
+  results: T[];
+  cursor: string | null;
+}
+
+// El enlace `next` lo construye el servicio con su propia URL, no la del
+// gateway: de él solo se reutiliza el parámetro `cursor`
+const cursorSiguiente = (next: string | null): string | null =>
+  next ? new URL(next).searchParams.get('cursor') : null;
+
 const client = axios.create({
   // URL base del API Gateway
   baseURL: 'http://localhost:8003/api/',
@@ -87,8 +104,12 @@ client.interceptors.response.use(
 
 export default client;
 
-// Función para obtener vuelos, ahora acepta un objeto de filtros
-export const getFlights = async (filters: { origen?: string; destino?: string; fecha?: string } = {}) => {
+// Función para obtener vuelos, ahora acepta un objeto de filtros.
+// Devuelve una página; con el cursor que la acompaña se pide la siguiente
+export const getFlights = async (
+  filters: { origen?: string; destino?: string; fecha?: string } = {},
+  cursor: string | null = null,
+): Promise<Pagina<Vuelo>> => {
   try {
     let url = 'vuelos/api/vuelos/'; // URL base para el API Gateway
 
@@ -103,14 +124,17 @@ export const getFlights = async (filters: { origen?: string; destino?: string; f
     if (filters.fecha) {
       params.append('fecha', filters.fecha);
     }
+    if (cursor) {
+      params.append('cursor', cursor);
+    }
 
     // Añadir los parámetros a la URL si existen
     if (params.toString()) {
       url += `?${params.toString()}`;
     }
 
-    const response = await client.get(url);
-    return response.data;
+    const response = await client.get<Paginated<Vuelo>>(url);
+    return { results: response.data.results, cursor: cursorSiguiente(response.data.next) };
   } catch (error) {
     console.error('Error fetching flights:', error);
     throw error;
@@ -128,6 +152,80 @@ export const getFlightDetails = async (flightId: number) => {
   }
 };
 
+// Máximo de ids por petición que acepta vuelos/lote/ (VuelosLoteView.MAX_IDS)
+const MAX_IDS_LOTE = 200;
+
+// Obtiene varios vuelos en lotes de MAX_IDS_LOTE (los que no existen se omiten)
+export const getFlightsByIds = async (flightIds: number[]): Promise<Vuelo[]> => {
+  const ids = Array.from(new Set(flightIds));
+  const lotes: number[][] = [];
+  for (let inicio = 0; inicio < ids.length; inicio += MAX_IDS_LOTE) {
+    lotes.push(ids.slice(inicio, inicio + MAX_IDS_LOTE));
+  }
+  try {
+    const respuestas = await Promise.all(
+      lotes.map((lote) =>
+        client.get<Vuelo[]>('vuelos/api/vuelos/lote/', { params: { ids: lote.join(',') } }),
+      ),
+    );
+    return respuestas.flatMap((response) => response.data);
+  } catch (error) {
+    console.error('Error fetching flights by id:', error);
+    throw error;
+  }
+};
+
+export interface Itinerario {
+  escalas: number;
+  duracion_minutos: number;
+  precio_total: string;
+  vuelos: Vuelo[];
+}
+
+// Itinerarios directos y con hasta dos escalas, ordenados por hora de llegada
+export const getConnections = async (filters: {
+  origen: string;
+  destino: string;
+  fecha?: string;
+  escalas?: number;
+  pasajeros?: number;
+}): Promise<Itinerario[]> => {
+  try {
+    const response = await client.get<{ itinerarios: Itinerario[] }>('vuelos/api/vuelos/conexiones/', {
+      params: filters,
+    });
+    return response.data.itinerarios;
+  } catch (error) {
+    console.error('Error fetching connections:', error);
+    throw error;
+  }
+};
+
+export interface TarifaDia {
+  fecha: string;
+  precio_minimo: string | null;
+  asientos_disponibles: number;
+  vuelos: number;
+}
+
+// Precio mínimo y asientos libres por día de una ruta (por defecto, los próximos 31 días)
+export const getFareCalendar = async (filters: {
+  origen: string;
+  destino: string;
+  fecha_desde?: string;
+  fecha_hasta?: string;
+}): Promise<TarifaDia[]> => {
+  try {
+    const response = await client.get<{ dias: TarifaDia[] }>('vuelos/api/vuelos/calendario/', {
+      params: filters,
+    });
+    return response.data.dias;
+  } catch (error) {
+    console.error('Error fetching fare calendar:', error);
+    throw error;
+  }
+};
+
 // Nueva función para crear una reserva
 export const createReservation = async (reservationData: any) => {
   try {
@@ -139,11 +237,20 @@ export const createReservation = async (reservationData: any) => {
   }
 };
 
-//Obtiene todas las reservas del usuario actual.
+//Obtiene todas las reservas del usuario actual, recorriendo todas las páginas.
 export const getReservations = async (): Promise<Reserva[]> => {
   try {
-    const response = await client.get('reservas/api/reservas/');
-    return response.data;
+    const reservas: Reserva[] = [];
+    let cursor: string | null = null;
+    do {
+      const response: { data: Paginated<Reserva> } = await client.get<Paginated<Reserva>>(
+        'reservas/api/reservas/',
+        { params: cursor ? { cursor } : undefined },
+      );
+      reservas.push(...response.data.results);
+      cursor = cursorSiguiente(response.data.next);
+    } while (cursor);
+    return reservas;
   } catch (error) {
     console.error('Error fetching reservations:', error);
     throw error;
@@ -66,6 +66,18 @@ export const register = async (userData: any): Promise<any> => {
 
 
 export const logout = (): void => {
+  const access = Cookies.get('access_token');
+  const refresh = Cookies.get('refresh_token');
+  if (access) {
+    // Revoca en el servidor el access y el refresh token. Con keepalive la
+    // petición sigue aunque se salga de la página; la sesión local se cierra igualmente
+    fetch(`${client.defaults.baseURL}usuarios/api/auth/logout/`, {
+      method: 'POST',
+      keepalive: true,
+      headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${access}` },
+      body: JSON.stringify(refresh ? { refresh } : {}),
+    }).catch(() => {});
+  }
   Cookies.remove('access_token');
   Cookies.remove('refresh_token');
   window.location.href = '/auth/login';
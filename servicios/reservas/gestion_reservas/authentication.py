@@ -1,6 +1,17 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
+from compartido import identidad
+from compartido.jwt_local import ListaRevocacion, VerificacionLocalMixin
+
+from .clients import UsuariosClient
+from .medicion import medir
+
+# Tokens revocados (logout) publicados por el servicio de usuarios; se piden
+# periódicamente en segundo plano, nunca durante una petición
+lista_revocacion = ListaRevocacion(UsuariosClient.revocaciones)
+
 class SimpleUser:
     def __init__(self, id, username):
         self.id = id
@@ -10,7 +21,14 @@ class SimpleUser:
     def __str__(self):
         return f"User(id={self.id}, username={self.username})"
 
-class JWTStatelessUserAuthentication(JWTAuthentication):
+class JWTStatelessUserAuthentication(VerificacionLocalMixin, JWTAuthentication):
+    """JWT verificado localmente (ver compartido.jwt_local), sin consultar usuarios ni la BD."""
+    lista_revocacion = lista_revocacion
+
+    def authenticate(self, request):
+        with medir('auth'):
+            return super().authenticate(request)
+
     def get_user(self, validated_token):
         try:
             user_id = validated_token.get('user_id')
@@ -24,4 +42,24 @@ class JWTStatelessUserAuthentication(JWTAuthentication):
             )
             
         except Exception as e:
-            raise AuthenticationFailed(f'Error al validar usuario: {str(e)}')
\ No newline at end of file
+            raise AuthenticationFailed(f'Error al validar usuario: {str(e)}')
+
+class IdentidadGatewayAuthentication(BaseAuthentication):
+    """
+    Identidad ya verificada por el gateway (cabecera X-Identidad firmada). Sin
+    la cabecera se pasa a la siguiente clase (JWT); con una cabecera que no
+    valida, la petición se rechaza.
+    """
+    def authenticate_header(self, request):
+        # Con WWW-Authenticate DRF responde 401 (y no 403) a las peticiones sin credenciales válidas
+        return 'Bearer realm="api"'
+
+    def authenticate(self, request):
+        valor = request.headers.get(identidad.CABECERA)
+        if not valor:
+            return None
+        with medir('auth'):
+            claims = identidad.verificar(valor)
+        if claims is None:
+            raise AuthenticationFailed('Identidad del gateway inválida o expirada')
+        return SimpleUser(id=claims['user_id'], username=claims['username']), claims
@@ -1,30 +1,152 @@
-import requests
 from django.conf import settings
 from requests.exceptions import RequestException
 
+from .cache import cache_vuelos
+from .resiliencia import cliente
+
+# Clientes compartidos por todo el proceso: pool keep-alive, circuit breaker,
+# reintentos y plazo de la petición entrante (ver clients.resiliencia)
+_vuelos = cliente('vuelos', 'VUELOS_SERVICE_URL')
+_usuarios = cliente('usuarios', 'USUARIOS_SERVICE_URL')
+
 class VuelosClient:
+    MAX_IDS_LOTE = 200  # límite del endpoint vuelos/lote/
+
     @staticmethod
-    def obtener_vuelo(vuelo_id):
+    def _get(ruta):
         try:
-            response = requests.get(
-                f"{settings.VUELOS_SERVICE_URL}/api/vuelos/{vuelo_id}/",
-                timeout=3
-            )
+            response = _vuelos.get(f"api/vuelos/{ruta}")
             if response.status_code == 200:
                 return response.json()
             return None
         except RequestException:
             return None
 
+    @staticmethod
+    def _cargar_vuelo(vuelo_id):
+        return VuelosClient._get(f"{vuelo_id}/")
+
+    @staticmethod
+    def obtener_vuelo(vuelo_id, asientos=True):
+        """
+        Datos del vuelo, o None si no existe o el servicio no responde.
+
+        Ruta, horarios y precio salen de la caché local (ver ``clients.cache``);
+        ``asientos_disponibles`` se consulta siempre en vivo. Con
+        ``asientos=False`` se omite esa consulta y el campo.
+        """
+        vuelo = cache_vuelos.obtener(vuelo_id, VuelosClient._cargar_vuelo)
+        if vuelo is None:
+            return None
+        vuelo = dict(vuelo)
+        if not asientos:
+            vuelo.pop('asientos_disponibles', None)
+        elif 'asientos_disponibles' not in vuelo:
+            disponibles = VuelosClient.asientos_disponibles(vuelo_id)
+            if disponibles is None:
+                return None
+            vuelo['asientos_disponibles'] = disponibles
+        return vuelo
+
+    @staticmethod
+    def obtener_vuelos(ids):
+        """
+        Datos estáticos (sin ``asientos_disponibles``) de varios vuelos, como
+        ``{vuelo_id: vuelo}``. Los que no están en la caché local se piden en
+        una sola llamada al endpoint de lote; los vuelos que no existen no
+        aparecen. Devuelve None si el servicio de vuelos no responde.
+        """
+        ids = list(dict.fromkeys(ids))
+        vuelos = cache_vuelos.buscar(ids)
+        faltan = [vuelo_id for vuelo_id in ids if vuelo_id not in vuelos]
+        for inicio in range(0, len(faltan), VuelosClient.MAX_IDS_LOTE):
+            lote = faltan[inicio:inicio + VuelosClient.MAX_IDS_LOTE]
+            datos = VuelosClient._get(f"lote/?ids={','.join(map(str, lote))}")
+            if datos is None:
+                return None
+            for vuelo in datos:
+                cache_vuelos.guardar(vuelo['id'], vuelo)
+                vuelos[vuelo['id']] = vuelo
+        return {
+            vuelo_id: {campo: valor for campo, valor in vuelos[vuelo_id].items() if campo != 'asientos_disponibles'}
+            for vuelo_id in ids if vuelo_id in vuelos
+        }
+
+    @staticmethod
+    def asientos_disponibles(vuelo_id):
+        datos = VuelosClient._get(f"{vuelo_id}/asientos/")
+        return datos['asientos_disponibles'] if datos else None
+
+    @staticmethod
+    def _asientos(accion, vuelo_id, asientos, rechazos):
+        """
+        True si vuelos responde 200, False si responde uno de los status de
+        ``rechazos`` y None con cualquier otro (token de servicio inválido,
+        validación, error del servidor): no se sabe si los asientos cambiaron.
+        """
+        response = _vuelos.post(
+            f"api/vuelos/{vuelo_id}/asientos/{accion}/",
+            json={"asientos": asientos},
+            headers={"X-Servicio-Token": settings.TOKEN_SERVICIOS_INTERNOS},
+        )
+        if response.status_code == 200:
+            return True
+        if response.status_code in rechazos:
+            return False
+        return None
+
+    @staticmethod
+    def retener_asientos(vuelo_id, asientos):
+        """
+        Descuenta los asientos en el servicio de vuelos de forma atómica.
+        Devuelve True si se retuvieron, False si no hay suficientes (o el vuelo
+        no existe) y None si el servicio de vuelos no responde, falla o rechaza
+        la petición.
+        """
+        try:
+            return VuelosClient._asientos('retener', vuelo_id, asientos, rechazos=(404, 409))
+        except RequestException:
+            return None
+
+    @staticmethod
+    def liberar_asientos(vuelo_id, asientos):
+        """
+        Devuelve los asientos al vuelo. True si se liberaron o el vuelo ya no
+        existe (no hay nada que liberar); None si el servicio no responde o
+        rechaza la petición.
+        """
+        try:
+            if VuelosClient._asientos('liberar', vuelo_id, asientos, rechazos=(404,)) is None:
+                return None
+            return True
+        except RequestException:
+            return None
+
 class UsuariosClient:
     @staticmethod
     def verificar_usuario(usuario_id, token):
+        """Si ``token`` es un JWT válido, no revocado, del usuario ``usuario_id``.
+
+        Se verifica localmente con la clave compartida, sin llamar a usuarios.
+        """
+        from ..authentication import JWTStatelessUserAuthentication
         try:
-            response = requests.get(
-                f"{settings.USUARIOS_SERVICE_URL}/api/auth/perfil/",
-                headers={"Authorization": f"Token {token}"},
-                timeout=3
-            )
-            return response.status_code == 200
-        except RequestException:
-            return False
\ No newline at end of file
+            validado = JWTStatelessUserAuthentication().get_validated_token(token.encode())
+        except Exception:
+            return False
+        return validado.get('user_id') == usuario_id
+
+    @staticmethod
+    def revocaciones(desde=None):
+        """
+        Tokens revocados desde ``desde`` como ``([(jti, expira), ...], hasta)``,
+        para ``compartido.jwt_local.ListaRevocacion``. Lanza RequestException si falla.
+        """
+        response = _usuarios.get(
+            "api/auth/revocados/",
+            params={"desde": desde} if desde else None,
+            headers={"X-Servicio-Token": settings.TOKEN_SERVICIOS_INTERNOS},
+        )
+        response.raise_for_status()
+        datos = response.json()
+        return [(r['jti'], r['expira']) for r in datos['revocados']], datos['hasta']
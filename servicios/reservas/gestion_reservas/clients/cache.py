@@ -0,0 +1,121 @@
+"""
+Caché en proceso de los datos estáticos de los vuelos.
+
+Ruta, horarios, aerolínea y precio cambian poco, así que ``VuelosClient`` los
+guarda ``VUELOS_CACHE_TTL`` segundos en un LRU de como mucho
+``VUELOS_CACHE_MAX_ENTRADAS`` vuelos. Los asientos disponibles no se guardan
+nunca (``CAMPOS_VIVOS``): cambian con cada reserva y se piden siempre al
+servicio de vuelos.
+
+Si varios hilos piden a la vez un vuelo que no está en caché, solo uno hace la
+llamada HTTP y el resto espera su resultado (coalescencia de peticiones).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+CAMPOS_VIVOS = ('asientos_disponibles',)
+
+
+class _EnVuelo:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+
+
+class CacheVuelos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()   # vuelo_id -> (caduca, datos)
+        self._en_vuelo = {}              # vuelo_id -> _EnVuelo
+        self.hits = 0
+        self.misses = 0
+        self.coalescidas = 0
+
+    def _vigente(self, vuelo_id):
+        entrada = self._entradas.get(vuelo_id)
+        if entrada is None:
+            return None
+        caduca, datos = entrada
+        if caduca <= time.monotonic():
+            del self._entradas[vuelo_id]
+            return None
+        self._entradas.move_to_end(vuelo_id)
+        return datos
+
+    def obtener(self, vuelo_id, cargar):
+        """
+        Devuelve los datos del vuelo, llamando a ``cargar(vuelo_id)`` si no
+        están en caché. Lo que sale de la caché no trae ``CAMPOS_VIVOS``; lo
+        recién cargado sí. Las respuestas ``None`` (vuelo inexistente o
+        servicio caído) no se guardan.
+        """
+        with self._lock:
+            datos = self._vigente(vuelo_id)
+            if datos is not None:
+                self.hits += 1
+                return datos
+            en_vuelo = self._en_vuelo.get(vuelo_id)
+            lider = en_vuelo is None
+            if lider:
+                en_vuelo = self._en_vuelo[vuelo_id] = _EnVuelo()
+                self.misses += 1
+            else:
+                self.coalescidas += 1
+
+        if not lider:
+            en_vuelo.evento.wait(settings.SERVICE_TIMEOUT * 2)
+            return en_vuelo.resultado
+
+        try:
+            en_vuelo.resultado = cargar(vuelo_id)
+            if en_vuelo.resultado is not None:
+                self.guardar(vuelo_id, en_vuelo.resultado)
+        finally:
+            with self._lock:
+                del self._en_vuelo[vuelo_id]
+            en_vuelo.evento.set()
+        return en_vuelo.resultado
+
+    def buscar(self, ids):
+        """Los vuelos de ``ids`` que están en caché, sin cargar los que faltan."""
+        with self._lock:
+            encontrados = {}
+            for vuelo_id in ids:
+                datos = self._vigente(vuelo_id)
+                if datos is not None:
+                    encontrados[vuelo_id] = datos
+            self.hits += len(encontrados)
+            self.misses += len(ids) - len(encontrados)
+            return encontrados
+
+    def guardar(self, vuelo_id, datos):
+        ttl = getattr(settings, 'VUELOS_CACHE_TTL', 30)
+        maximo = getattr(settings, 'VUELOS_CACHE_MAX_ENTRADAS', 1000)
+        estaticos = {campo: valor for campo, valor in datos.items() if campo not in CAMPOS_VIVOS}
+        with self._lock:
+            self._entradas[vuelo_id] = (time.monotonic() + ttl, estaticos)
+            self._entradas.move_to_end(vuelo_id)
+            while len(self._entradas) > maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, vuelo_id=None):
+        with self._lock:
+            if vuelo_id is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(vuelo_id, None)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalescidas': self.coalescidas,
+            }
+
+
+cache_vuelos = CacheVuelos()
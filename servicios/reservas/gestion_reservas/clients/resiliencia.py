@@ -0,0 +1,260 @@
+"""
+Capa HTTP común para las llamadas a otros servicios.
+
+Cada servicio remoto (``ClienteServicio``) tiene:
+
+* Una sesión ``requests`` con pool de conexiones keep-alive.
+* Un circuit breaker: tras ``SERVICIOS_FALLOS_APERTURA`` fallos seguidos el
+  circuito se abre y las llamadas fallan al instante con ``CircuitoAbierto``
+  durante ``SERVICIOS_SEGUNDOS_ABIERTO`` segundos; después se deja pasar una
+  única llamada de prueba que decide si se cierra o se vuelve a abrir. Así,
+  con un servicio caído los workers no se quedan bloqueados esperando el
+  timeout uno detrás de otro.
+* Reintentos acotados (``SERVICIOS_REINTENTOS``) con backoff exponencial y
+  jitter completo, solo para errores transitorios. Las peticiones no
+  idempotentes (p. ej. retener asientos) solo se reintentan si la conexión no
+  llegó a establecerse, para no aplicar dos veces el mismo cambio.
+* Plazo: ``PlazoMiddleware`` fija cuándo vence la petición entrante (o toma
+  el plazo que envía quien llama en ``X-Plazo-Ms``). Ningún intento ni espera
+  entre reintentos pasa de ese límite, y el tiempo restante se reenvía al
+  servicio llamado en la misma cabecera.
+* Métricas por servicio (``estadisticas()``).
+
+Todos los errores son ``RequestException``, así que quien ya capturaba esa
+excepción sigue funcionando igual.
+"""
+import contextvars
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, ConnectTimeout, RequestException, Timeout
+from urllib3.exceptions import NewConnectionError
+
+from compartido import trazas
+from compartido.metricas import llamadas_servicio
+
+from ..medicion import medir
+
+CABECERA_PLAZO = 'X-Plazo-Ms'
+METODOS_IDEMPOTENTES = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+ESTADOS_TRANSITORIOS = frozenset({502, 503, 504})
+
+# Instante (time.monotonic) en que vence la petición que se está atendiendo
+_plazo = contextvars.ContextVar('plazo_peticion', default=None)
+
+
+class CircuitoAbierto(RequestException):
+    """El servicio está marcado como caído: la llamada ni se intenta."""
+
+
+class PlazoAgotado(Timeout):
+    """No queda tiempo de la petición entrante para llamar al servicio."""
+
+
+def fijar_plazo(segundos):
+    """Fija el plazo de la petición actual. Devuelve el token para ``restaurar_plazo``."""
+    return _plazo.set(time.monotonic() + segundos)
+
+
+def restaurar_plazo(token):
+    _plazo.reset(token)
+
+
+def tiempo_restante():
+    plazo = _plazo.get()
+    return None if plazo is None else plazo - time.monotonic()
+
+
+class CircuitBreaker:
+    CERRADO, ABIERTO, SEMIABIERTO = 'cerrado', 'abierto', 'semiabierto'
+
+    def __init__(self, fallos_apertura, segundos_abierto):
+        self.fallos_apertura = fallos_apertura
+        self.segundos_abierto = segundos_abierto
+        self._lock = threading.Lock()
+        self.estado = self.CERRADO
+        self.fallos = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = None  # hilo que hace la llamada de prueba
+
+    def permitir(self):
+        with self._lock:
+            if self.estado == self.CERRADO:
+                return True
+            if self.estado == self.ABIERTO:
+                if time.monotonic() - self._abierto_desde < self.segundos_abierto:
+                    return False
+                self.estado = self.SEMIABIERTO
+            # Semiabierto: una sola llamada de prueba a la vez
+            if self._prueba_en_curso is not None:
+                return False
+            self._prueba_en_curso = threading.get_ident()
+            return True
+
+    def exito(self):
+        with self._lock:
+            self.estado = self.CERRADO
+            self.fallos = 0
+            self._prueba_en_curso = None
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            if self.estado == self.SEMIABIERTO or self.fallos >= self.fallos_apertura:
+                self.estado = self.ABIERTO
+                self._abierto_desde = time.monotonic()
+            self._prueba_en_curso = None
+
+    def terminar_prueba(self):
+        """Suelta la llamada de prueba de este hilo si acabó sin ``exito()`` ni ``fallo()``."""
+        with self._lock:
+            if self._prueba_en_curso == threading.get_ident():
+                self._prueba_en_curso = None
+
+
+class Metricas:
+    CAMPOS = ('llamadas', 'exitos', 'fallos', 'reintentos', 'rechazadas', 'sin_plazo')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.valores = dict.fromkeys(self.CAMPOS, 0)
+        self.segundos = 0.0
+
+    def incr(self, campo, segundos=None):
+        with self._lock:
+            self.valores[campo] += 1
+            if segundos is not None:
+                self.segundos += segundos
+
+    def snapshot(self):
+        with self._lock:
+            datos = dict(self.valores)
+            intentos = datos['exitos'] + datos['fallos']
+            datos['latencia_media_ms'] = round(1000 * self.segundos / intentos, 2) if intentos else None
+            return datos
+
+
+class ClienteServicio:
+    def __init__(self, nombre, url_setting):
+        self.nombre = nombre
+        self.url_setting = url_setting
+        self.metricas = Metricas()
+        self.breaker = CircuitBreaker(
+            getattr(settings, 'SERVICIOS_FALLOS_APERTURA', 5),
+            getattr(settings, 'SERVICIOS_SEGUNDOS_ABIERTO', 10),
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=getattr(settings, 'SERVICIOS_POOL', 20), max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _timeout(self):
+        timeout = settings.SERVICE_TIMEOUT
+        restante = tiempo_restante()
+        if restante is not None:
+            if restante <= 0:
+                self.metricas.incr('sin_plazo')
+                raise PlazoAgotado(f'Sin tiempo para llamar a {self.nombre}')
+            timeout = min(timeout, restante)
+        return timeout
+
+    def request(self, method, path, idempotente=None, **kwargs):
+        method = method.upper()
+        if idempotente is None:
+            idempotente = method in METODOS_IDEMPOTENTES
+        url = f"{getattr(settings, self.url_setting)}/{path.lstrip('/')}"
+        reintentos = getattr(settings, 'SERVICIOS_REINTENTOS', 2)
+
+        for intento in range(reintentos + 1):
+            timeout = self._timeout()
+            if not self.breaker.permitir():
+                self.metricas.incr('rechazadas')
+                raise CircuitoAbierto(f'Servicio {self.nombre} no disponible')
+
+            headers = dict(kwargs.pop('headers', None) or {})
+            headers[CABECERA_PLAZO] = str(int(timeout * 1000))
+            kwargs['headers'] = headers
+
+            self.metricas.incr('llamadas')
+            inicio = time.monotonic()
+            try:
+                with medir('upstream'), trazas.span(
+                    f'{method} {self.nombre}', tipo='cliente', ruta=path, intento=intento,
+                ) as span:
+                    headers.update(trazas.cabeceras())
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                    if span is not None:
+                        span.atributos['status'] = response.status_code
+            except RequestException as e:
+                self.breaker.fallo()
+                self.metricas.incr('fallos', time.monotonic() - inicio)
+                llamadas_servicio.observar((self.nombre, method, 'error'), time.monotonic() - inicio)
+                repetible = isinstance(e, (Timeout, ConnectionError)) and (idempotente or _sin_conectar(e))
+                if intento == reintentos or not repetible:
+                    raise
+            else:
+                llamadas_servicio.observar((self.nombre, method, response.status_code), time.monotonic() - inicio)
+                if response.status_code >= 500:
+                    self.breaker.fallo()
+                    self.metricas.incr('fallos', time.monotonic() - inicio)
+                    if intento == reintentos or not idempotente or response.status_code not in ESTADOS_TRANSITORIOS:
+                        return response
+                else:
+                    self.breaker.exito()
+                    self.metricas.incr('exitos', time.monotonic() - inicio)
+                    return response
+            finally:
+                # Otra excepción (p. ej. al construir la petición) no cuenta como
+                # fallo, pero sin esto el circuito semiabierto no dejaría pasar nada más
+                self.breaker.terminar_prueba()
+
+            self.metricas.incr('reintentos')
+            self._esperar(intento)
+
+    def _esperar(self, intento):
+        # Backoff exponencial con jitter completo, sin pasarse del plazo
+        base = getattr(settings, 'SERVICIOS_BACKOFF_BASE', 0.05)
+        espera = random.uniform(0, min(1.0, base * 2 ** intento))
+        restante = tiempo_restante()
+        if restante is not None:
+            espera = min(espera, max(restante, 0))
+        time.sleep(espera)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+
+def _sin_conectar(error):
+    """Si el error ocurrió antes de enviar nada (se puede repetir cualquier método)."""
+    if isinstance(error, ConnectTimeout):
+        return True
+    # requests envuelve en ConnectionError tanto el fallo al conectar como el
+    # corte de una conexión ya establecida; solo el primero es seguro repetir
+    motivo = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(motivo, NewConnectionError)
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def cliente(nombre, url_setting):
+    """``ClienteServicio`` compartido por todo el proceso para ese servicio."""
+    with _clientes_lock:
+        if nombre not in _clientes:
+            _clientes[nombre] = ClienteServicio(nombre, url_setting)
+        return _clientes[nombre]
+
+
+def estadisticas():
+    return {
+        nombre: dict(c.metricas.snapshot(), circuito=c.breaker.estado)
+        for nombre, c in _clientes.items()
+    }
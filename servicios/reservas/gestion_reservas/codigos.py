@@ -0,0 +1,124 @@
+"""
+Generador de códigos de reserva únicos por construcción.
+
+Cada código sale de un número de secuencia: el número se pasa por una
+permutación con clave de ``[0, 36**8)`` (``permutar``) y el resultado se
+codifica en base 36 con 8 caracteres (36**8 ≈ 2,8 billones de códigos). Los
+números se reparten en bloques (Hi/Lo): cada proceso reserva un bloque de
+``CODIGO_RESERVA_BLOQUE`` números con un único ``UPDATE`` sobre la fila de
+``SecuenciaCodigoReserva`` y luego los entrega desde memoria. Como el bloque se
+obtiene de forma atómica en la base de datos compartida y la permutación es
+biyectiva, dos workers (del mismo nodo o de nodos distintos) nunca reciben el
+mismo código.
+
+La permutación (una red de Feistel con HMAC-SHA256 y ``CODIGO_RESERVA_CLAVE``)
+hace que códigos consecutivos no se parezcan: conocer un código no permite
+adivinar los de otras reservas. Los códigos antiguos eran aleatorios y pueden
+coincidir con alguno de los nuevos, así que al reservar un bloque se descartan,
+con una sola consulta, los códigos del bloque que ya existen.
+"""
+import hashlib
+import hmac
+import os
+import string
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Reserva, SecuenciaCodigoReserva
+
+ALFABETO = string.digits + string.ascii_uppercase
+LONGITUD = 8
+MAXIMO = len(ALFABETO) ** LONGITUD
+SECUENCIA = 'codigo_reserva'
+
+# La red de Feistel trabaja sobre 2 * 21 bits (2**42 > 36**8)
+_MITAD = 21
+_MASCARA = (1 << _MITAD) - 1
+_RONDAS = 4
+
+
+def codificar(numero):
+    """Codifica ``numero`` en base 36 con ``LONGITUD`` caracteres."""
+    if not 0 <= numero < MAXIMO:
+        raise ValueError('Secuencia de códigos de reserva agotada')
+    caracteres = []
+    for _ in range(LONGITUD):
+        numero, resto = divmod(numero, len(ALFABETO))
+        caracteres.append(ALFABETO[resto])
+    return ''.join(reversed(caracteres))
+
+
+def _clave():
+    return getattr(settings, 'CODIGO_RESERVA_CLAVE', settings.SECRET_KEY).encode()
+
+
+def permutar(numero, clave=None):
+    """Biyección con clave de ``[0, MAXIMO)`` en sí mismo."""
+    clave = clave or _clave()
+    while True:
+        izquierda, derecha = numero >> _MITAD, numero & _MASCARA
+        for ronda in range(_RONDAS):
+            resumen = hmac.new(clave, f'{ronda}:{derecha}'.encode(), hashlib.sha256).digest()
+            izquierda, derecha = derecha, izquierda ^ (int.from_bytes(resumen[:4], 'big') & _MASCARA)
+        numero = (izquierda << _MITAD) | derecha
+        # Cycle walking: la red permuta [0, 2**42); se repite hasta volver al rango
+        if numero < MAXIMO:
+            return numero
+
+
+def reservar_bloque(tamano, nombre=SECUENCIA):
+    """Reserva ``tamano`` números de la secuencia y devuelve el primero."""
+    with transaction.atomic():
+        # El UPDATE bloquea la fila hasta el commit: la lectura posterior ve
+        # nuestro incremento y ningún otro proceso puede obtener el mismo rango
+        actualizados = SecuenciaCodigoReserva.objects.filter(nombre=nombre).update(
+            siguiente=F('siguiente') + tamano
+        )
+        if not actualizados:
+            SecuenciaCodigoReserva.objects.bulk_create(
+                [SecuenciaCodigoReserva(nombre=nombre, siguiente=1)], ignore_conflicts=True
+            )
+            SecuenciaCodigoReserva.objects.filter(nombre=nombre).update(
+                siguiente=F('siguiente') + tamano
+            )
+        siguiente = SecuenciaCodigoReserva.objects.values_list('siguiente', flat=True).get(nombre=nombre)
+    return siguiente - tamano
+
+
+class GeneradorCodigos:
+    def __init__(self, tamano_bloque=None):
+        self.tamano_bloque = tamano_bloque
+        self._lock = threading.Lock()
+        self._codigos = []
+        self._pid = None
+
+    def _bloque(self):
+        tamano = self.tamano_bloque or getattr(settings, 'CODIGO_RESERVA_BLOQUE', 100)
+        inicio = reservar_bloque(tamano)
+        clave = _clave()
+        codigos = [codificar(permutar(numero, clave)) for numero in range(inicio, inicio + tamano)]
+        existentes = set(
+            Reserva.objects.filter(codigo_reserva__in=codigos).values_list('codigo_reserva', flat=True)
+        )
+        # Se entregan con pop() desde el final: se invierten para respetar el orden de la secuencia
+        return [codigo for codigo in reversed(codigos) if codigo not in existentes]
+
+    def siguiente(self):
+        with self._lock:
+            # Un proceso hijo hereda el bloque del padre tras un fork: lo descarta
+            if self._pid != os.getpid():
+                self._codigos = []
+                self._pid = os.getpid()
+            while not self._codigos:
+                self._codigos = self._bloque()
+            return self._codigos.pop()
+
+
+generador = GeneradorCodigos()
+
+
+def nuevo_codigo():
+    return generador.siguiente()
@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client, override_settings
+
+from compartido import identidad
+from gestion_reservas.models import Reserva
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de escritura sobre ReservaListCreateView.create: varios hilos '
+        'crean reservas a la vez contra cada perfil de base de datos (DB_PERFIL) y se '
+        'comparan rendimiento, latencias y errores. Cada perfil corre en un proceso '
+        'aparte sobre una base de datos temporal (un fichero SQLite nuevo o la base de '
+        'datos de test de PostgreSQL). El servicio de vuelos se simula en memoria.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--perfiles', default='sqlite-basico,sqlite',
+            help='Perfiles separados por comas (sqlite-basico, sqlite, postgres)',
+        )
+        parser.add_argument('--hilos', type=int, default=16)
+        parser.add_argument('--reservas', type=int, default=2000, help='Reservas en total')
+        parser.add_argument('--pasajeros', type=int, default=2)
+        parser.add_argument('--proceso', action='store_true', help='Uso interno: ejecuta un solo perfil')
+
+    def handle(self, *args, **options):
+        if options['proceso']:
+            self._proceso(options)
+            return
+
+        resultados = []
+        for perfil in options['perfiles'].split(','):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = {**os.environ, 'DB_PERFIL': perfil}
+                if perfil.startswith('sqlite'):
+                    env['DB_NOMBRE'] = os.path.join(tmp, 'carga.sqlite3')
+                salida = subprocess.run(
+                    [
+                        sys.executable, str(settings.BASE_DIR / 'manage.py'), 'carga_reservas', '--proceso',
+                        '--hilos', str(options['hilos']), '--reservas', str(options['reservas']),
+                        '--pasajeros', str(options['pasajeros']),
+                    ],
+                    env=env, capture_output=True, text=True,
+                )
+            if salida.returncode:
+                raise CommandError(f'El perfil {perfil} falló:\n{salida.stderr}')
+            resultados.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+        self.stdout.write(
+            f"{'perfil':<14} {'reservas/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8} {'guardadas':>9}"
+        )
+        for r in resultados:
+            self.stdout.write(
+                f"{r['perfil']:<14} {r['por_segundo']:>10.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                f"{r['errores']:>8} {r['guardadas']:>9}"
+            )
+
+    def _proceso(self, options):
+        perfil = os.environ.get('DB_PERFIL', 'sqlite')
+        if connection.vendor == 'sqlite':
+            call_command('migrate', verbosity=0)
+            nombre_test = None
+        else:
+            nombre_test = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # Los 5xx se registrarían siempre: aquí solo interesan los contadores
+        logging.getLogger('reservas.accesos').disabled = True
+
+        hilos, total, pasajeros = options['hilos'], options['reservas'], options['pasajeros']
+        cuerpo = json.dumps({
+            'vuelo_id': 1,
+            'asientos': pasajeros,
+            'pasajeros': [
+                {
+                    'nombre': f'Pasajero {i}', 'apellido': 'Carga', 'tipo_documento': 'Pasaporte',
+                    'numero_documento': f'C{i:07d}', 'fecha_nacimiento': '1990-01-01',
+                }
+                for i in range(pasajeros)
+            ],
+        })
+        latencias, errores = [], []
+
+        def trabajar(indice):
+            client = Client(raise_request_exception=False)
+            cabecera = identidad.firmar(indice + 1, f'carga{indice}', time.time() + 3600, f'carga-{indice}')
+            for _ in range(total // hilos):
+                t0 = time.perf_counter()
+                response = client.post(
+                    '/api/reservas/', cuerpo, content_type='application/json', HTTP_X_IDENTIDAD=cabecera,
+                )
+                latencias.append(time.perf_counter() - t0)
+                if response.status_code != 201:
+                    errores.append(response.status_code)
+                # Lo que haría el servidor al terminar la petición (respeta CONN_MAX_AGE)
+                close_old_connections()
+            connection.close()
+
+        with mock.patch('gestion_reservas.views.VuelosClient') as VuelosClient, \
+                override_settings(ALLOWED_HOSTS=['*']):
+            VuelosClient.obtener_vuelo.return_value = {'precio_base': '100.00'}
+            VuelosClient.retener_asientos.return_value = True
+            inicio = time.perf_counter()
+            trabajadores = [threading.Thread(target=trabajar, args=(i,)) for i in range(hilos)]
+            for hilo in trabajadores:
+                hilo.start()
+            for hilo in trabajadores:
+                hilo.join()
+            duracion = time.perf_counter() - inicio
+
+        guardadas = Reserva.objects.count()
+        if nombre_test is not None:
+            connection.creation.destroy_test_db(nombre_test, verbosity=0)
+
+        latencias.sort()
+        self.stdout.write(json.dumps({
+            'perfil': perfil,
+            'por_segundo': len(latencias) / duracion,
+            'p50_ms': statistics.median(latencias) * 1000,
+            'p99_ms': latencias[int(len(latencias) * 0.99) - 1] * 1000,
+            'errores': len(errores),
+            'guardadas': guardadas,
+        }))
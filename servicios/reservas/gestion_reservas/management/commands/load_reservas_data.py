@@ -1,8 +1,8 @@
 from django.core.management.base import BaseCommand
 from gestion_reservas.models import Reserva, Pasajero
+from gestion_reservas.codigos import nuevo_codigo
 from datetime import datetime, timedelta
 import random
-import string
 
 class Command(BaseCommand):
     help = 'Carga datos iniciales de reservas para pruebas'
@@ -10,7 +10,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         # Crear algunas reservas de prueba
         for i in range(1, 6):
-            codigo = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+            codigo = nuevo_codigo()
             reserva = Reserva.objects.create(
                 usuario_id=i,
                 vuelo_id=random.randint(1, 10),
@@ -0,0 +1,66 @@
+"""
+Desglose de tiempos de la petición en curso.
+
+``RegistroAccesosMiddleware`` abre una ``Medicion`` por petición; las distintas
+capas suman su parte con ``medir(campo)``: autenticación, llamadas a otros
+servicios (``clients.resiliencia``) y serialización. El tiempo de BD lo mide el
+propio middleware con ``connection.execute_wrapper``. Fuera de una petición
+(comandos, hilos en segundo plano) ``medir`` no hace nada.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_actual = contextvars.ContextVar('medicion', default=None)
+
+
+class Medicion:
+    CAMPOS = ('auth', 'db', 'upstream', 'serializacion')
+
+    def __init__(self):
+        self.segundos = dict.fromkeys(self.CAMPOS, 0.0)
+        self.llamadas = dict.fromkeys(self.CAMPOS, 0)
+
+    def sumar(self, campo, segundos):
+        self.segundos[campo] += segundos
+        self.llamadas[campo] += 1
+
+    def resumen(self):
+        datos = {}
+        for campo in self.CAMPOS:
+            datos[f'{campo}_ms'] = round(self.segundos[campo] * 1000, 3)
+        datos['db_consultas'] = self.llamadas['db']
+        datos['upstream_llamadas'] = self.llamadas['upstream']
+        return datos
+
+
+def iniciar():
+    medicion = Medicion()
+    return medicion, _actual.set(medicion)
+
+
+def terminar(token):
+    _actual.reset(token)
+
+
+def actual():
+    return _actual.get()
+
+
+@contextmanager
+def medir(campo):
+    medicion = _actual.get()
+    if medicion is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion.sumar(campo, time.perf_counter() - inicio)
+
+
+def medir_db(execute, sql, params, many, context):
+    """Para ``connection.execute_wrapper``: tiempo y número de consultas."""
+    with medir('db'):
+        return execute(sql, params, many, context)
@@ -19,7 +19,8 @@ class Reserva(models.Model):
     class Meta:
         ordering = ['-fecha_reserva']
         indexes = [
-            models.Index(fields=['usuario_id']),
+            # Listado de reservas de un usuario: filtro y orden (keyset) salen del índice
+            models.Index(fields=['usuario_id', '-fecha_reserva', '-id'], name='reserva_usuario_fecha_idx'),
             models.Index(fields=['vuelo_id']),
         ]
 
@@ -35,4 +36,12 @@ class Pasajero(models.Model):
     fecha_nacimiento = models.DateField()
 
     def __str__(self):
-        return f"{self.nombre} {self.apellido}"
\ No newline at end of file
+        return f"{self.nombre} {self.apellido}"
+
+class SecuenciaCodigoReserva(models.Model):
+    """Contador compartido del que cada proceso reserva bloques de códigos (ver codigos.py)."""
+    nombre = models.CharField(max_length=50, primary_key=True)
+    siguiente = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.siguiente}"
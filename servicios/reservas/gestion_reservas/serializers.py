@@ -1,11 +1,23 @@
+from django.db import transaction
 from rest_framework import serializers
+from .medicion import medir
 from .models import Reserva, Pasajero
 import decimal
 
+class PasajerosListSerializer(serializers.ListSerializer):
+    def get_attribute(self, instance):
+        # Los pasajeros recién creados (ver ReservaSerializer.create) se
+        # serializan sin volver a consultarlos
+        creados = self.context.get('pasajeros_creados', {})
+        if instance.pk in creados:
+            return creados[instance.pk]
+        return super().get_attribute(instance)
+
 class PasajeroSerializer(serializers.ModelSerializer):
     class Meta:
         model = Pasajero
         fields = ['nombre', 'apellido', 'tipo_documento', 'numero_documento', 'fecha_nacimiento']
+        list_serializer_class = PasajerosListSerializer
 
 class ReservaSerializer(serializers.ModelSerializer):
     pasajeros = PasajeroSerializer(many=True, required=True)
@@ -16,7 +28,21 @@ class ReservaSerializer(serializers.ModelSerializer):
         model = Reserva
         fields = ['id', 'vuelo_id', 'asientos', 'pasajeros', 'precio_total', 'estado', 'codigo_reserva']
         read_only_fields = ['id', 'precio_total', 'estado', 'codigo_reserva']
-        
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Vuelo y asientos quedan fijados al crear la reserva: cambiarlos no
+        # movería los asientos retenidos en el servicio de vuelos
+        if self.instance is not None:
+            fields['vuelo_id'] = serializers.IntegerField(read_only=True)
+            fields['asientos'] = serializers.IntegerField(read_only=True)
+        return fields
+
+    def to_representation(self, instance):
+        # Tiempo de serialización para el registro de accesos
+        with medir('serializacion'):
+            return super().to_representation(instance)
+
     def create(self, validated_data):
         pasajeros_data = validated_data.pop('pasajeros')
         
@@ -27,11 +53,15 @@ class ReservaSerializer(serializers.ModelSerializer):
             except (decimal.InvalidOperation, ValueError):
                 raise serializers.ValidationError({"precio_total": "Formato de precio inválido"})
         
-        reserva = Reserva.objects.create(**validated_data)
-        
-        for pasajero_data in pasajeros_data:
-            Pasajero.objects.create(reserva=reserva, **pasajero_data)
-            
+        # Reserva y pasajeros en una sola transacción, con un único INSERT para todos los pasajeros
+        with transaction.atomic():
+            reserva = Reserva.objects.create(**validated_data)
+            pasajeros = Pasajero.objects.bulk_create(
+                [Pasajero(reserva=reserva, **pasajero_data) for pasajero_data in pasajeros_data]
+            )
+
+        # La respuesta usa la lista creada en lugar de volver a consultar los pasajeros
+        self.context.setdefault('pasajeros_creados', {})[reserva.pk] = pasajeros
         return reserva
 
     def validate_asientos(self, value):
@@ -1,3 +1,542 @@
-from django.test import TestCase
+import logging
+import threading
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from requests.exceptions import ConnectionError, ReadTimeout
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from compartido import identidad, trazas
+from compartido.jwt_local import cache_tokens
+
+from . import codigos
+from .authentication import SimpleUser, lista_revocacion
+from .clients import VuelosClient
+from .clients.cache import cache_vuelos
+from .clients.resiliencia import CircuitoAbierto, ClienteServicio, fijar_plazo, restaurar_plazo
+from .models import Pasajero, Reserva, SecuenciaCodigoReserva
+
+
+def setUpModule():
+    # Los registros de acceso de las peticiones de los tests no se escriben en la consola
+    patcher = mock.patch.object(logging.getLogger('reservas.accesos'), 'disabled', True)
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
+
+
+def datos_reserva(pasajeros):
+    return {
+        'vuelo_id': 1,
+        'asientos': pasajeros,
+        'pasajeros': [
+            {
+                'nombre': f'Pasajero {i}',
+                'apellido': 'Pérez',
+                'tipo_documento': 'Pasaporte',
+                'numero_documento': f'DOC{i:06d}',
+                'fecha_nacimiento': '1990-01-01',
+            }
+            for i in range(pasajeros)
+        ],
+    }
+
+
+@mock.patch('gestion_reservas.views.VuelosClient')
+class CrearReservaConsultasTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(SimpleUser(id=1, username='jperez'))
+        # Bloque de códigos ya reservado: así solo se cuentan las consultas de la reserva
+        generador = codigos.GeneradorCodigos(tamano_bloque=1000)
+        generador.siguiente()
+        patcher = mock.patch.object(codigos, 'generador', generador)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _crear(self, VuelosClient, pasajeros):
+        VuelosClient.obtener_vuelo.return_value = {'precio_base': '100.00'}
+        VuelosClient.retener_asientos.return_value = True
+        return self.client.post('/api/reservas/', datos_reserva(pasajeros), format='json')
+
+    def test_reserva_de_grupo_cuesta_consultas_constantes(self, VuelosClient):
+        # SAVEPOINT, INSERT reserva, INSERT pasajeros (uno para todos), RELEASE
+        with self.assertNumQueries(4):
+            response = self._crear(VuelosClient, 1)
+        self.assertEqual(response.status_code, 201)
+
+        with self.assertNumQueries(4):
+            response = self._crear(VuelosClient, 10)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['pasajeros']), 10)
+        self.assertEqual(Pasajero.objects.filter(reserva_id=response.data['id']).count(), 10)
+
+    def test_fallo_al_guardar_no_deja_reserva_a_medias(self, VuelosClient):
+        with mock.patch.object(Pasajero.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self._crear(VuelosClient, 3)
+        self.assertFalse(Reserva.objects.exists())
+        VuelosClient.liberar_asientos.assert_called_once_with(1, 3)
+
+
+class CodigoReservaTest(TestCase):
+    def test_codificacion_de_ocho_caracteres(self):
+        self.assertEqual(codigos.codificar(0), '00000000')
+        self.assertEqual(codigos.codificar(36), '00000010')
+        self.assertEqual(codigos.codificar(codigos.MAXIMO - 1), 'ZZZZZZZZ')
+        with self.assertRaises(ValueError):
+            codigos.codificar(codigos.MAXIMO)
+
+    def test_workers_distintos_no_repiten_codigos(self):
+        # Cada generador simula un worker con su propio bloque en memoria
+        generadores = [codigos.GeneradorCodigos(tamano_bloque=7) for _ in range(3)]
+        emitidos = [g.siguiente() for _ in range(20) for g in generadores]
+        self.assertEqual(len(emitidos), len(set(emitidos)))
+        self.assertTrue(all(len(codigo) == codigos.LONGITUD for codigo in emitidos))
+
+    def test_codigos_no_consecutivos(self):
+        numeros = [codigos.permutar(n, b'clave') for n in range(1000)]
+        self.assertEqual(len(set(numeros)), 1000)
+        self.assertTrue(all(0 <= n < codigos.MAXIMO for n in numeros))
+        # Un código no delata al siguiente, y con otra clave salen otros códigos
+        self.assertFalse(any(abs(b - a) < 36 for a, b in zip(numeros, numeros[1:])))
+        self.assertNotEqual(numeros[:10], [codigos.permutar(n, b'otra') for n in range(10)])
+
+    @override_settings(CODIGO_RESERVA_CLAVE='clave-de-prueba')
+    def test_no_repite_codigos_existentes(self):
+        # Códigos antiguos (aleatorios) que coinciden con el 2.º y el 4.º del primer bloque
+        clave = b'clave-de-prueba'
+        inicio = SecuenciaCodigoReserva.objects.filter(nombre=codigos.SECUENCIA).values_list(
+            'siguiente', flat=True).first() or 1
+        previstos = [codigos.codificar(codigos.permutar(n, clave)) for n in range(inicio, inicio + 5)]
+        for codigo in (previstos[1], previstos[3]):
+            Reserva.objects.create(
+                usuario_id=1, vuelo_id=1, asientos=1, precio_total='100.00', codigo_reserva=codigo,
+            )
+
+        generador = codigos.GeneradorCodigos(tamano_bloque=5)
+        emitidos = [generador.siguiente() for _ in range(5)]
+
+        self.assertEqual(emitidos[:3], [previstos[0], previstos[2], previstos[4]])
+        self.assertEqual(len(set(emitidos)), 5)
+        self.assertFalse(Reserva.objects.filter(codigo_reserva__in=emitidos).exists())
+
+    def test_consulta_por_codigo_solo_del_propio_usuario(self):
+        reserva = Reserva.objects.create(
+            usuario_id=1, vuelo_id=1, asientos=1, precio_total='100.00',
+            codigo_reserva=codigos.nuevo_codigo(),
+        )
+        client = APIClient()
+        client.force_authenticate(SimpleUser(id=1, username='jperez'))
+        url = f'/api/reservas/codigo/{reserva.codigo_reserva.lower()}/'
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], reserva.id)
+
+        client.force_authenticate(SimpleUser(id=2, username='otro'))
+        self.assertEqual(client.get(url).status_code, 404)
+
+
+class ListadoReservasConsultasTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(SimpleUser(id=1, username='jperez'))
+        for i in range(5):
+            reserva = Reserva.objects.create(
+                usuario_id=1, vuelo_id=1, asientos=2, precio_total='200.00',
+                codigo_reserva=f'LISTA{i:03d}',
+            )
+            Pasajero.objects.bulk_create([
+                Pasajero(
+                    reserva=reserva, nombre=f'Pasajero {j}', apellido='Pérez',
+                    tipo_documento='Pasaporte', numero_documento=f'DOC{i}{j}',
+                    fecha_nacimiento='1990-01-01',
+                )
+                for j in range(2)
+            ])
+        self.reserva = reserva
+
+    def test_listado_sin_n_mas_1(self):
+        # Una consulta para las reservas y otra para todos sus pasajeros
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/reservas/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertTrue(all(len(r['pasajeros']) == 2 for r in response.data['results']))
+
+    def test_detalle_trae_pasajeros_en_una_consulta(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/reservas/{self.reserva.id}/')
+        self.assertEqual(len(response.data['pasajeros']), 2)
+
+    def test_paginas_con_fechas_empatadas(self):
+        # Misma fecha para todas: el orden y el cursor dependen del desempate por id
+        Reserva.objects.update(fecha_reserva=timezone.now())
+        ids, url, params = [], '/api/reservas/', {'page_size': 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [r['id'] for r in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(ids, sorted(Reserva.objects.values_list('id', flat=True), reverse=True))
+
+    def test_cursor_alterado_responde_400(self):
+        response = self.client.get('/api/reservas/', {'page_size': 2, 'cursor': 'eyJvIjpbXX0='})
+        self.assertEqual(response.status_code, 400)
+
+
+@mock.patch('gestion_reservas.views.VuelosClient')
+class CancelacionReservaTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(SimpleUser(id=1, username='jperez'))
+        self.reserva = Reserva.objects.create(
+            usuario_id=1, vuelo_id=7, asientos=2, precio_total='200.00', codigo_reserva='CANCEL01',
+        )
+        self.url = f'/api/reservas/{self.reserva.id}/'
+
+    def test_cancelar_dos_veces_libera_una_sola_vez(self, VuelosClient):
+        VuelosClient.liberar_asientos.return_value = True
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        VuelosClient.liberar_asientos.assert_called_once_with(7, 2)
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.estado, 'X')
+
+    def test_cancelacion_simultanea_libera_una_sola_vez(self, VuelosClient):
+        # El segundo DELETE llega mientras el primero está liberando los asientos
+        segunda = []
+
+        def liberar(vuelo_id, asientos):
+            if not segunda:
+                segunda.append(self.client.delete(self.url))
+            return True
+
+        VuelosClient.liberar_asientos.side_effect = liberar
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(segunda[0].status_code, 204)
+        self.assertEqual(VuelosClient.liberar_asientos.call_count, 1)
+
+    def test_fallo_al_liberar_deja_la_reserva_activa(self, VuelosClient):
+        VuelosClient.liberar_asientos.return_value = None
+        self.assertEqual(self.client.delete(self.url).status_code, 503)
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.estado, 'P')
+
+        # El reintento libera los asientos una vez y cancela
+        VuelosClient.liberar_asientos.return_value = True
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(VuelosClient.liberar_asientos.call_count, 2)
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.estado, 'X')
+
+    def test_se_confirma_antes_de_liberar_y_se_compensa_si_falla(self, VuelosClient):
+        estados = []
+
+        def liberar(vuelo_id, asientos):
+            # La cancelación ya está guardada mientras se llama a vuelos
+            estados.append(Reserva.objects.get(pk=self.reserva.pk).estado)
+            raise RuntimeError('fallo inesperado')
+
+        VuelosClient.liberar_asientos.side_effect = liberar
+        with self.assertRaises(RuntimeError):
+            self.client.delete(self.url)
+        self.assertEqual(estados, ['X'])
+        self.reserva.refresh_from_db()
+        self.assertEqual(self.reserva.estado, 'P')
+
+    def test_actualizar_no_cambia_vuelo_ni_asientos(self, VuelosClient):
+        response = self.client.patch(self.url, {'vuelo_id': 8, 'asientos': 9}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['vuelo_id'], response.data['asientos']), (7, 2))
+        self.reserva.refresh_from_db()
+        self.assertEqual((self.reserva.vuelo_id, self.reserva.asientos), (7, 2))
+        VuelosClient.retener_asientos.assert_not_called()
+        VuelosClient.liberar_asientos.assert_not_called()
+
+
+class CacheVuelosClientTest(SimpleTestCase):
+    def setUp(self):
+        cache_vuelos.invalidar()
+        self.addCleanup(cache_vuelos.invalidar)
+        self.llamadas = []
+        self.asientos = 100
+        patcher = mock.patch('gestion_reservas.clients._vuelos.session.request', side_effect=self._get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, method, url, **kwargs):
+        self.llamadas.append(url)
+        time.sleep(0.05)
+        if url.endswith('/asientos/'):
+            datos = {'id': 7, 'asientos_disponibles': self.asientos}
+        else:
+            datos = {'id': 7, 'precio_base': '120.00', 'asientos_disponibles': self.asientos}
+        return mock.Mock(status_code=200, json=mock.Mock(return_value=datos))
+
+    def test_peticiones_simultaneas_comparten_una_llamada(self):
+        resultados = []
+        hilos = [
+            threading.Thread(target=lambda: resultados.append(VuelosClient.obtener_vuelo(7, asientos=False)))
+            for _ in range(8)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(self.llamadas), 1)
+        self.assertEqual([r['precio_base'] for r in resultados], ['120.00'] * 8)
+
+    def test_asientos_siempre_en_vivo(self):
+        self.assertEqual(VuelosClient.obtener_vuelo(7)['asientos_disponibles'], 100)
+        self.asientos = 97
+        vuelo = VuelosClient.obtener_vuelo(7)
+        self.assertEqual(vuelo['asientos_disponibles'], 97)
+        self.assertEqual(vuelo['precio_base'], '120.00')
+        # La segunda consulta solo pide los asientos
+        self.assertEqual(len(self.llamadas), 2)
+        self.assertTrue(self.llamadas[1].endswith('/7/asientos/'))
+
+    def test_lote_pide_solo_los_que_faltan_en_una_llamada(self):
+        VuelosClient.obtener_vuelo(7, asientos=False)
+        lote = [
+            {'id': 8, 'precio_base': '80.00', 'asientos_disponibles': 5},
+            {'id': 9, 'precio_base': '90.00', 'asientos_disponibles': 5},
+        ]
+        with mock.patch(
+            'gestion_reservas.clients._vuelos.session.request',
+            return_value=mock.Mock(status_code=200, json=mock.Mock(return_value=lote)),
+        ) as get:
+            vuelos = VuelosClient.obtener_vuelos([9, 7, 8, 404, 9])
+        get.assert_called_once()
+        self.assertTrue(get.call_args.args[1].endswith('/lote/?ids=9,8,404'))
+        self.assertEqual(list(vuelos), [9, 7, 8])
+        self.assertEqual(vuelos[7]['precio_base'], '120.00')
+        self.assertNotIn('asientos_disponibles', vuelos[8])
+
+
+class AsientosClientTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('gestion_reservas.clients._vuelos.session.request')
+        self.request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def responde(self, status_code):
+        self.request.return_value = mock.Mock(status_code=status_code)
+
+    def test_retener(self):
+        for status_code, esperado in ((500, None), (200, True), (404, False), (409, False), (400, None), (403, None)):
+            self.responde(status_code)
+            self.assertIs(VuelosClient.retener_asientos(7, 2), esperado, status_code)
+
+    def test_liberar(self):
+        # Un vuelo que ya no existe no tiene asientos que liberar
+        for status_code, esperado in ((500, None), (200, True), (404, True), (400, None), (403, None)):
+            self.responde(status_code)
+            self.assertIs(VuelosClient.liberar_asientos(7, 2), esperado, status_code)
+
+
+@override_settings(
+    SERVICIOS_REINTENTOS=2, SERVICIOS_BACKOFF_BASE=0, SERVICIOS_FALLOS_APERTURA=3,
+    SERVICIOS_SEGUNDOS_ABIERTO=60,
+)
+class ClienteServicioTest(SimpleTestCase):
+    def setUp(self):
+        self.cliente = ClienteServicio('vuelos', 'VUELOS_SERVICE_URL')
+        patcher = mock.patch.object(self.cliente.session, 'request')
+        self.request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reintenta_get_ante_errores_transitorios(self):
+        self.request.side_effect = [ConnectionError(), mock.Mock(status_code=503), mock.Mock(status_code=200)]
+        self.assertEqual(self.cliente.get('api/vuelos/1/').status_code, 200)
+        self.assertEqual(self.request.call_count, 3)
+        self.assertEqual(self.cliente.metricas.snapshot()['reintentos'], 2)
+
+    def test_no_repite_post_si_la_peticion_pudo_llegar(self):
+        self.request.side_effect = ReadTimeout()
+        with self.assertRaises(ReadTimeout):
+            self.cliente.post('api/vuelos/1/asientos/retener/', json={'asientos': 1})
+        self.assertEqual(self.request.call_count, 1)
+
+    def test_circuito_abierto_falla_sin_llamar(self):
+        self.request.side_effect = ConnectionError()
+        with self.assertRaises(ConnectionError):
+            self.cliente.get('api/vuelos/1/')
+        self.assertEqual(self.request.call_count, 3)
+        with self.assertRaises(CircuitoAbierto):
+            self.cliente.get('api/vuelos/1/')
+        self.assertEqual(self.request.call_count, 3)
+        self.assertEqual(self.cliente.metricas.snapshot()['rechazadas'], 1)
+
+    def test_error_en_la_llamada_de_prueba_no_bloquea_el_circuito(self):
+        self.request.side_effect = ConnectionError()
+        with self.assertRaises(ConnectionError):
+            self.cliente.get('api/vuelos/1/')
+        self.cliente.breaker._abierto_desde -= 60
+
+        # La llamada de prueba falla antes de llegar a la red
+        self.request.side_effect = ValueError('cabecera inválida')
+        with self.assertRaises(ValueError):
+            self.cliente.get('api/vuelos/1/')
+
+        self.request.side_effect = None
+        self.request.return_value = mock.Mock(status_code=200)
+        self.assertEqual(self.cliente.get('api/vuelos/1/').status_code, 200)
+        self.assertEqual(self.cliente.breaker.estado, 'cerrado')
+
+    def test_timeout_limitado_por_el_plazo_de_la_peticion(self):
+        self.request.return_value = mock.Mock(status_code=200)
+        token = fijar_plazo(0.5)
+        try:
+            self.cliente.get('api/vuelos/1/')
+        finally:
+            restaurar_plazo(token)
+        kwargs = self.request.call_args.kwargs
+        self.assertLessEqual(kwargs['timeout'], 0.5)
+        self.assertLessEqual(int(kwargs['headers']['X-Plazo-Ms']), 500)
+
+
+class VerificacionLocalJWTTest(TestCase):
+    def setUp(self):
+        cache_tokens.limpiar()
+        # Sin hilo de refresco: la lista de revocados se fija en cada test
+        patcher = mock.patch.object(lista_revocacion, '_arrancar')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch.object(lista_revocacion, 'cargar', return_value=([], 1)):
+            lista_revocacion.actualizar()
+        self.addCleanup(cache_tokens.limpiar)
+        token = AccessToken()
+        token['user_id'] = 42
+        token['username'] = 'jperez'
+        self.token = token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_token_repetido_no_se_vuelve_a_decodificar(self):
+        original = JWTAuthentication.get_validated_token
+        with mock.patch.object(
+            JWTAuthentication, 'get_validated_token', autospec=True, side_effect=original,
+        ) as validar:
+            for _ in range(3):
+                response = self.client.get('/api/reservas/')
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(validar.call_count, 1)
+
+    def test_token_revocado_se_rechaza(self):
+        cargar = mock.Mock(return_value=([(self.token['jti'], self.token['exp'])], 1))
+        with mock.patch.object(lista_revocacion, 'cargar', cargar):
+            lista_revocacion.actualizar()
+        self.addCleanup(setattr, lista_revocacion, '_jtis', {})
+        response = self.client.get('/api/reservas/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_sin_lista_de_revocados_no_se_aceptan_tokens(self):
+        # El servicio de usuarios no responde y la lista nunca se ha cargado
+        self.addCleanup(setattr, lista_revocacion, '_ultimo_intento', None)
+        lista_revocacion.ultima_carga = None
+        cargar = mock.Mock(side_effect=ConnectionError('usuarios caído'))
+        with mock.patch.object(lista_revocacion, 'cargar', cargar), self.assertLogs('compartido.jwt_local'):
+            response = self.client.get('/api/reservas/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['detail'].code, 'revocacion_no_disponible')
+
+
+class IdentidadGatewayTest(TestCase):
+    def test_identidad_firmada_autentica_sin_jwt(self):
+        cabecera = identidad.firmar(42, 'jperez', time.time() + 60, 'jti-1')
+        response = APIClient().get('/api/reservas/', HTTP_X_IDENTIDAD=cabecera)
+        self.assertEqual(response.status_code, 200)
+
+    def test_identidad_alterada_o_expirada_se_rechaza(self):
+        cabecera = identidad.firmar(42, 'jperez', time.time() + 60, 'jti-1')
+        alterada = cabecera.replace('.42.', '.43.', 1)
+        expirada = identidad.firmar(42, 'jperez', time.time() - 1, 'jti-1')
+        for valor in (alterada, expirada):
+            response = APIClient().get('/api/reservas/', HTTP_X_IDENTIDAD=valor)
+            self.assertEqual(response.status_code, 401)
+
+
+@override_settings(REGISTRO_ACCESOS={'MUESTREO': 1.0, 'CUERPO': True})
+class RegistroAccesosTest(TestCase):
+    def setUp(self):
+        patcher = mock.patch('reservas.registro_accesos.escritor.registrar')
+        self.registrar = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_registro_con_desglose_y_datos_redactados(self):
+        cabecera = identidad.firmar(42, 'jperez', time.time() + 60, 'jti-1')
+        with mock.patch('gestion_reservas.views.VuelosClient') as VuelosClient:
+            VuelosClient.obtener_vuelo.return_value = {'precio_base': '100.00'}
+            VuelosClient.retener_asientos.return_value = True
+            response = APIClient().post(
+                '/api/reservas/', datos_reserva(2), format='json', HTTP_X_IDENTIDAD=cabecera,
+            )
+        self.assertEqual(response.status_code, 201)
+
+        (registro,), _ = self.registrar.call_args
+        self.assertEqual(registro['status'], 201)
+        self.assertEqual(registro['usuario_id'], 42)
+        self.assertGreater(registro['db_consultas'], 0)
+        self.assertGreater(registro['serializacion_ms'], 0)
+        self.assertEqual(registro['cabeceras']['X-Identidad'], '[REDACTADO]')
+        pasajero = registro['cuerpo']['pasajeros'][0]
+        self.assertEqual(pasajero['numero_documento'], '[REDACTADO]')
+        self.assertEqual(pasajero['nombre'], 'Pasajero 0')
+
+    @override_settings(REGISTRO_ACCESOS={'MUESTREO': 0.0, 'LENTAS_MS': 10_000})
+    def test_muestreo_omite_peticiones_rapidas_correctas(self):
+        APIClient().get('/api/estadisticas/clientes/')
+        self.registrar.assert_not_called()
+
+
+@override_settings(TRAZAS={'SERVICIO': 'reservas', 'ARCHIVO': '/dev/null'})
+class TrazasTest(TestCase):
+    TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+
+    def setUp(self):
+        cache_vuelos.invalidar()
+        self.addCleanup(cache_vuelos.invalidar)
+        patcher = mock.patch.object(trazas.exportador, 'exportar')
+        self.exportar = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('gestion_reservas.clients._vuelos.session.request')
+        self.request = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request.return_value = mock.Mock(
+            status_code=200, json=mock.Mock(return_value={'id': 1, 'precio_base': '100.00', 'exito': True}),
+        )
+
+    def test_contexto_se_propaga_a_las_llamadas_salientes(self):
+        cabecera = identidad.firmar(42, 'jperez', time.time() + 60, 'jti-1')
+        response = APIClient().post(
+            '/api/reservas/', datos_reserva(1), format='json', HTTP_X_IDENTIDAD=cabecera,
+            HTTP_TRACEPARENT=f'00-{self.TRACE_ID}-00f067aa0ba902b7-01',
+        )
+        self.assertEqual(response.status_code, 201)
+
+        spans = {datos['span_id']: datos for (datos,), _ in self.exportar.call_args_list}
+        self.assertTrue(all(datos['trace_id'] == self.TRACE_ID for datos in spans.values()))
+        servidor, = [datos for datos in spans.values() if datos['tipo'] == 'servidor']
+        self.assertEqual(servidor['padre'], '00f067aa0ba902b7')
+        self.assertEqual(servidor['nombre'], 'POST api/reservas/')
+
+        # Cada llamada a vuelos lleva como padre su propio span de cliente
+        for _, kwargs in self.request.call_args_list:
+            trace_id, padre, muestreado = trazas.parsear(kwargs['headers'][trazas.CABECERA])
+            self.assertEqual(trace_id, self.TRACE_ID)
+            self.assertEqual(spans[padre]['tipo'], 'cliente')
+            self.assertTrue(muestreado)
+
+    def test_traza_no_muestreada_no_se_exporta(self):
+        cabecera = identidad.firmar(42, 'jperez', time.time() + 60, 'jti-1')
+        APIClient().get(
+            '/api/reservas/', HTTP_X_IDENTIDAD=cabecera,
+            HTTP_TRACEPARENT=f'00-{self.TRACE_ID}-00f067aa0ba902b7-00',
+        )
+        self.exportar.assert_not_called()
@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import ReservaListCreateView, ReservaDetailView
+from .views import ReservaListCreateView, ReservaDetailView, ReservaPorCodigoView, EstadisticasClientesView
 
 urlpatterns = [
     path('reservas/', ReservaListCreateView.as_view(), name='lista-reservas'),
     path('reservas/<int:pk>/', ReservaDetailView.as_view(), name='detalle-reserva'),
+    path('reservas/codigo/<str:codigo>/', ReservaPorCodigoView.as_view(), name='reserva-por-codigo'),
+    path('estadisticas/clientes/', EstadisticasClientesView.as_view(), name='estadisticas-clientes'),
 ]
\ No newline at end of file
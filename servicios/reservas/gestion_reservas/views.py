@@ -1,62 +1,96 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.views import APIView
+from rest_framework.exceptions import APIException
 from .models import Reserva, Pasajero
 from .serializers import ReservaSerializer
-from .clients import VuelosClient, UsuariosClient
-import random
-import string
+from .clients import VuelosClient
+from .clients import resiliencia
+from .clients.cache import cache_vuelos
+from .codigos import nuevo_codigo
+from compartido import trazas
+from compartido.paginacion import KeysetPagination
 import decimal  # Importar decimal para manejo prec
 import requests
 from django.conf import settings
+from django.db import transaction
+
+class ServicioNoDisponible(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Servicio de vuelos no disponible, intente de nuevo'
+    default_code = 'servicio_no_disponible'
+
+class EstadisticasClientesView(APIView):
+    """Métricas de las llamadas a otros servicios y de la caché de vuelos."""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response({
+            'servicios': resiliencia.estadisticas(),
+            'cache_vuelos': cache_vuelos.snapshot(),
+        })
 
 class ReservaListCreateView(generics.ListCreateAPIView):
     serializer_class = ReservaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ['-fecha_reserva', '-id']
 
     def get_queryset(self):
-        return Reserva.objects.filter(usuario_id=self.request.user.id)
+        # Los pasajeros de toda la página se traen en una sola consulta
+        return Reserva.objects.filter(usuario_id=self.request.user.id).prefetch_related('pasajeros')
 
     def create(self, request, *args, **kwargs):
-        # 1. Verificar vuelo
-        vuelo_id = request.data.get('vuelo_id')
-        vuelo = VuelosClient.obtener_vuelo(vuelo_id)
+        # 1. Validar la solicitud antes de tocar el inventario de asientos
+        serializer = self.get_serializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        vuelo_id = serializer.validated_data['vuelo_id']
+        asientos_solicitados = serializer.validated_data['asientos']
+
+        # 2. Verificar vuelo. Solo hace falta el precio: la disponibilidad la
+        # comprueba la retención de asientos, así que no se piden en vivo
+        with trazas.span('VuelosClient.obtener_vuelo', vuelo_id=vuelo_id):
+            vuelo = VuelosClient.obtener_vuelo(vuelo_id, asientos=False)
         if not vuelo:
             return Response(
                 {"error": "Vuelo no encontrado"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 2. Verificar asientos
+        # 3. Calcular precio con decimales
         try:
-            asientos_solicitados = int(request.data.get('asientos', 1))
-            if vuelo.get('asientos_disponibles', 0) < asientos_solicitados:
-                return Response(
-                    {"error": "No hay suficientes asientos disponibles"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # 3. Calcular precio con decimales
             precio_base = decimal.Decimal(str(vuelo['precio_base'])).normalize()
             precio_total = (precio_base * asientos_solicitados).quantize(decimal.Decimal('0.00'))
-
         except (ValueError, decimal.InvalidOperation, KeyError) as e:
             return Response(
                 {"error": f"Datos numéricos inválidos: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 4. Crear reserva
-        serializer = self.get_serializer(data=request.data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        
-        codigo = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-        
-        reserva = serializer.save(
-            usuario_id=request.user.id,
-            codigo_reserva=codigo,
-            precio_total=precio_total  # Usamos el decimal calculado
-        )
+        # 4. Retener asientos: el servicio de vuelos los descuenta de forma atómica,
+        # así que dos reservas simultáneas no pueden sobrevender el vuelo
+        with trazas.span('VuelosClient.retener_asientos', vuelo_id=vuelo_id):
+            retenidos = VuelosClient.retener_asientos(vuelo_id, asientos_solicitados)
+        if retenidos is None:
+            raise ServicioNoDisponible()
+        if not retenidos:
+            return Response(
+                {"error": "No hay suficientes asientos disponibles"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 5. Crear reserva; si falla, se devuelven los asientos retenidos
+        try:
+            with trazas.span('guardar_reserva', pasajeros=len(serializer.validated_data['pasajeros'])):
+                serializer.save(
+                    usuario_id=request.user.id,
+                    codigo_reserva=nuevo_codigo(),
+                    precio_total=precio_total  # Usamos el decimal calculado
+                )
+        except Exception:
+            VuelosClient.liberar_asientos(vuelo_id, asientos_solicitados)
+            raise
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -65,10 +99,43 @@ class ReservaDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Reserva.objects.filter(usuario_id=self.request.user.id)
+        return Reserva.objects.filter(usuario_id=self.request.user.id).prefetch_related('pasajeros')
 
     def perform_destroy(self, instance):
-        # En lugar de borrar, cambiamos el estado a cancelado
+        # En lugar de borrar, cambiamos el estado a cancelado. El cambio es un
+        # UPDATE condicional: de dos DELETE simultáneos (o un reintento) solo
+        # uno encuentra la reserva activa y devuelve los asientos al vuelo.
+        # Se confirma antes de llamar a vuelos: con SQLite (BEGIN IMMEDIATE)
+        # una transacción abierta durante la llamada bloquearía todas las escrituras
+        anterior = instance.estado
+        if anterior not in ('P', 'C'):
+            return
+        with transaction.atomic():
+            cancelada = Reserva.objects.filter(pk=instance.pk, estado=anterior).update(estado='X')
+        if not cancelada:
+            return
+        liberados = None
+        try:
+            liberados = VuelosClient.liberar_asientos(instance.vuelo_id, instance.asientos)
+        finally:
+            # Si el servicio de vuelos no libera los asientos se deshace la
+            # cancelación: la reserva sigue activa y se puede reintentar
+            if liberados is None:
+                Reserva.objects.filter(pk=instance.pk, estado='X').update(estado=anterior)
+        if liberados is None:
+            raise ServicioNoDisponible()
         instance.estado = 'X'
-        instance.save()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+
+class ReservaPorCodigoView(generics.RetrieveAPIView):
+    serializer_class = ReservaSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'codigo_reserva'
+    lookup_url_kwarg = 'codigo'
+
+    def get_queryset(self):
+        return Reserva.objects.filter(usuario_id=self.request.user.id).prefetch_related('pasajeros')
+
+    def get_object(self):
+        # Los códigos se generan en mayúsculas; se aceptan escritos en minúsculas
+        self.kwargs[self.lookup_url_kwarg] = self.kwargs[self.lookup_url_kwarg].upper()
+        return super().get_object()
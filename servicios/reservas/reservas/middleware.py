@@ -1,30 +1,77 @@
-from django.utils.deprecation import MiddlewareMixin
-
-class PrintTokenMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        print(f"Authorization header: {auth_header}")
-        return None
-    
-class DebugMiddleware:
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from compartido import trazas
+from gestion_reservas import medicion
+from gestion_reservas.clients.resiliencia import CABECERA_PLAZO, fijar_plazo, restaurar_plazo
+
+from . import registro_accesos
+
+class RegistroAccesosMiddleware:
+    """
+    Registro de accesos muestreado, con desglose de tiempos (ver
+    reservas.registro_accesos y gestion_reservas.medicion). Sustituye a los
+    print() de DebugMiddleware y PrintTokenMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cfg = registro_accesos.config()
+        cuerpo = request.body if cfg['CUERPO'] and request.method in ('POST', 'PUT', 'PATCH') else None
+        instantanea, token = medicion.iniciar()
+        inicio = time.perf_counter()
+        try:
+            with connection.execute_wrapper(medicion.medir_db):
+                response = self.get_response(request)
+        finally:
+            medicion.terminar(token)
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+
+        if (
+            response.status_code >= 500
+            or duracion_ms >= cfg['LENTAS_MS']
+            or random.random() < cfg['MUESTREO']
+        ):
+            usuario = getattr(request, 'user', None)
+            traza = trazas.actual()
+            registro = {
+                'ts': time.time(),
+                'metodo': request.method,
+                'ruta': request.path,
+                'status': response.status_code,
+                'trace_id': traza.trace_id if traza is not None else None,
+                'usuario_id': usuario.id if getattr(usuario, 'is_authenticated', False) else None,
+                'duracion_ms': round(duracion_ms, 3),
+                **instantanea.resumen(),
+                'cabeceras': registro_accesos.redactar_cabeceras(request.headers, cfg['CABECERAS']),
+            }
+            if cuerpo is not None:
+                registro['cuerpo'] = registro_accesos.cuerpo_redactado(cuerpo, cfg['CUERPO_MAX_BYTES'])
+            registro_accesos.escritor.registrar(registro)
+        return response
+
+
+class PlazoMiddleware:
+    """
+    Fija el plazo de la petición para las llamadas a otros servicios: como
+    mucho SERVICE_PLAZO_PETICION segundos, o menos si quien llama envía el
+    tiempo que le queda en la cabecera X-Plazo-Ms.
+    """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # Imprime información de la solicitud
-        print("\n=== SOLICITUD RECIBIDA ===")
-        print(f"Método: {request.method}")
-        print(f"Ruta: {request.path}")
-        print(f"Headers: {request.headers}")
-        print(f"Cuerpo: {request.body.decode()}")
-        print("=========================\n")
-
-        response = self.get_response(request)
-
-        # Imprime información de la respuesta
-        print("\n=== RESPUESTA ENVIADA ===")
-        print(f"Status: {response.status_code}")
-        print(f"Contenido: {response.content}")
-        print("=========================\n")
-        
-        return response
\ No newline at end of file
+        segundos = settings.SERVICE_PLAZO_PETICION
+        try:
+            segundos = min(segundos, int(request.headers[CABECERA_PLAZO]) / 1000)
+        except (KeyError, ValueError):
+            pass
+        token = fijar_plazo(segundos)
+        try:
+            return self.get_response(request)
+        finally:
+            restaurar_plazo(token)
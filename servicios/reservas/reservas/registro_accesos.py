@@ -0,0 +1,110 @@
+"""
+Registro de accesos estructurado (una línea JSON por petición).
+
+El middleware solo construye el registro y lo deja en una cola en memoria
+acotada (``REGISTRO_ACCESOS['COLA']``); un hilo en segundo plano la vacía
+hacia el logger ``reservas.accesos``. La escritura nunca bloquea una petición:
+si la cola está llena el registro se descarta y se cuenta en ``descartados``.
+
+Se registra una fracción ``MUESTREO`` de las peticiones, más todas las que
+terminan en error (>= 500) o tardan más de ``LENTAS_MS``. Las cabeceras de
+credenciales y los campos sensibles del cuerpo (documentos de pasajeros,
+contraseñas) se sustituyen por ``[REDACTADO]``.
+"""
+import json
+import logging
+import queue
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger('reservas.accesos')
+
+REDACTADO = '[REDACTADO]'
+CABECERAS_SENSIBLES = frozenset({
+    'authorization', 'cookie', 'x-identidad', 'x-servicio-token', 'proxy-authorization',
+})
+CAMPOS_SENSIBLES = frozenset({
+    'numero_documento', 'tipo_documento', 'fecha_nacimiento', 'password', 'token',
+    'access', 'refresh',
+})
+
+CONFIG_POR_DEFECTO = {
+    'MUESTREO': 1.0,
+    'LENTAS_MS': 1000,
+    'COLA': 10000,
+    'CABECERAS': ('User-Agent', 'Authorization', 'X-Identidad'),
+    'CUERPO': False,
+    'CUERPO_MAX_BYTES': 4096,
+}
+
+
+def config():
+    return {**CONFIG_POR_DEFECTO, **getattr(settings, 'REGISTRO_ACCESOS', {})}
+
+
+def redactar_cabeceras(headers, nombres):
+    return {
+        nombre: REDACTADO if nombre.lower() in CABECERAS_SENSIBLES else headers[nombre]
+        for nombre in nombres if nombre in headers
+    }
+
+
+def redactar(datos):
+    if isinstance(datos, dict):
+        return {
+            clave: REDACTADO if clave in CAMPOS_SENSIBLES else redactar(valor)
+            for clave, valor in datos.items()
+        }
+    if isinstance(datos, list):
+        return [redactar(valor) for valor in datos]
+    return datos
+
+
+def cuerpo_redactado(body, maximo):
+    if not body or len(body) > maximo:
+        return None if not body else f'<{len(body)} bytes>'
+    try:
+        return redactar(json.loads(body))
+    except (ValueError, UnicodeDecodeError):
+        return f'<{len(body)} bytes no JSON>'
+
+
+class EscritorAccesos:
+    def __init__(self):
+        self._cola = None
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.descartados = 0
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._cola = queue.Queue(maxsize=config()['COLA'])
+                self._hilo = threading.Thread(target=self._vaciar, name='registro-accesos', daemon=True)
+                self._hilo.start()
+
+    def registrar(self, registro):
+        if self._hilo is None:
+            self._arrancar()
+        try:
+            self._cola.put_nowait(registro)
+        except queue.Full:
+            # Se llama desde los hilos de las peticiones: sin el lock se pierden incrementos
+            with self._lock:
+                self.descartados += 1
+
+    def _vaciar(self):
+        while True:
+            registro = self._cola.get()
+            try:
+                logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+            except Exception:
+                # Un registro que no se puede escribir no debe parar el hilo
+                logger.exception('No se pudo escribir un registro de acceso')
+
+    def pendientes(self):
+        return self._cola.qsize() if self._cola is not None else 0
+
+
+escritor = EscritorAccesos()
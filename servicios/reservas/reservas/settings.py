@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from compartido.basedatos import configuracion
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +52,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         #'rest_framework.authentication.TokenAuthentication',
         #'gestion_reservas.authentication.RemoteTokenAuthentication',
+        'gestion_reservas.authentication.IdentidadGatewayAuthentication',
         'gestion_reservas.authentication.JWTStatelessUserAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -71,8 +75,21 @@ SIMPLE_JWT = {
     #'TOKEN_USER_CLASS': 'gestion_reservas.authentication.User'
 }
 
+# Verificación local de JWT (ver compartido.jwt_local): tokens ya
+# validados que se guardan en memoria y cada cuánto se pide al servicio de
+# usuarios la lista de tokens revocados
+JWT_CACHE_MAX_ENTRADAS = 10000
+REVOCACION_REFRESCO_SEGUNDOS = 30
+
+# Firma de la cabecera X-Identidad que añade el gateway tras validar el JWT
+# (ver compartido.identidad). Debe coincidir con IDENTIDAD_CLAVE del gateway.
+IDENTIDAD_CLAVE = os.environ.get('IDENTIDAD_CLAVE', 'ClaveIdentidadGateway123')
+
 MIDDLEWARE = [
+    'compartido.trazas.TrazasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'compartido.metricas.MetricasMiddleware',
+    'reservas.middleware.RegistroAccesosMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,8 +97,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-
-    'reservas.middleware.PrintTokenMiddleware',  # Agrega esto temporalmente
+    'reservas.middleware.PlazoMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -119,16 +135,10 @@ WSGI_APPLICATION = 'reservas.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil elegido con DB_PERFIL: sqlite (WAL, por defecto) o postgres (con pool).
+# Ver compartido.basedatos
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-        'OPTIONS': {
-            # Esto hace que Django espere hasta 10 segundos
-            # si la base de datos está bloqueada.
-            'timeout': 10,  
-        }
-    }
+    'default': configuracion(BASE_DIR, 'reservas'),
 }
 
 
@@ -180,5 +190,73 @@ USUARIOS_SERVICE_URL = "http://localhost:8001"  # Puerto del servicio de usuario
 # Tiempo de espera para requests entre servicios (en segundos)
 SERVICE_TIMEOUT = 3
 
+# Tiempo total que una petición entrante puede dedicar a llamar a otros
+# servicios, reintentos incluidos (ver gestion_reservas.clients.resiliencia)
+SERVICE_PLAZO_PETICION = 5
+SERVICIOS_REINTENTOS = 2
+SERVICIOS_BACKOFF_BASE = 0.05
+# Circuit breaker: fallos seguidos que lo abren y segundos que permanece abierto
+SERVICIOS_FALLOS_APERTURA = 5
+SERVICIOS_SEGUNDOS_ABIERTO = 10
+SERVICIOS_POOL = 20
+
+# Caché local de datos estáticos de vuelos (ruta, horarios, precio) en
+# VuelosClient. Los asientos disponibles siempre se consultan en vivo.
+VUELOS_CACHE_TTL = 30
+VUELOS_CACHE_MAX_ENTRADAS = 1000
+
+# Token para los endpoints internos de otros servicios (p. ej. retener asientos
+# en vuelos). Debe coincidir con TOKEN_SERVICIOS_INTERNOS del servicio de vuelos.
+TOKEN_SERVICIOS_INTERNOS = 'TokenServiciosInternos123'
+
+# Números de secuencia que cada proceso reserva de una vez para generar códigos
+# de reserva. Un bloque mayor implica menos escrituras en la tabla de secuencia,
+# a cambio de perder los números sin usar cuando el proceso se reinicia.
+CODIGO_RESERVA_BLOQUE = 100
+
+# Clave de la permutación que desordena los códigos de reserva (ver
+# gestion_reservas.codigos). Cambiarla no repite códigos ya emitidos: los que
+# coinciden con uno existente se descartan.
+CODIGO_RESERVA_CLAVE = os.environ.get('CODIGO_RESERVA_CLAVE', SECRET_KEY)
+
+# Registro de accesos (reservas.registro_accesos): una línea JSON por petición
+# con el desglose de tiempos (auth, BD, otros servicios, serialización).
+# MUESTREO es la fracción de peticiones registradas; las que fallan con 5xx o
+# tardan más de LENTAS_MS se registran siempre. CUERPO añade el cuerpo de
+# POST/PUT/PATCH con los datos de pasajeros y credenciales redactados.
+REGISTRO_ACCESOS = {
+    'MUESTREO': 0.1,
+    'LENTAS_MS': 1000,
+    'COLA': 10000,
+    'CABECERAS': ('User-Agent', 'Authorization', 'X-Identidad'),
+    'CUERPO': False,
+    'CUERPO_MAX_BYTES': 4096,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'mensaje': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'accesos': {'class': 'logging.StreamHandler', 'formatter': 'mensaje'},
+    },
+    'loggers': {
+        'reservas.accesos': {'handlers': ['accesos'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Configuración para desarrollo
-DEBUG = True
\ No newline at end of file
+DEBUG = True
+
+# Trazas distribuidas (ver compartido.trazas). El contexto (cabecera traceparent)
+# se propaga siempre; los spans solo se registran si hay ARCHIVO (JSONL) o
+# COLECTOR (URL que recibe lotes por POST). MUESTREO solo se aplica a las
+# peticiones que no llegan a través del gateway.
+TRAZAS = {
+    'SERVICIO': 'reservas',
+    'MUESTREO': float(os.environ.get('TRAZAS_MUESTREO', '1.0')),
+    'ARCHIVO': os.environ.get('TRAZAS_ARCHIVO'),
+    'COLECTOR': os.environ.get('TRAZAS_COLECTOR'),
+}
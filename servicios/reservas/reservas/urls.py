@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from compartido.metricas import vista_metricas
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', vista_metricas, name='metricas'),
     path('api/auth/', include('rest_framework.urls')),
     path('api/', include('gestion_reservas.urls')),
 ]
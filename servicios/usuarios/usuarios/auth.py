@@ -1,26 +1,54 @@
-from rest_framework.authentication import TokenAuthentication
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
-import requests
-from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
-class RemoteTokenAuthentication(TokenAuthentication):
-    def authenticate_credentials(self, key):
-        try:
-            response = requests.post(
-                f"{settings.USUARIOS_SERVICE_URL}/api/tokens/",
-                headers={"Authorization": f"Token {key}"}
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return (self.get_user(data['user_id']), key)
-            raise AuthenticationFailed('Token inválido')
-        except Exception as e:
-            raise AuthenticationFailed(f'Error de conexión: {str(e)}')
-
-    def get_user(self, user_id):
-        # Implementa según tu modelo de usuario
-        User = get_user_model()
+from compartido import identidad
+from compartido.jwt_local import ListaRevocacion, VerificacionLocalMixin
+
+from .models import TokenRevocado
+
+
+def revocaciones(desde=None):
+    """Tokens revocados desde ``desde`` (timestamp) como ``([(jti, expira), ...], hasta)``."""
+    hasta = timezone.now()
+    filas = TokenRevocado.objects.filter(expira__gt=hasta)
+    if desde is not None:
+        # Se solapa con la carga anterior: un token revocado justo en el
+        # límite no se pierde, y repetirlo no cambia nada
+        filas = filas.filter(revocado__gte=datetime.datetime.fromtimestamp(desde, tz=datetime.timezone.utc))
+    revocados = [(jti, expira.timestamp()) for jti, expira in filas.values_list('jti', 'expira')]
+    return revocados, hasta.timestamp()
+
+
+# Aquí la lista se lee directamente de la BD, con el mismo refresco periódico
+lista_revocacion = ListaRevocacion(revocaciones)
+
+
+class JWTLocalAuthentication(VerificacionLocalMixin, JWTAuthentication):
+    """JWTAuthentication con caché de tokens validados y comprobación de revocación."""
+    lista_revocacion = lista_revocacion
+
+
+class IdentidadGatewayAuthentication(BaseAuthentication):
+    """Usuario de la cabecera X-Identidad que firma el gateway tras validar el JWT."""
+
+    def authenticate_header(self, request):
+        # Con WWW-Authenticate DRF responde 401 (y no 403) a las peticiones sin credenciales válidas
+        return 'Bearer realm="api"'
+
+    def authenticate(self, request):
+        valor = request.headers.get(identidad.CABECERA)
+        if not valor:
+            return None
+        claims = identidad.verificar(valor)
+        if claims is None:
+            raise AuthenticationFailed('Identidad del gateway inválida o expirada')
         try:
-            return User.objects.get(id=user_id)
-        except User.DoesNotExist:
-            return None
\ No newline at end of file
+            user = get_user_model().objects.get(pk=claims['user_id'], is_active=True)
+        except get_user_model().DoesNotExist:
+            raise AuthenticationFailed('Usuario no encontrado')
+        return user, claims
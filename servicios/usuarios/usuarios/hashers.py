@@ -0,0 +1,61 @@
+"""
+Hashers de contraseñas del servicio de usuarios.
+
+Las contraseñas pasan por el pipeline estándar de Django (``PASSWORD_HASHERS``):
+
+* ``PBKDF2AjustableHasher`` es el hasher por defecto. Su coste (iteraciones)
+  se fija con ``USUARIOS_PBKDF2_ITERACIONES``; para elegirlo, ver el comando
+  ``bench_hashers``.
+* ``CustomSHA256Hasher`` solo sirve para verificar los hashes heredados
+  ``custom_sha256$<salt>$<sha256(password + salt)>``. Al no ser el primero de
+  la lista, Django vuelve a hashear la contraseña con el hasher por defecto en
+  el primer login correcto, y lo mismo ocurre cuando cambian las iteraciones.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.hashers import BasePasswordHasher, PBKDF2PasswordHasher, mask_hash
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+
+
+class PBKDF2AjustableHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 con el número de iteraciones tomado de los settings."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'USUARIOS_PBKDF2_ITERACIONES', PBKDF2PasswordHasher.iterations)
+
+
+class CustomSHA256Hasher(BasePasswordHasher):
+    """Formato antiguo de ``Usuario.set_password``: un único SHA-256 sin iteraciones."""
+    algorithm = 'custom_sha256'
+
+    def encode(self, password, salt):
+        self._check_encode_args(password, salt)
+        hash = hashlib.sha256(f"{password}{salt}".encode()).hexdigest()
+        return f"{self.algorithm}${salt}${hash}"
+
+    def decode(self, encoded):
+        algorithm, salt, hash = encoded.split('$', 2)
+        assert algorithm == self.algorithm
+        return {'algorithm': algorithm, 'hash': hash, 'salt': salt}
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(password, decoded['salt'])
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            _('algorithm'): decoded['algorithm'],
+            _('salt'): mask_hash(decoded['salt'], show=2),
+            _('hash'): mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        return True
+
+    def harden_runtime(self, password, encoded):
+        pass
@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from usuarios.hashers import CustomSHA256Hasher, PBKDF2AjustableHasher
+
+CONTRASENA = 'SecurePass123'
+
+
+def _verificaciones(iteraciones, segundos):
+    """
+    Verifica la misma contraseña en bucle durante ``segundos`` con el coste
+    dado (None = hash heredado custom_sha256). Devuelve cuántas hizo.
+    """
+    with override_settings(USUARIOS_PBKDF2_ITERACIONES=iteraciones):
+        hasher = CustomSHA256Hasher() if iteraciones is None else PBKDF2AjustableHasher()
+        encoded = hasher.encode(CONTRASENA, hasher.salt())
+        hechas = 0
+        fin = time.perf_counter() + segundos
+        while time.perf_counter() < fin:
+            hasher.verify(CONTRASENA, encoded)
+            hechas += 1
+    return hechas
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide cuántos logins por segundo verifica un core con cada número de iteraciones '
+        'de PBKDF2 (y con el hash heredado custom_sha256), para dimensionar el servicio '
+        'antes de fijar USUARIOS_PBKDF2_ITERACIONES.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iteraciones', type=int, nargs='+',
+            default=[100_000, 260_000, 600_000, 1_000_000],
+        )
+        parser.add_argument('--segundos', type=float, default=2.0, help='Duración de cada medición')
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count(),
+            help='Procesos para la medición con todos los cores (1 para omitirla)',
+        )
+
+    def handle(self, *args, **options):
+        segundos, procesos = options['segundos'], options['procesos']
+        actual = settings.USUARIOS_PBKDF2_ITERACIONES
+
+        self.stdout.write(f"{'hasher':<26}{'ms/login':>10}{'logins/s/core':>15}{f'logins/s x{procesos}':>18}")
+        for iteraciones in [None, *options['iteraciones']]:
+            por_core = _verificaciones(iteraciones, segundos) / segundos
+            total = ''
+            if procesos > 1:
+                with ProcessPoolExecutor(procesos) as pool:
+                    hechas = pool.map(_verificaciones, [iteraciones] * procesos, [segundos] * procesos)
+                    total = f'{sum(hechas) / segundos:.0f}'
+
+            nombre = 'custom_sha256 (heredado)' if iteraciones is None else f'pbkdf2_sha256 {iteraciones}'
+            if iteraciones == actual:
+                nombre += ' *'
+            self.stdout.write(f'{nombre:<26}{1000 / por_core:>10.3f}{por_core:>15.1f}{total:>18}')
+
+        self.stdout.write(f'* USUARIOS_PBKDF2_ITERACIONES actual ({actual})')
@@ -0,0 +1,161 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils.dateparse import parse_date
+
+CAMPOS = (
+    'username', 'email', 'first_name', 'last_name', 'telefono', 'direccion',
+    'fecha_nacimiento', 'is_staff',
+)
+
+
+def _hashear(contrasenas, iteraciones):
+    """Hashea un bloque de contraseñas en un proceso del pool."""
+    with override_settings(USUARIOS_PBKDF2_ITERACIONES=iteraciones):
+        return [make_password(contrasena) for contrasena in contrasenas]
+
+
+def _leer(ruta, formato):
+    with open(ruta, newline='', encoding='utf-8') as f:
+        if formato == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for linea in f:
+                if linea.strip():
+                    yield json.loads(linea)
+
+
+def _fecha(valor):
+    """La fecha ``AAAA-MM-DD`` de ``valor``, o ``None`` si no lo es o no existe (2001-02-30)."""
+    try:
+        return parse_date(str(valor).strip())
+    except ValueError:
+        return None
+
+
+def _booleano(valor):
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+    return bool(valor)
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa usuarios en bloque desde un fichero CSV o JSONL. Cada fila trae '
+        '"password" (en claro: se hashea en paralelo en varios procesos) o '
+        '"password_hash" (un hash ya calculado, p. ej. custom_sha256$..., que se '
+        'actualiza en el primer login). Las filas se insertan con bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichero')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto, según la extensión')
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por inserción')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count())
+        parser.add_argument(
+            '--iteraciones', type=int,
+            help=(
+                'Iteraciones de PBKDF2 para la importación (por defecto '
+                'USUARIOS_PBKDF2_ITERACIONES). Con un coste menor la importación es más '
+                'rápida y cada contraseña se rehashea con el coste configurado en su '
+                'primer login.'
+            ),
+        )
+        parser.add_argument(
+            '--ignorar-existentes', action='store_true',
+            help='Omite los usernames que ya existen en lugar de abortar',
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['fichero']
+        formato = options['formato'] or ('csv' if ruta.lower().endswith('.csv') else 'jsonl')
+        iteraciones = options['iteraciones'] or settings.USUARIOS_PBKDF2_ITERACIONES
+        procesos = max(1, options['procesos'])
+        lote = options['lote']
+
+        filas = _leer(ruta, formato)
+        self.omitidos = 0
+        self.existentes = 0
+        importados, inicio = 0, time.perf_counter()
+        with ProcessPoolExecutor(procesos) as pool:
+            while True:
+                bloque = list(islice(filas, lote))
+                if not bloque:
+                    break
+                importados += self._importar(bloque, pool, procesos, iteraciones, options)
+                self.stdout.write(f'{importados} usuarios procesados ({time.perf_counter() - inicio:.1f} s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Importación terminada: {importados} usuarios procesados en {time.perf_counter() - inicio:.1f} s'
+        ))
+        if self.omitidos:
+            self.stderr.write(self.style.WARNING(f'{self.omitidos} filas omitidas por datos inválidos'))
+        if self.existentes:
+            self.stderr.write(self.style.WARNING(f'{self.existentes} filas omitidas: el usuario ya existía'))
+
+    def _importar(self, filas, pool, procesos, iteraciones, options):
+        User = get_user_model()
+
+        # Las contraseñas en claro del lote se reparten entre los procesos
+        en_claro = [i for i, fila in enumerate(filas) if fila.get('password')]
+        tamano = max(1, -(-len(en_claro) // procesos))
+        trozos = [en_claro[i:i + tamano] for i in range(0, len(en_claro), tamano)]
+        hashes = {}
+        resultados = pool.map(
+            _hashear,
+            [[filas[i]['password'] for i in trozo] for trozo in trozos],
+            [iteraciones] * len(trozos),
+        )
+        for trozo, hasheadas in zip(trozos, resultados):
+            hashes.update(zip(trozo, hasheadas))
+
+        usuarios = []
+        for i, fila in enumerate(filas):
+            if not fila.get('username'):
+                raise CommandError(f'Fila sin username: {fila}')
+            password = hashes.get(i) or fila.get('password_hash')
+            if not password:
+                raise CommandError(f"El usuario {fila['username']} no trae password ni password_hash")
+
+            datos = {campo: fila[campo] for campo in CAMPOS if fila.get(campo) not in (None, '')}
+            if 'fecha_nacimiento' in datos:
+                fecha = _fecha(datos['fecha_nacimiento'])
+                if fecha is None:
+                    # Una fecha mal escrita no aborta la importación: se informa y se sigue
+                    self.omitidos += 1
+                    self.stderr.write(
+                        f"Fila omitida ({fila['username']}): fecha_nacimiento inválida "
+                        f"{datos['fecha_nacimiento']!r}"
+                    )
+                    continue
+                datos['fecha_nacimiento'] = fecha
+            if 'is_staff' in datos:
+                datos['is_staff'] = _booleano(datos['is_staff'])
+            datos['email'] = User.objects.normalize_email(datos.get('email', ''))
+            # Cada instancia obtiene su propio salt (default=generar_salt)
+            usuarios.append(User(password=password, **datos))
+
+        if not options['ignorar_existentes']:
+            with transaction.atomic():
+                User.objects.bulk_create(usuarios, batch_size=500)
+            return len(usuarios)
+
+        # Con ignore_conflicts bulk_create devuelve también las filas que no
+        # insertó: se cuentan las del lote que hay antes y después
+        lote = User.objects.filter(username__in=[usuario.username for usuario in usuarios])
+        with transaction.atomic():
+            antes = lote.count()
+            User.objects.bulk_create(usuarios, batch_size=500, ignore_conflicts=True)
+            insertados = lote.count() - antes
+        self.existentes += len(usuarios) - insertados
+        return insertados
@@ -1,8 +1,5 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.contrib.auth.hashers import make_password
-from django.core.validators import MinLengthValidator
-import hashlib
 import secrets
 
 from django.contrib.auth.models import BaseUserManager
@@ -16,48 +13,34 @@ class UsuarioManager(BaseUserManager):
         user = self.model(username=username, email=email, **extra_fields)
         
         if password:
-            user.set_password(password)  # Esto usará tu método personalizado
+            user.set_password(password)  # Hasher por defecto de PASSWORD_HASHERS (ver usuarios.hashers)
         
         user.save(using=self._db)
         return user
 
+def generar_salt():
+    # Callable: el default se evalúa por cada fila, no una sola vez al importar
+    return secrets.token_hex(32)
+
 class Usuario(AbstractUser):
     telefono = models.CharField(max_length=20, blank=True, null=True)
     direccion = models.TextField(blank=True, null=True)
     fecha_nacimiento = models.DateField(blank=True, null=True)
-    salt = models.CharField(max_length=64, editable=False, default=secrets.token_hex(32))
+    salt = models.CharField(max_length=64, editable=False, default=generar_salt)
     
     objects = UsuarioManager()
     
-    def set_password(self, raw_password):
-        """
-        Hashea la contraseña solo con SHA256 + salt (elimina el doble hasheo)
-        """
-        if not self.salt:
-            self.salt = secrets.token_hex(32)
-        
-        salted_password = f"{raw_password}{self.salt}"
-        custom_hash = hashlib.sha256(salted_password.encode()).hexdigest()
-        
-        # Almacena SOLO en formato personalizado
-        self.password = f"custom_sha256${self.salt}${custom_hash}"
-    
-    def check_password(self, raw_password):
-        """
-        Verifica solo contra nuestro formato personalizado
-        """
-        if not self.password.startswith('custom_sha256$'):
-            return False
-            
-        try:
-            _, salt, stored_hash = self.password.split('$', 2)
-            salted_password = f"{raw_password}{salt}"
-            hashed_password = hashlib.sha256(salted_password.encode()).hexdigest()
-            return hashed_password == stored_hash
-        except:
-            return False
-    
     def save(self, *args, **kwargs):
         if not self.salt:
-            self.salt = secrets.token_hex(32)
-        super().save(*args, **kwargs)
\ No newline at end of file
+            self.salt = generar_salt()
+        super().save(*args, **kwargs)
+
+class TokenRevocado(models.Model):
+    """Access token invalidado antes de expirar (logout). Ver compartido.jwt_local."""
+    jti = models.CharField(max_length=64, primary_key=True)
+    usuario_id = models.IntegerField()
+    expira = models.DateTimeField()
+    revocado = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} (usuario {self.usuario_id})"
@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from compartido.basedatos import configuracion
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,22 +48,35 @@ INSTALLED_APPS = [
     'usuarios',
 ]
 
+# El primero es el que se usa al guardar; el resto solo verifica hashes
+# existentes, que se rehashean con el primero en el siguiente login correcto
 PASSWORD_HASHERS = [
-    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'usuarios.hashers.PBKDF2AjustableHasher',
     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
     'django.contrib.auth.hashers.Argon2PasswordHasher',
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
-    #'usuarios.models.CustomSHA256Hasher',  # Si decides crear un hasher personalizado
+    'usuarios.hashers.CustomSHA256Hasher',  # Hashes antiguos custom_sha256$
 ]
 
+# Coste de PBKDF2. Cada login correcto cuesta este número de rondas de SHA-256
+# en un core: medir con `python manage.py bench_hashers` antes de cambiarlo.
+USUARIOS_PBKDF2_ITERACIONES = int(os.environ.get('USUARIOS_PBKDF2_ITERACIONES', 600_000))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         #'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'usuarios.auth.IdentidadGatewayAuthentication',
+        'usuarios.auth.JWTLocalAuthentication',
     ],
     #'DEFAULT_PERMISSION_CLASSES': [
     #    'rest_framework.permissions.IsAuthenticated',
     #]
+    # Presupuesto de intentos de login (ver usuarios.throttles): acota tanto
+    # la fuerza bruta como la CPU que se puede gastar hasheando contraseñas
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '20/min',
+        'login_usuario': '10/min',
+    },
 }
 
 SIMPLE_JWT = {
@@ -77,10 +93,25 @@ SIMPLE_JWT = {
     'TOKEN_OBTAIN_SERIALIZER': 'usuarios.serializers.CustomTokenObtainPairSerializer'
 }
 
+# Verificación local de JWT (ver compartido.jwt_local): tokens ya validados que
+# se guardan en memoria y cada cuánto se recarga la lista de tokens revocados
+JWT_CACHE_MAX_ENTRADAS = 10000
+REVOCACION_REFRESCO_SEGUNDOS = 30
+
+# Firma de la cabecera X-Identidad que añade el gateway tras validar el JWT
+# (ver compartido.identidad). Debe coincidir con IDENTIDAD_CLAVE del gateway.
+IDENTIDAD_CLAVE = os.environ.get('IDENTIDAD_CLAVE', 'ClaveIdentidadGateway123')
+
+# Token que presentan los demás servicios para leer la lista de revocados.
+# Debe coincidir con TOKEN_SERVICIOS_INTERNOS de reservas.
+TOKEN_SERVICIOS_INTERNOS = 'TokenServiciosInternos123'
+
 AUTH_USER_MODEL = 'usuarios.Usuario'
 
 MIDDLEWARE = [
+    'compartido.trazas.TrazasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'compartido.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -118,22 +149,11 @@ WSGI_APPLICATION = 'usuarios.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil elegido con DB_PERFIL: sqlite (WAL, por defecto) o postgres (con pool).
+# Ver compartido.basedatos
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion(BASE_DIR, 'usuarios'),
 }
-#DATABASES = {
-#    'default': {
-#        'ENGINE': 'django.db.backends.postgresql',
-#        'NAME': 'reservas_aereas',
-#        'USER': 'postgres',
-#        'PASSWORD': 'tu_password',
-#        'HOST': 'localhost',
-#        'PORT': '5432',
-#    }
-#}
 
 
 # Password validation
@@ -176,3 +196,14 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Trazas distribuidas (ver compartido.trazas). El contexto (cabecera traceparent)
+# se propaga siempre; los spans solo se registran si hay ARCHIVO (JSONL) o
+# COLECTOR (URL que recibe lotes por POST). MUESTREO solo se aplica a las
+# peticiones que no llegan a través del gateway.
+TRAZAS = {
+    'SERVICIO': 'usuarios',
+    'MUESTREO': float(os.environ.get('TRAZAS_MUESTREO', '1.0')),
+    'ARCHIVO': os.environ.get('TRAZAS_ARCHIVO'),
+    'COLECTOR': os.environ.get('TRAZAS_COLECTOR'),
+}
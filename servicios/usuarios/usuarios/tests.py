@@ -0,0 +1,280 @@
+import datetime
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from compartido.jwt_local import CacheTokens, cache_tokens
+
+from .auth import lista_revocacion
+from .models import TokenRevocado, Usuario
+
+
+@override_settings(USUARIOS_PBKDF2_ITERACIONES=1000)
+class HashersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_hash_antiguo_se_rehashea_en_el_login(self):
+        salt = 'a1b2c3'
+        usuario = Usuario.objects.create(username='antiguo', salt=salt)
+        hash_antiguo = 'custom_sha256$%s$%s' % (salt, hashlib.sha256(f'Secreta123{salt}'.encode()).hexdigest())
+        Usuario.objects.filter(pk=usuario.pk).update(password=hash_antiguo)
+
+        respuesta = self.client.post(
+            '/api/auth/login/', {'username': 'antiguo', 'password': 'Secreta123'}, format='json',
+        )
+
+        self.assertEqual(respuesta.status_code, 200)
+        usuario.refresh_from_db()
+        self.assertTrue(usuario.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(usuario.check_password('Secreta123'))
+
+    def test_hash_antiguo_no_se_toca_con_contrasena_incorrecta(self):
+        usuario = Usuario.objects.create(username='antiguo')
+        hash_antiguo = 'custom_sha256$xyz$%s' % hashlib.sha256(b'Secreta123xyz').hexdigest()
+        Usuario.objects.filter(pk=usuario.pk).update(password=hash_antiguo)
+
+        respuesta = self.client.post(
+            '/api/auth/login/', {'username': 'antiguo', 'password': 'Otra'}, format='json',
+        )
+
+        self.assertEqual(respuesta.status_code, 400)
+        usuario.refresh_from_db()
+        self.assertEqual(usuario.password, hash_antiguo)
+
+    def test_cambio_de_iteraciones_rehashea(self):
+        usuario = Usuario.objects.create_user('ana', email='ana@example.com', password='Secreta123')
+        self.assertTrue(usuario.password.startswith('pbkdf2_sha256$1000$'))
+
+        with override_settings(USUARIOS_PBKDF2_ITERACIONES=2000):
+            respuesta = self.client.post(
+                '/api/auth/login/', {'username': 'ana', 'password': 'Secreta123'}, format='json',
+            )
+
+        self.assertEqual(respuesta.status_code, 200)
+        usuario.refresh_from_db()
+        self.assertTrue(usuario.password.startswith('pbkdf2_sha256$2000$'))
+
+
+@override_settings(USUARIOS_PBKDF2_ITERACIONES=1000)
+class LoginThrottleTest(TestCase):
+    # Presupuestos de settings.REST_FRAMEWORK: 10/min por cuenta y 20/min por IP
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+
+    def login(self, username, ip='10.0.0.1'):
+        return self.client.post(
+            '/api/auth/login/', {'username': username, 'password': 'incorrecta'},
+            format='json', REMOTE_ADDR=ip,
+        )
+
+    def test_limite_por_cuenta_desde_varias_ips(self):
+        for i in range(10):
+            self.assertEqual(self.login('victima', ip=f'10.0.0.{i}').status_code, 400)
+
+        respuesta = self.login('victima', ip='10.0.1.1')
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertIn('Retry-After', respuesta)
+        # Las demás cuentas no se ven afectadas
+        self.assertEqual(self.login('otra', ip='10.0.1.1').status_code, 400)
+
+    def test_limite_por_ip_con_varias_cuentas(self):
+        for i in range(20):
+            self.assertEqual(self.login(f'usuario{i}').status_code, 400)
+
+        self.assertEqual(self.login('usuario_nuevo').status_code, 429)
+        self.assertEqual(self.login('usuario_nuevo', ip='10.0.0.2').status_code, 400)
+
+
+class ImportarUsuariosTest(TestCase):
+    def importar(self, filas, **opciones):
+        fd, ruta = tempfile.mkstemp(suffix='.jsonl')
+        self.addCleanup(os.remove, ruta)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(fila) + '\n' for fila in filas)
+        salida, errores = io.StringIO(), io.StringIO()
+        call_command(
+            'import_users', ruta, procesos=1, iteraciones=1000, stdout=salida, stderr=errores, **opciones,
+        )
+        return salida.getvalue(), errores.getvalue()
+
+    def test_salt_distinto_y_hash_previo_conservado(self):
+        hash_previo = 'custom_sha256$abc$%s' % hashlib.sha256(b'Previa123abc').hexdigest()
+        self.importar([
+            {'username': 'uno', 'email': 'uno@example.com', 'password': 'Clave123'},
+            {'username': 'dos', 'email': 'dos@example.com', 'password': 'Clave123'},
+            {'username': 'tres', 'email': 'tres@example.com', 'password_hash': hash_previo},
+        ])
+
+        usuarios = {u.username: u for u in Usuario.objects.all()}
+        self.assertEqual(len({u.salt for u in usuarios.values()}), 3)
+        self.assertTrue(all(len(u.salt) == 64 for u in usuarios.values()))
+        # Misma contraseña en claro, hashes distintos (salt de PBKDF2 por fila)
+        self.assertNotEqual(usuarios['uno'].password, usuarios['dos'].password)
+        self.assertTrue(usuarios['uno'].check_password('Clave123'))
+        self.assertEqual(usuarios['tres'].password, hash_previo)
+
+    def test_fecha_invalida_omite_la_fila(self):
+        salida, errores = self.importar([
+            {'username': 'uno', 'email': 'uno@example.com', 'password': 'Clave123', 'fecha_nacimiento': '1990-05-17'},
+            {'username': 'dos', 'email': 'dos@example.com', 'password': 'Clave123', 'fecha_nacimiento': '2001-02-30'},
+            {'username': 'tres', 'email': 'tres@example.com', 'password': 'Clave123', 'fecha_nacimiento': '17/05/1990'},
+            {'username': 'cuatro', 'email': 'cuatro@example.com', 'password': 'Clave123'},
+        ])
+
+        self.assertEqual(
+            sorted(Usuario.objects.values_list('username', flat=True)), ['cuatro', 'uno'],
+        )
+        self.assertIn("Fila omitida (dos): fecha_nacimiento inválida '2001-02-30'", errores)
+        self.assertIn("Fila omitida (tres)", errores)
+        self.assertIn('2 filas omitidas', errores)
+        self.assertIn('2 usuarios procesados', salida)
+
+    def test_ignorar_existentes_solo_cuenta_los_insertados(self):
+        Usuario.objects.create_user('uno', email='uno@example.com', password='Clave123')
+        salida, errores = self.importar([
+            {'username': 'uno', 'email': 'otro@example.com', 'password': 'Clave123'},
+            {'username': 'dos', 'email': 'dos@example.com', 'password': 'Clave123'},
+            {'username': 'dos', 'email': 'dos@example.com', 'password': 'Clave123'},
+        ], ignorar_existentes=True)
+
+        self.assertEqual(sorted(Usuario.objects.values_list('username', flat=True)), ['dos', 'uno'])
+        self.assertIn('Importación terminada: 1 usuarios procesados', salida)
+        self.assertIn('2 filas omitidas: el usuario ya existía', errores)
+
+
+class MetricasTest(TestCase):
+    def test_metricas_por_endpoint(self):
+        cache.clear()
+        Usuario.objects.create_user('ana', email='ana@example.com', password='Secreta123')
+        with override_settings(USUARIOS_PBKDF2_ITERACIONES=1000):
+            APIClient().post('/api/auth/login/', {'username': 'ana', 'password': 'incorrecta'}, format='json')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        texto = response.content.decode()
+        self.assertIn('http_peticion_segundos_count{metodo="POST",ruta="api/auth/login/",status="400"}', texto)
+        self.assertIn('bd_consultas_total{ruta="api/auth/login/"}', texto)
+        self.assertIn('bd_consultas_por_peticion_count{ruta="api/auth/login/"}', texto)
+
+
+class LogoutTest(TestCase):
+    def setUp(self):
+        cache_tokens.limpiar()
+        self.addCleanup(cache_tokens.limpiar)
+        # Sin hilo de refresco: la lista se recarga en el propio logout
+        patcher = mock.patch.object(lista_revocacion, '_arrancar')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.usuario = Usuario.objects.create_user('ana', email='ana@example.com', password='Secreta123')
+        self.refresh = RefreshToken.for_user(self.usuario)
+        self.access = self.refresh.access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_revoca_el_access_y_el_refresh_token(self):
+        self.assertEqual(self.client.get('/api/auth/perfil/').status_code, 200)
+
+        respuesta = self.client.post('/api/auth/logout/', {'refresh': str(self.refresh)}, format='json')
+
+        self.assertEqual(respuesta.status_code, 204)
+        self.assertEqual(
+            set(TokenRevocado.objects.values_list('jti', flat=True)), {self.access['jti'], self.refresh['jti']},
+        )
+        revocado = TokenRevocado.objects.get(jti=self.refresh['jti'])
+        self.assertEqual(revocado.usuario_id, self.usuario.id)
+        self.assertEqual(revocado.expira.timestamp(), self.refresh['exp'])
+        # El access token, ya en caché de tokens validados, deja de valer en este proceso
+        self.assertEqual(self.client.get('/api/auth/perfil/').status_code, 401)
+
+    def test_sin_refresh_revoca_solo_el_access_token(self):
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 204)
+        self.assertEqual(list(TokenRevocado.objects.values_list('jti', flat=True)), [self.access['jti']])
+
+    def test_refresh_invalido_o_de_otro_usuario(self):
+        otro = Usuario.objects.create_user('luis', email='luis@example.com', password='Secreta123')
+
+        for refresh in ('no-es-un-token', str(RefreshToken.for_user(otro))):
+            respuesta = self.client.post('/api/auth/logout/', {'refresh': refresh}, format='json')
+            self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(TokenRevocado.objects.exists())
+
+    def test_sin_autenticar(self):
+        self.assertEqual(APIClient().post('/api/auth/logout/').status_code, 401)
+
+
+class RevocadosTest(TestCase):
+    def setUp(self):
+        ahora = timezone.now()
+        TokenRevocado.objects.create(jti='antiguo', usuario_id=1, expira=ahora + datetime.timedelta(hours=1))
+        TokenRevocado.objects.create(jti='nuevo', usuario_id=1, expira=ahora + datetime.timedelta(hours=1))
+        TokenRevocado.objects.create(jti='expirado', usuario_id=1, expira=ahora - datetime.timedelta(seconds=1))
+        TokenRevocado.objects.filter(jti='antiguo').update(revocado=ahora - datetime.timedelta(minutes=10))
+        self.desde = (ahora - datetime.timedelta(minutes=1)).timestamp()
+
+    def revocados(self, token=None, **params):
+        token = token or settings.TOKEN_SERVICIOS_INTERNOS
+        return self.client.get('/api/auth/revocados/', params, HTTP_X_SERVICIO_TOKEN=token)
+
+    def test_requiere_token_de_servicio(self):
+        self.assertEqual(self.client.get('/api/auth/revocados/').status_code, 403)
+        self.assertEqual(self.revocados(token='otro').status_code, 403)
+
+    def test_vigentes_y_nuevos_desde(self):
+        todos = self.revocados().json()
+        nuevos = self.revocados(desde=self.desde).json()
+
+        self.assertEqual({r['jti'] for r in todos['revocados']}, {'antiguo', 'nuevo'})
+        self.assertEqual([r['jti'] for r in nuevos['revocados']], ['nuevo'])
+        self.assertAlmostEqual(nuevos['hasta'], time.time(), delta=5)
+
+    def test_desde_invalido(self):
+        for desde in ('ayer', 'inf', '-inf', 'nan', '1e300'):
+            self.assertEqual(self.revocados(desde=desde).status_code, 400, desde)
+
+
+class CacheTokensTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = CacheTokens()
+
+    def guardar(self, raw_token, expira_en=60):
+        token = {'exp': time.time() + expira_en, 'raw': raw_token}
+        self.cache.guardar(raw_token, token)
+        return token
+
+    @override_settings(JWT_CACHE_MAX_ENTRADAS=2)
+    def test_descarta_el_menos_usado(self):
+        uno = self.guardar(b'cabecera.datos.firma1')
+        self.guardar(b'cabecera.datos.firma2')
+        # Leer el primero lo pone al final de la cola: el que sale es el segundo
+        self.assertEqual(self.cache.obtener(b'cabecera.datos.firma1'), uno)
+        tres = self.guardar(b'cabecera.datos.firma3')
+
+        self.assertEqual(self.cache.obtener(b'cabecera.datos.firma1'), uno)
+        self.assertIsNone(self.cache.obtener(b'cabecera.datos.firma2'))
+        self.assertEqual(self.cache.obtener(b'cabecera.datos.firma3'), tres)
+
+    def test_token_expirado_no_se_devuelve(self):
+        self.guardar(b'cabecera.datos.firma', expira_en=-1)
+        self.assertIsNone(self.cache.obtener(b'cabecera.datos.firma'))
+        self.assertEqual(len(self.cache._entradas), 0)
+
+    def test_misma_firma_con_otro_contenido(self):
+        self.guardar(b'cabecera.datos.firma')
+        self.assertIsNone(self.cache.obtener(b'cabecera.alterados.firma'))
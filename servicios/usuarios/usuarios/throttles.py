@@ -0,0 +1,20 @@
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle
+
+
+class LoginIPThrottle(AnonRateThrottle):
+    """Intentos de login por IP, autenticado o no."""
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginUsuarioThrottle(SimpleRateThrottle):
+    """Intentos de login contra una misma cuenta, vengan de donde vengan."""
+    scope = 'login_usuario'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': str(username).lower()}
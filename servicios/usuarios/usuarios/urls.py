@@ -16,13 +16,20 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from .views import RegistroUsuarioView, LoginView, UsuarioDetailView, verify_token, generate_or_verify_token
+from .views import (
+    RegistroUsuarioView, LoginView, LogoutView, RevocadosView, UsuarioDetailView,
+    verify_token, generate_or_verify_token,
+)
+from compartido.metricas import vista_metricas
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', vista_metricas, name='metricas'),
     path('api/auth/', include([
         path('registro/', RegistroUsuarioView.as_view(), name='registro'),
         path('login/', LoginView.as_view(), name='login'),
+        path('logout/', LogoutView.as_view(), name='logout'),
+        path('revocados/', RevocadosView.as_view(), name='tokens-revocados'),
         path('perfil/', UsuarioDetailView.as_view(), name='perfil'),
         path('verify-token/', verify_token, name='verify-token'),
         path('tokens/', generate_or_verify_token, name='token-generate'),
@@ -2,12 +2,21 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
-from .models import Usuario
+from .models import Usuario, TokenRevocado
+from .auth import lista_revocacion, revocaciones
 from .serializers import UsuarioSerializer, CustomTokenObtainPairSerializer
+from .throttles import LoginIPThrottle, LoginUsuarioThrottle
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.views import APIView
+from django.conf import settings
+import datetime
+import hmac
+import math
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     pass
@@ -18,6 +27,9 @@ class RegistroUsuarioView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
 class LoginView(TokenObtainPairView):
+    # Cada intento cuesta un hash de contraseña: se limita por IP y por cuenta
+    throttle_classes = [LoginIPThrottle, LoginUsuarioThrottle]
+
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         
@@ -43,6 +55,60 @@ class LoginView(TokenObtainPairView):
 
         return Response(response_data, status=status.HTTP_200_OK)
 
+class LogoutView(APIView):
+    """
+    Revoca el access token con el que se hace la petición y, si viene en el
+    cuerpo (``refresh``), el refresh token de la misma sesión.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        tokens = [request.auth]
+        if request.data.get('refresh'):
+            try:
+                refresh = RefreshToken(request.data['refresh'])
+            except TokenError:
+                return Response({'error': 'Refresh token inválido o expirado'}, status=status.HTTP_400_BAD_REQUEST)
+            # simplejwt guarda el user_id como texto
+            if str(refresh.get('user_id')) != str(request.user.id):
+                return Response({'error': 'El refresh token es de otro usuario'}, status=status.HTTP_400_BAD_REQUEST)
+            tokens.append(refresh)
+        for token in tokens:
+            TokenRevocado.objects.get_or_create(
+                jti=token['jti'],
+                defaults={
+                    'usuario_id': request.user.id,
+                    'expira': datetime.datetime.fromtimestamp(token['exp'], tz=datetime.timezone.utc),
+                },
+            )
+        # Este proceso lo aplica ya; el resto, en su siguiente refresco
+        lista_revocacion.actualizar()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class RevocadosView(APIView):
+    """Lista de tokens revocados que los demás servicios piden periódicamente."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        token = request.headers.get('X-Servicio-Token', '')
+        if not hmac.compare_digest(token, settings.TOKEN_SERVICIOS_INTERNOS):
+            return Response({'error': 'Token de servicio inválido'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            desde = float(request.query_params['desde']) if 'desde' in request.query_params else None
+            # inf/nan o una fecha fuera de rango harían fallar la consulta con un 500
+            if desde is not None:
+                if not math.isfinite(desde):
+                    raise ValueError
+                datetime.datetime.fromtimestamp(desde, tz=datetime.timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            return Response({'error': "Parámetro 'desde' inválido"}, status=status.HTTP_400_BAD_REQUEST)
+        revocados, hasta = revocaciones(desde)
+        return Response({
+            'revocados': [{'jti': jti, 'expira': expira} for jti, expira in revocados],
+            'hasta': hasta,
+        })
+
 class UsuarioDetailView(generics.RetrieveUpdateAPIView):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
@@ -0,0 +1,144 @@
+"""
+Caché de resultados de búsqueda de vuelos.
+
+Las entradas viven en el alias ``busqueda_vuelos`` de CACHES (LRU + TTL con
+LocMemCache, o compartidas entre procesos si se configura Redis/Memcached).
+Cada clave incluye la "generación" del ámbito que la invalida:
+
+- ``fecha:<origen>:<destino>:<dia>``: búsquedas de una ruta en un día concreto.
+- ``ruta:<origen>:<destino>``: búsquedas de la ruta sin fecha o por rango de fechas.
+- ``ruta:*``: búsquedas sin origen o sin destino.
+
+Cuando cambia un ``Vuelo`` se renuevan las generaciones de su ruta y su día, y
+las entradas afectadas dejan de ser alcanzables hasta que las expulse el LRU.
+Además, todas las claves llevan la generación ``todas``, que se renueva cuando
+cambia un ``Aeropuerto``: su nombre y su ciudad van dentro de cada resultado.
+"""
+import hashlib
+import threading
+import time
+
+from django.core.cache import caches
+from django.utils import timezone
+
+from .fechas import parsear_fecha, parsear_flexibilidad
+
+CACHE_ALIAS = 'busqueda_vuelos'
+
+# Parámetros que cambian el resultado de la búsqueda
+PARAMETROS = (
+    'origen', 'destino', 'fecha', 'flexibilidad', 'fecha_desde', 'fecha_hasta',
+    'ordering', 'cursor', 'page_size',
+)
+FECHAS = ('fecha', 'fecha_desde', 'fecha_hasta')
+
+
+class Estadisticas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def registrar(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'miss_ratio': self.misses / total if total else 0.0,
+            }
+
+
+estadisticas = Estadisticas()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def normalizar(query_params):
+    """Parámetros relevantes de la búsqueda, en un orden y formato canónicos."""
+    params = {}
+    for nombre in PARAMETROS:
+        valor = query_params.get(nombre, '').strip()
+        if valor:
+            params[nombre] = valor.upper() if nombre in ('origen', 'destino') else valor
+
+    # Una fecha inválida se ignora en la búsqueda, así que tampoco forma parte de la clave
+    for nombre in FECHAS:
+        if nombre in params:
+            fecha = parsear_fecha(params.pop(nombre))
+            if fecha:
+                params[nombre] = fecha.isoformat()
+    if 'flexibilidad' in params:
+        dias = parsear_flexibilidad(params.pop('flexibilidad'))
+        if dias and 'fecha' in params:
+            params['flexibilidad'] = str(dias)
+    return params
+
+
+def _ambito(params):
+    origen, destino = params.get('origen'), params.get('destino')
+    if not (origen and destino):
+        return 'ruta:*'
+    if 'fecha' in params and 'flexibilidad' not in params:
+        return f"fecha:{origen}:{destino}:{params['fecha']}"
+    return f"ruta:{origen}:{destino}"
+
+
+def _generacion(ambito):
+    """Generación actual de un ámbito; se crea con un valor único si no existe.
+
+    Se usa un valor basado en el reloj (y no un contador desde 0) para que, si
+    el LRU expulsa la clave de generación, la nueva nunca coincida con una antigua.
+    """
+    clave = f"gen:{ambito}"
+    generacion = _cache().get(clave)
+    if generacion is None:
+        _cache().add(clave, time.time_ns(), timeout=None)
+        generacion = _cache().get(clave)
+    return generacion
+
+
+def clave(params):
+    ambito = _ambito(params)
+    firma = '&'.join(f"{nombre}={params[nombre]}" for nombre in sorted(params))
+    resumen = hashlib.sha1(firma.encode()).hexdigest()
+    # v2: las entradas son (etag, datos)
+    return f"busqueda:v2:{ambito}:{_generacion('todas')}.{_generacion(ambito)}:{resumen}"
+
+
+def obtener(clave_busqueda):
+    datos = _cache().get(clave_busqueda)
+    estadisticas.registrar(hit=datos is not None)
+    return datos
+
+
+def guardar(clave_busqueda, datos):
+    # La clave se calcula antes de consultar la BD: si el vuelo cambia mientras
+    # tanto, el resultado queda guardado bajo la generación ya invalidada.
+    _cache().set(clave_busqueda, datos)
+
+
+def invalidar(origen, destino, fecha_salida):
+    """Invalida las búsquedas que pueden incluir un vuelo de esa ruta y fecha."""
+    dia = timezone.localdate(fecha_salida).isoformat()
+    nueva = time.time_ns()
+    _cache().set_many({
+        f"gen:fecha:{origen}:{destino}:{dia}": nueva,
+        f"gen:ruta:{origen}:{destino}": nueva,
+        'gen:ruta:*': nueva,
+    }, timeout=None)
+
+
+def invalidar_todo():
+    """Invalida todas las búsquedas (p. ej. al renombrar un aeropuerto)."""
+    _cache().set('gen:todas', time.time_ns(), timeout=None)
@@ -0,0 +1,62 @@
+"""
+Peticiones condicionales (ETag / Last-Modified) para las vistas que el
+frontend consulta una y otra vez.
+
+Cada vista calcula la versión de lo que va a devolver sin serializarlo y, si
+coincide con la que manda el cliente (``If-None-Match`` o
+``If-Modified-Since``), responde 304 sin cuerpo:
+
+* Detalle de un vuelo: ``Vuelo.actualizado``, leído con una consulta de una
+  sola columna por clave primaria, sin joins.
+* Búsqueda: los ids y ``actualizado`` de los vuelos de la página más el
+  enlace a la siguiente. Se guarda junto al resultado en la caché de
+  búsquedas, así que un acierto de caché responde 304 sin tocar la BD.
+* Aeropuertos: la versión de la tabla que calcula el registro en memoria
+  (solo ETag: un borrado no deja fecha de modificación).
+
+Las respuestas llevan ``Cache-Control: no-cache``: el navegador puede guardarlas,
+pero revalida cada vez, y un 304 le basta para reutilizar el cuerpo que ya tiene.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+CACHE_CONTROL = 'no-cache'
+
+
+def etag(*partes):
+    return '"%s"' % hashlib.sha1(':'.join(str(parte) for parte in partes).encode()).hexdigest()
+
+
+def etag_vuelo(vuelo_id, actualizado):
+    return f'"{vuelo_id}-{int(actualizado.timestamp() * 1_000_000)}"'
+
+
+def etag_vuelos(filas, *partes):
+    """ETag de un listado de filas con ``id`` y ``actualizado``."""
+    return etag(*partes, *(f'{fila.id}-{int(fila.actualizado.timestamp() * 1_000_000)}' for fila in filas))
+
+
+def es_condicional(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def marcar(response, etag_, actualizado=None):
+    response['ETag'] = etag_
+    if actualizado is not None:
+        response['Last-Modified'] = http_date(actualizado.timestamp())
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def no_modificado(request, etag_, actualizado=None):
+    """La respuesta 304 (o 412) si el cliente ya tiene esta versión; si no, ``None``."""
+    response = get_conditional_response(
+        request,
+        etag=etag_,
+        last_modified=int(actualizado.timestamp()) if actualizado is not None else None,
+    )
+    if response is not None:
+        marcar(response, etag_, actualizado)
+    return response
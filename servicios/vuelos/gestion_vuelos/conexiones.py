@@ -0,0 +1,269 @@
+"""
+Búsqueda de itinerarios con escalas sobre un grafo de vuelos en memoria.
+
+Cada proceso mantiene los vuelos futuros como un grafo expandido en el tiempo:
+por aeropuerto de origen, la lista de sus vuelos ordenada por hora de salida,
+de forma que "los vuelos que salen de X entre t1 y t2" son dos ``bisect``. Los
+asientos disponibles se guardan aparte para poder ajustarlos sin tocar las
+listas.
+
+La búsqueda es de llegada más temprana con límites:
+
+* Como máximo ``escalas`` escalas (2), sin repetir aeropuerto.
+* En cada escala, tiempo mínimo de conexión (``CONEXIONES_MINIMO_MINUTOS``,
+  ajustable por aeropuerto), más ``CONEXIONES_CAMBIO_AEROLINEA_MINUTOS`` si
+  se cambia de aerolínea, y como mucho ``CONEXIONES_ESPERA_MAXIMA_HORAS``.
+* Solo se siguen vuelos hacia aeropuertos desde los que aún se puede llegar
+  al destino con los vuelos que quedan (alcance calculado hacia atrás sobre
+  el grafo de rutas).
+* Los caminos parciales se expanden en orden de llegada y cada aeropuerto se
+  expande como mucho ``limite`` veces por número de vuelos: los itinerarios
+  salen ya ordenados por llegada y el trabajo queda acotado.
+
+El grafo se carga con la primera búsqueda y se actualiza incrementalmente
+cuando un ``Vuelo`` se guarda o se borra (``signals``) y cuando se retienen o
+liberan asientos (``inventario``). Cada ``CONEXIONES_REFRESCO_SEGUNDOS`` se
+recarga entero en segundo plano, sin bloquear búsquedas, para recoger los
+cambios hechos desde otros procesos o con ``update()``/``bulk_create()``.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import Vuelo
+from .registro import registro
+
+logger = logging.getLogger(__name__)
+
+# salida y llegada en segundos desde epoch; el orden natural es por salida
+Tramo = namedtuple('Tramo', 'salida llegada id origen destino aerolinea precio')
+
+CAMPOS = (
+    'fecha_salida', 'fecha_llegada', 'id', 'origen_id', 'destino_id', 'aerolinea_id',
+    'precio_base', 'asientos_disponibles',
+)
+
+
+def _tramo(salida, llegada, vuelo_id, origen, destino, aerolinea, precio):
+    return Tramo(salida.timestamp(), llegada.timestamp(), vuelo_id, origen, destino, aerolinea, precio)
+
+
+class _Grafo:
+    def __init__(self, filas):
+        self.por_id = {}
+        self.asientos = {}
+        self.entrantes = {}  # destino -> frozenset de orígenes con vuelo directo
+        por_origen = defaultdict(list)
+        entrantes = defaultdict(set)
+        for *datos, asientos in filas:
+            tramo = _tramo(*datos)
+            por_origen[tramo.origen].append(tramo)
+            entrantes[tramo.destino].add(tramo.origen)
+            self.por_id[tramo.id] = tramo
+            self.asientos[tramo.id] = asientos
+
+        # origen -> (horas de salida, tramos), ambas ordenadas por salida
+        self.por_origen = {}
+        for origen, tramos in por_origen.items():
+            tramos.sort()
+            self.por_origen[origen] = ([tramo.salida for tramo in tramos], tramos)
+        self.entrantes = {destino: frozenset(origenes) for destino, origenes in entrantes.items()}
+        self.cargado = time.monotonic()
+
+    def salidas(self, origen, desde, hasta):
+        entrada = self.por_origen.get(origen)
+        if entrada is None:
+            return
+        salidas, tramos = entrada
+        for i in range(bisect_left(salidas, desde), bisect_left(salidas, hasta)):
+            yield tramos[i]
+
+    def alcance(self, destino, maximo):
+        """Aeropuerto -> mínimo de vuelos para llegar a ``destino`` (hasta ``maximo``)."""
+        alcance = {destino: 0}
+        frontera = [destino]
+        for vuelos in range(1, maximo + 1):
+            siguiente = []
+            for aeropuerto in frontera:
+                for origen in self.entrantes.get(aeropuerto, ()):
+                    if origen not in alcance:
+                        alcance[origen] = vuelos
+                        siguiente.append(origen)
+            frontera = siguiente
+        return alcance
+
+    # Los cambios sustituyen la entrada del origen por una lista nueva: las
+    # búsquedas en curso siguen recorriendo la anterior sin bloqueos
+
+    def poner(self, tramo, asientos):
+        self.quitar(tramo.id)
+        salidas, tramos = self.por_origen.get(tramo.origen, ([], []))
+        i = bisect_left(tramos, tramo)
+        self.por_origen[tramo.origen] = (
+            salidas[:i] + [tramo.salida] + salidas[i:],
+            tramos[:i] + [tramo] + tramos[i:],
+        )
+        self.por_id[tramo.id] = tramo
+        self.asientos[tramo.id] = asientos
+        origenes = self.entrantes.get(tramo.destino, frozenset())
+        if tramo.origen not in origenes:
+            self.entrantes[tramo.destino] = origenes | {tramo.origen}
+
+    def quitar(self, vuelo_id):
+        tramo = self.por_id.pop(vuelo_id, None)
+        if tramo is None:
+            return
+        salidas, tramos = self.por_origen[tramo.origen]
+        i = bisect_left(tramos, tramo)
+        self.por_origen[tramo.origen] = (salidas[:i] + salidas[i + 1:], tramos[:i] + tramos[i + 1:])
+        self.asientos.pop(vuelo_id, None)
+
+
+class GrafoRutas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grafo = None
+        # Cambios aplicados durante una recarga en segundo plano; se repiten
+        # sobre el grafo nuevo antes de publicarlo
+        self._pendientes = None
+
+    def _cargar(self):
+        filas = Vuelo.objects.filter(fecha_salida__gte=timezone.now()).values_list(*CAMPOS)
+        return _Grafo(filas.iterator(chunk_size=5000))
+
+    def _actual(self):
+        grafo = self._grafo
+        if grafo is None:
+            with self._lock:
+                if self._grafo is None:
+                    self._grafo = self._cargar()
+                return self._grafo
+        refresco = getattr(settings, 'CONEXIONES_REFRESCO_SEGUNDOS', 300)
+        if self._pendientes is None and time.monotonic() - grafo.cargado > refresco:
+            self._recargar_en_segundo_plano()
+        return grafo
+
+    def _recargar_en_segundo_plano(self):
+        with self._lock:
+            if self._pendientes is not None:
+                return
+            self._pendientes = []
+        threading.Thread(target=self._recargar, name='grafo-rutas', daemon=True).start()
+
+    def _recargar(self):
+        try:
+            grafo = self._cargar()
+        except Exception:
+            logger.warning('No se pudo recargar el grafo de rutas', exc_info=True)
+            grafo = None
+        finally:
+            connection.close()
+        with self._lock:
+            if grafo is None:
+                # Se sigue con el grafo actual y se reintenta tras otro periodo
+                if self._grafo is not None:
+                    self._grafo.cargado = time.monotonic()
+            else:
+                for cambio in self._pendientes:
+                    cambio(grafo)
+                self._grafo = grafo
+            self._pendientes = None
+
+    def _aplicar(self, cambio, repetir=True):
+        with self._lock:
+            if self._grafo is None:
+                return
+            cambio(self._grafo)
+            if repetir and self._pendientes is not None:
+                self._pendientes.append(cambio)
+
+    def actualizar_vuelo(self, vuelo):
+        if vuelo.fecha_salida < timezone.now():
+            self.quitar_vuelo(vuelo.pk)
+            return
+        tramo = _tramo(
+            vuelo.fecha_salida, vuelo.fecha_llegada, vuelo.pk, vuelo.origen_id, vuelo.destino_id,
+            vuelo.aerolinea_id, vuelo.precio_base,
+        )
+        asientos = vuelo.asientos_disponibles
+        self._aplicar(lambda grafo: grafo.poner(tramo, asientos))
+
+    def quitar_vuelo(self, vuelo_id):
+        self._aplicar(lambda grafo: grafo.quitar(vuelo_id))
+
+    def ajustar_asientos(self, vuelo_id, diferencia):
+        def ajustar(grafo):
+            if vuelo_id in grafo.asientos:
+                grafo.asientos[vuelo_id] = max(0, grafo.asientos[vuelo_id] + diferencia)
+        # Un ajuste relativo no se repite sobre un grafo recargado: la recarga
+        # puede haberlo leído ya de la BD. Como mucho el contador queda
+        # desfasado hasta la siguiente recarga; la retención en BD manda.
+        self._aplicar(ajustar, repetir=False)
+
+    def buscar(self, origen, destino, desde, hasta, escalas=2, pasajeros=1, limite=20):
+        """
+        Itinerarios (tuplas de ``Tramo``) de ``origen`` a ``destino`` (ids de
+        aeropuerto) con la primera salida en ``[desde, hasta)``, ordenados por
+        hora de llegada.
+        """
+        grafo = self._actual()
+        alcance = grafo.alcance(destino, escalas + 1)
+        if origen not in alcance or origen == destino:
+            return []
+
+        minimo_defecto = getattr(settings, 'CONEXIONES_MINIMO_MINUTOS', 45) * 60
+        minimos = {
+            registro.id(codigo): minutos * 60
+            for codigo, minutos in getattr(settings, 'CONEXIONES_MINIMO_POR_AEROPUERTO', {}).items()
+        }
+        cambio_aerolinea = getattr(settings, 'CONEXIONES_CAMBIO_AEROLINEA_MINUTOS', 30) * 60
+        espera_maxima = getattr(settings, 'CONEXIONES_ESPERA_MAXIMA_HORAS', 24) * 3600
+        asientos = grafo.asientos
+        orden = itertools.count()
+
+        abiertos = []
+        for tramo in grafo.salidas(origen, desde.timestamp(), hasta.timestamp()):
+            if alcance.get(tramo.destino, escalas + 1) <= escalas and asientos.get(tramo.id, 0) >= pasajeros:
+                abiertos.append((tramo.llegada, next(orden), (tramo,)))
+        heapq.heapify(abiertos)
+
+        resultados = []
+        expandidos = defaultdict(int)
+        while abiertos and len(resultados) < limite:
+            llegada, _, camino = heapq.heappop(abiertos)
+            ultimo = camino[-1]
+            if ultimo.destino == destino:
+                resultados.append(camino)
+                continue
+            clave = (ultimo.destino, len(camino))
+            if expandidos[clave] >= limite:
+                continue
+            expandidos[clave] += 1
+
+            restantes = escalas - len(camino)
+            visitados = {origen, *(tramo.destino for tramo in camino)}
+            primera = llegada + minimos.get(ultimo.destino, minimo_defecto)
+            for siguiente in grafo.salidas(ultimo.destino, primera, llegada + espera_maxima):
+                if siguiente.destino in visitados or alcance.get(siguiente.destino, restantes + 1) > restantes:
+                    continue
+                if siguiente.aerolinea != ultimo.aerolinea and siguiente.salida < primera + cambio_aerolinea:
+                    continue
+                if asientos.get(siguiente.id, 0) < pasajeros:
+                    continue
+                heapq.heappush(abiertos, (siguiente.llegada, next(orden), camino + (siguiente,)))
+        return resultados
+
+    def invalidar(self):
+        with self._lock:
+            self._grafo = None
+
+
+grafo = GrafoRutas()
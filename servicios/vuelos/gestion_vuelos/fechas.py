@@ -0,0 +1,61 @@
+"""
+Rangos de fechas de la búsqueda de vuelos.
+
+Los filtros por día se traducen a rangos semiabiertos ``[inicio, fin)`` sobre
+``fecha_salida`` en la zona horaria configurada, en lugar de ``fecha_salida__date``.
+Así la columna no queda envuelta en un cast y la consulta puede recorrer el índice
+``(origen, destino, fecha_salida)`` de ``Vuelo`` como un rango.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+# Máximo de días de flexibilidad (±N) admitidos con ``fecha``
+MAX_FLEXIBILIDAD = 7
+
+
+def parsear_fecha(valor):
+    """``date`` a partir de 'YYYY-MM-DD', o ``None`` si falta o no es válida."""
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor.strip(), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def parsear_flexibilidad(valor):
+    try:
+        return min(max(int(valor), 0), MAX_FLEXIBILIDAD)
+    except (TypeError, ValueError):
+        return 0
+
+
+def inicio_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def rango_busqueda(query_params):
+    """
+    Devuelve ``(desde, hasta)`` para filtrar ``fecha_salida >= desde`` y
+    ``fecha_salida < hasta``; cualquiera de los dos puede ser ``None``.
+
+    - ``fecha`` (+ ``flexibilidad`` opcional): ese día, o ±N días alrededor.
+    - ``fecha_desde`` / ``fecha_hasta``: días inclusivos; se puede omitir uno.
+
+    Las fechas inválidas se ignoran, igual que hasta ahora con ``fecha``.
+    """
+    fecha = parsear_fecha(query_params.get('fecha'))
+    if fecha:
+        dias = parsear_flexibilidad(query_params.get('flexibilidad'))
+        return (
+            inicio_dia(fecha - timedelta(days=dias)),
+            inicio_dia(fecha + timedelta(days=dias + 1)),
+        )
+
+    fecha_desde = parsear_fecha(query_params.get('fecha_desde'))
+    fecha_hasta = parsear_fecha(query_params.get('fecha_hasta'))
+    return (
+        inicio_dia(fecha_desde) if fecha_desde else None,
+        inicio_dia(fecha_hasta + timedelta(days=1)) if fecha_hasta else None,
+    )
@@ -0,0 +1,74 @@
+"""
+Inventario de asientos.
+
+Retener y liberar asientos son un único ``UPDATE`` condicional sobre la fila
+del vuelo (``asientos_disponibles = asientos_disponibles - n WHERE
+asientos_disponibles >= n``): sin leer-modificar-escribir ni bloqueos
+explícitos, dos retenciones concurrentes nunca pueden dejar el contador en
+negativo.
+
+La ruta del vuelo (para invalidar la caché de búsquedas) se lee antes del
+``UPDATE``: si esa lectura falla no se ha tocado el inventario, y una vez
+descontados los asientos ya no queda nada que pueda fallar: si falla la
+actualización del calendario de tarifas se registra y la fila del día queda
+como estaba hasta el siguiente cambio (o ``recalcular_tarifas``).
+"""
+import logging
+
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+from . import cache, tarifas
+from .conexiones import grafo
+from .models import Vuelo
+
+logger = logging.getLogger(__name__)
+
+
+def _ruta(vuelo_id):
+    return (
+        Vuelo.objects.filter(pk=vuelo_id)
+        .values_list('origen__codigo', 'destino__codigo', 'fecha_salida')
+        .first()
+    )
+
+
+def _ajustar_tarifas(ruta, diferencia):
+    try:
+        tarifas.ajustar_asientos(*ruta, diferencia)
+    except DatabaseError:
+        logger.warning('No se pudo actualizar el calendario de tarifas de %s-%s', ruta[0], ruta[1], exc_info=True)
+
+
+def retener_asientos(vuelo_id, asientos):
+    """Descuenta ``asientos`` si quedan suficientes. Devuelve si se pudo."""
+    ruta = _ruta(vuelo_id)
+    if ruta is None:
+        return False
+    # auto_now no se aplica en update(): la versión del vuelo (ETag) se renueva a mano
+    actualizados = Vuelo.objects.filter(
+        pk=vuelo_id, asientos_disponibles__gte=asientos
+    ).update(asientos_disponibles=F('asientos_disponibles') - asientos, actualizado=timezone.now())
+    if actualizados:
+        # update() no dispara post_save: las búsquedas cacheadas, el calendario
+        # de tarifas y el grafo de conexiones se actualizan aquí
+        cache.invalidar(*ruta)
+        _ajustar_tarifas(ruta, -asientos)
+        grafo.ajustar_asientos(vuelo_id, -asientos)
+    return bool(actualizados)
+
+
+def liberar_asientos(vuelo_id, asientos):
+    """Devuelve ``asientos`` al vuelo. Devuelve ``False`` si el vuelo no existe."""
+    ruta = _ruta(vuelo_id)
+    if ruta is None:
+        return False
+    actualizados = Vuelo.objects.filter(pk=vuelo_id).update(
+        asientos_disponibles=F('asientos_disponibles') + asientos, actualizado=timezone.now()
+    )
+    if actualizados:
+        cache.invalidar(*ruta)
+        _ajustar_tarifas(ruta, asientos)
+        grafo.ajustar_asientos(vuelo_id, asientos)
+    return bool(actualizados)
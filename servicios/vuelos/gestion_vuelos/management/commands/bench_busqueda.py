@@ -0,0 +1,122 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from gestion_vuelos.fechas import inicio_dia
+from gestion_vuelos.models import Aerolinea, Aeropuerto, Vuelo
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el filtro por fecha_salida__date con el rango semiabierto sobre una '
+        'tabla sembrada de vuelos. Todo se hace en una transacción que se revierte al final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vuelos', type=int, default=2_000_000)
+        parser.add_argument('--aeropuertos', type=int, default=40)
+        parser.add_argument('--dias', type=int, default=365)
+        parser.add_argument('--repeticiones', type=int, default=200)
+        parser.add_argument('--lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._ejecutar(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Datos de prueba revertidos')
+
+    def _ejecutar(self, options):
+        aeropuertos = Aeropuerto.objects.bulk_create([
+            Aeropuerto(codigo=f'Z{i:02d}', nombre=f'Bench {i}', ciudad='-', pais='-')
+            for i in range(options['aeropuertos'])
+        ])
+        aerolinea = Aerolinea.objects.create(codigo='ZZ', nombre='Bench')
+        # Solo los aeropuertos recién creados: la BD puede tener otros con códigos en Z
+        ids = [a.id for a in aeropuertos]
+
+        ahora = timezone.now()
+        n, lote = options['vuelos'], options['lote']
+        inicio = time.perf_counter()
+        for base in range(0, n, lote):
+            filas = []
+            for i in range(base, min(base + lote, n)):
+                origen, destino = random.sample(ids, 2)
+                salida = ahora + timedelta(minutes=random.randint(60, options['dias'] * 24 * 60))
+                filas.append(Vuelo(
+                    codigo_vuelo=f'B{i:09d}',
+                    aerolinea=aerolinea,
+                    origen_id=origen,
+                    destino_id=destino,
+                    fecha_salida=salida,
+                    fecha_llegada=salida + timedelta(hours=2),
+                    duracion=timedelta(hours=2),
+                    asientos_disponibles=random.randint(0, 200),
+                    precio_base=Decimal('100.00'),
+                ))
+            Vuelo.objects.bulk_create(filas, batch_size=lote)
+        self.stdout.write(f'{n} vuelos sembrados en {time.perf_counter() - inicio:.1f}s')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE gestion_vuelos_vuelo')
+
+        consultas = []
+        for _ in range(options['repeticiones']):
+            origen, destino = random.sample(ids, 2)
+            dia = (ahora + timedelta(days=random.randint(1, options['dias'] - 1))).date()
+            consultas.append((origen, destino, dia))
+
+        def por_date(origen, destino, dia):
+            return Vuelo.objects.filter(
+                origen_id=origen, destino_id=destino,
+                fecha_salida__gte=ahora, asientos_disponibles__gt=0,
+                fecha_salida__date=dia,
+            )
+
+        def por_rango(origen, destino, dia):
+            return Vuelo.objects.filter(
+                origen_id=origen, destino_id=destino,
+                fecha_salida__gte=max(inicio_dia(dia), ahora),
+                fecha_salida__lt=inicio_dia(dia + timedelta(days=1)),
+                asientos_disponibles__gt=0,
+            )
+
+        def por_rango_flexible(origen, destino, dia):
+            return Vuelo.objects.filter(
+                origen_id=origen, destino_id=destino,
+                fecha_salida__gte=max(inicio_dia(dia - timedelta(days=3)), ahora),
+                fecha_salida__lt=inicio_dia(dia + timedelta(days=4)),
+                asientos_disponibles__gt=0,
+            )
+
+        for nombre, consulta in (
+            ('fecha_salida__date', por_date),
+            ('rango semiabierto', por_rango),
+            ('rango ±3 días', por_rango_flexible),
+        ):
+            self.stdout.write(f'\n== {nombre}')
+            self.stdout.write(consulta(*consultas[0]).explain())
+            tiempos = []
+            filas = 0
+            for args in consultas:
+                t0 = time.perf_counter()
+                filas += len(list(consulta(*args).values_list('id', flat=True)))
+                tiempos.append(time.perf_counter() - t0)
+            tiempos.sort()
+            self.stdout.write(
+                f'media={statistics.fmean(tiempos) * 1000:.2f}ms '
+                f'p50={tiempos[len(tiempos) // 2] * 1000:.2f}ms '
+                f'p99={tiempos[int(len(tiempos) * 0.99) - 1] * 1000:.2f}ms '
+                f'filas/consulta={filas / len(consultas):.1f}'
+            )
@@ -0,0 +1,124 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from gestion_vuelos.conexiones import grafo
+from gestion_vuelos.models import Aerolinea, Aeropuerto, Vuelo
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la búsqueda de conexiones sobre una tabla sembrada de vuelos: carga del '
+        'grafo, latencia de búsquedas con 1 y 2 escalas y coste de las actualizaciones '
+        'incrementales. Todo se hace en una transacción que se revierte al final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vuelos', type=int, default=150_000)
+        parser.add_argument('--aeropuertos', type=int, default=200)
+        parser.add_argument('--aerolineas', type=int, default=8)
+        parser.add_argument('--dias', type=int, default=30)
+        parser.add_argument('--repeticiones', type=int, default=300)
+        parser.add_argument('--lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._ejecutar(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Datos de prueba revertidos')
+        finally:
+            grafo.invalidar()
+
+    def _ejecutar(self, options):
+        aeropuertos = Aeropuerto.objects.bulk_create([
+            Aeropuerto(codigo=self._codigo(i), nombre=f'Bench {i}', ciudad='-', pais='-')
+            for i in range(options['aeropuertos'])
+        ])
+        aerolineas = Aerolinea.objects.bulk_create([
+            Aerolinea(codigo=f'Z{i}', nombre=f'Bench {i}') for i in range(options['aerolineas'])
+        ])
+        # Solo los objetos recién creados: la BD puede tener otros con códigos en Z
+        codigos = [a.codigo for a in aeropuertos]
+        ids = {a.codigo: a.id for a in aeropuertos}
+        aerolinea_ids = [a.id for a in aerolineas]
+
+        # Unos pocos aeropuertos concentran el tráfico, como los hubs reales
+        pesos = [1 / (i + 1) for i in range(len(codigos))]
+        ahora = timezone.now()
+        n, lote = options['vuelos'], options['lote']
+        inicio = time.perf_counter()
+        for base in range(0, n, lote):
+            filas = []
+            for i in range(base, min(base + lote, n)):
+                origen, destino = random.choices(codigos, pesos, k=2)
+                while destino == origen:
+                    destino = random.choices(codigos, pesos)[0]
+                salida = ahora + timedelta(minutes=random.randint(60, options['dias'] * 24 * 60))
+                duracion = timedelta(minutes=random.randint(45, 720))
+                filas.append(Vuelo(
+                    codigo_vuelo=f'C{i:09d}',
+                    aerolinea_id=random.choice(aerolinea_ids),
+                    origen_id=ids[origen],
+                    destino_id=ids[destino],
+                    fecha_salida=salida,
+                    fecha_llegada=salida + duracion,
+                    duracion=duracion,
+                    asientos_disponibles=random.randint(0, 200),
+                    precio_base=Decimal('100.00'),
+                ))
+            Vuelo.objects.bulk_create(filas, batch_size=lote)
+        self.stdout.write(f'{n} vuelos sembrados en {time.perf_counter() - inicio:.1f}s')
+
+        grafo.invalidar()
+        t0 = time.perf_counter()
+        grafo.buscar(ids[codigos[0]], ids[codigos[1]], ahora, ahora + timedelta(days=1))
+        self.stdout.write(f'Carga del grafo: {time.perf_counter() - t0:.2f}s')
+
+        consultas = []
+        for _ in range(options['repeticiones']):
+            origen, destino = random.sample(codigos, 2)
+            desde = ahora + timedelta(days=random.randint(1, options['dias'] - 2))
+            consultas.append((ids[origen], ids[destino], desde, desde + timedelta(days=1)))
+
+        for escalas in (1, 2):
+            tiempos = []
+            encontrados = 0
+            for args in consultas:
+                t0 = time.perf_counter()
+                encontrados += len(grafo.buscar(*args, escalas=escalas))
+                tiempos.append(time.perf_counter() - t0)
+            tiempos.sort()
+            self.stdout.write(
+                f'{escalas} escala(s): media={statistics.fmean(tiempos) * 1000:.2f}ms '
+                f'p50={tiempos[len(tiempos) // 2] * 1000:.2f}ms '
+                f'p99={tiempos[int(len(tiempos) * 0.99) - 1] * 1000:.2f}ms '
+                f'itinerarios/consulta={encontrados / len(consultas):.1f}'
+            )
+
+        # Cambios de horario sobre vuelos ya cargados (sin pasar por la BD)
+        vuelos = list(Vuelo.objects.filter(codigo_vuelo__startswith='C').order_by('?')[:1000])
+        t0 = time.perf_counter()
+        for vuelo in vuelos:
+            vuelo.fecha_salida += timedelta(minutes=15)
+            vuelo.fecha_llegada += timedelta(minutes=15)
+            grafo.actualizar_vuelo(vuelo)
+        self.stdout.write(
+            f'Actualización incremental: {(time.perf_counter() - t0) / len(vuelos) * 1e6:.0f}µs por vuelo'
+        )
+
+    @staticmethod
+    def _codigo(i):
+        # Códigos de tres letras que empiezan por Q, poco usados en la realidad
+        return f'Q{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}'
@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import resolve
+
+from compartido import metricas
+from gestion_vuelos.models import Vuelo
+
+MIDDLEWARE_METRICAS = 'compartido.metricas.MetricasMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el coste por petición de MetricasMiddleware: aislado (alrededor de una '
+        'vista vacía) y de extremo a extremo, comparando la misma petición con y sin '
+        'el middleware sobre la BD actual.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=2000)
+        parser.add_argument('--rondas', type=int, default=5)
+        parser.add_argument('--aislado', type=int, default=200_000, help='Iteraciones de la medida aislada')
+
+    def handle(self, *args, **options):
+        self._aislado(options['aislado'])
+        ids = ','.join(str(i) for i in Vuelo.objects.values_list('id', flat=True)[:20]) or '1'
+        for url in ('/api/aeropuertos/', f'/api/vuelos/lote/?ids={ids}'):
+            self._extremo_a_extremo(url, options['peticiones'], options['rondas'])
+
+    def _aislado(self, n):
+        request = RequestFactory().get('/api/aeropuertos/')
+        request.resolver_match = resolve('/api/aeropuertos/')
+        respuesta = HttpResponse()
+
+        def vista(request):
+            return respuesta
+
+        middleware = metricas.MetricasMiddleware(vista)
+
+        t0 = time.perf_counter()
+        for _ in range(n):
+            vista(request)
+        base = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for _ in range(n):
+            middleware(request)
+        con = time.perf_counter() - t0
+        self.stdout.write(f'Aislado: {(con - base) / n * 1e6:.2f} µs por petición ({n} iteraciones)')
+
+    def _extremo_a_extremo(self, url, peticiones, rondas):
+        sin = [m for m in settings.MIDDLEWARE if m != MIDDLEWARE_METRICAS]
+        con = [MIDDLEWARE_METRICAS] + sin
+        tiempos = {'sin': [], 'con': []}
+        # Rondas alternas para que el ruido de la máquina afecte igual a ambas variantes
+        for _ in range(rondas):
+            for nombre, middleware in (('sin', sin), ('con', con)):
+                with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['*']):
+                    client = Client()
+                    client.get(url)
+                    for _ in range(peticiones // rondas):
+                        t0 = time.perf_counter()
+                        client.get(url)
+                        tiempos[nombre].append(time.perf_counter() - t0)
+
+        self.stdout.write(f'\n== GET {url}')
+        for nombre, valores in tiempos.items():
+            valores.sort()
+            self.stdout.write(
+                f'{nombre} métricas: media={statistics.fmean(valores) * 1e6:.0f}µs '
+                f'p50={valores[len(valores) // 2] * 1e6:.0f}µs '
+                f'p99={valores[int(len(valores) * 0.99) - 1] * 1e6:.0f}µs'
+            )
+        diferencia = statistics.median(tiempos['con']) - statistics.median(tiempos['sin'])
+        self.stdout.write(
+            f'Sobrecoste (p50): {diferencia * 1e6:.1f}µs '
+            f'({diferencia / statistics.median(tiempos["sin"]) * 100:.1f}%)'
+        )
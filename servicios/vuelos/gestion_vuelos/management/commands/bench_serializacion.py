@@ -0,0 +1,97 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from gestion_vuelos import representacion
+from gestion_vuelos.models import Aerolinea, Aeropuerto, Vuelo
+from gestion_vuelos.serializers import VueloSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara VueloSerializer + JSONRenderer con la representación rápida '
+        '(values_list + orjson) sobre un resultado de N vuelos: coste por fila de la '
+        'consulta, la serialización y la codificación, y comprueba que los bytes '
+        'coinciden. Todo se hace en una transacción que se revierte al final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vuelos', type=int, default=10_000)
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._ejecutar(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Datos de prueba revertidos')
+
+    def _ejecutar(self, options):
+        aeropuertos = [
+            Aeropuerto.objects.create(codigo=f'X{i:02d}', nombre=f'Aeropuerto {i}', ciudad='Ciudad', pais='País')
+            for i in range(20)
+        ]
+        aerolinea = Aerolinea.objects.create(codigo='XX', nombre='Bench')
+        ahora = timezone.now()
+        n = options['vuelos']
+        filas = []
+        for i in range(n):
+            origen, destino = random.sample(aeropuertos, 2)
+            salida = ahora + timedelta(minutes=random.randint(60, 30 * 24 * 60))
+            filas.append(Vuelo(
+                codigo_vuelo=f'X{i:08d}', aerolinea=aerolinea, origen=origen, destino=destino,
+                fecha_salida=salida, fecha_llegada=salida + timedelta(hours=2), duracion=timedelta(hours=2),
+                asientos_disponibles=random.randint(1, 200),
+                precio_base=Decimal(random.randint(5000, 90000)) / 100,
+            ))
+        Vuelo.objects.bulk_create(filas, batch_size=5000)
+        queryset = Vuelo.objects.filter(codigo_vuelo__startswith='X').order_by('fecha_salida', 'id')
+
+        def drf():
+            t0 = time.perf_counter()
+            vuelos = list(queryset.select_related('origen', 'destino', 'aerolinea'))
+            t1 = time.perf_counter()
+            datos = VueloSerializer(vuelos, many=True).data
+            t2 = time.perf_counter()
+            contenido = JSONRenderer().render(datos)
+            return contenido, (t1 - t0, t2 - t1, time.perf_counter() - t2)
+
+        def rapido():
+            t0 = time.perf_counter()
+            filas = list(representacion.filas(queryset))
+            t1 = time.perf_counter()
+            datos = representacion.vuelos(filas)
+            t2 = time.perf_counter()
+            contenido = representacion.JSONRapidoRenderer().render(datos)
+            return contenido, (t1 - t0, t2 - t1, time.perf_counter() - t2)
+
+        resultados = {}
+        for nombre, funcion in (('VueloSerializer', drf), ('representacion', rapido)):
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                contenido, etapas = funcion()
+                tiempos.append(etapas)
+            resultados[nombre] = contenido
+            consulta, serializacion, codificacion = (statistics.median(etapa) for etapa in zip(*tiempos))
+            total = consulta + serializacion + codificacion
+            self.stdout.write(
+                f'{nombre:<16} total={total * 1000:7.1f}ms  por fila: '
+                f'consulta={consulta / n * 1e6:5.1f}µs serialización={serializacion / n * 1e6:5.1f}µs '
+                f'codificación={codificacion / n * 1e6:5.1f}µs total={total / n * 1e6:5.1f}µs'
+            )
+
+        if resultados['VueloSerializer'] != resultados['representacion']:
+            raise CommandError('La salida de las dos representaciones no coincide')
+        self.stdout.write(f"Salidas idénticas ({len(resultados['representacion'])} bytes)")
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from gestion_vuelos.models import Aeropuerto, Aerolinea, Vuelo
-from datetime import datetime, timedelta
+from datetime import timedelta
 import random
 import decimal
 
@@ -49,7 +50,7 @@ class Command(BaseCommand):
         ar = Aerolinea.objects.get(codigo='AR')
         la = Aerolinea.objects.get(codigo='LA')
         
-        hoy = datetime.now()
+        hoy = timezone.now()
         
         # ----------------------------------------------
         # Vuelos MAD-BCN (varios vuelos nacionales)
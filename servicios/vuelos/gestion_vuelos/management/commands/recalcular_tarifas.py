@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from gestion_vuelos.models import TarifaDiaria, Vuelo
+from gestion_vuelos.tarifas import agregados
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye desde cero el calendario de tarifas (TarifaDiaria) a partir de los '
+        'vuelos. Solo hace falta tras cargas masivas con bulk_create() o update(), que no '
+        'actualizan el calendario.'
+    )
+
+    def handle(self, *args, **options):
+        dias = (
+            Vuelo.objects
+            .annotate(fecha=TruncDate('fecha_salida', tzinfo=timezone.get_current_timezone()))
+            .values('origen_id', 'destino_id', 'fecha')
+            .annotate(**agregados())
+            .order_by()
+        )
+        with transaction.atomic():
+            TarifaDiaria.objects.all().delete()
+            filas = TarifaDiaria.objects.bulk_create((TarifaDiaria(**dia) for dia in dias.iterator()), batch_size=5000)
+        self.stdout.write(f'{len(filas)} días de tarifas recalculados')
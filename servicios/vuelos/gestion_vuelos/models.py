@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Now
 
 class Aeropuerto(models.Model):
     codigo = models.CharField(max_length=3, unique=True)
@@ -27,6 +28,9 @@ class Vuelo(models.Model):
     duracion = models.DurationField()
     asientos_disponibles = models.IntegerField(validators=[MinValueValidator(0)])
     precio_base = models.DecimalField(max_digits=10, decimal_places=2)
+    # Versión del vuelo para ETag/Last-Modified. Se renueva en cada save(); los
+    # update() que cambian el vuelo (inventario) lo tienen que poner a mano
+    actualizado = models.DateTimeField(auto_now=True, db_default=Now())
     
     class Meta:
         indexes = [
@@ -34,4 +38,28 @@ class Vuelo(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.codigo_vuelo} - {self.origen} a {self.destino}"
\ No newline at end of file
+        return f"{self.codigo_vuelo} - {self.origen} a {self.destino}"
+
+
+class TarifaDiaria(models.Model):
+    """
+    Resumen por ruta y día de salida (zona horaria configurada) de los vuelos
+    de ``Vuelo``, para el calendario de tarifas. Se mantiene desde ``tarifas``.
+    """
+    origen = models.ForeignKey(Aeropuerto, related_name='+', on_delete=models.CASCADE)
+    destino = models.ForeignKey(Aeropuerto, related_name='+', on_delete=models.CASCADE)
+    fecha = models.DateField()
+    # Precio más bajo entre los vuelos con asientos libres (nulo si no queda ninguno)
+    precio_minimo = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    # Suma de los asientos disponibles de los vuelos del día
+    asientos = models.IntegerField()
+    vuelos = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            # También es el índice del que se lee un calendario completo
+            models.UniqueConstraint(fields=['origen', 'destino', 'fecha'], name='tarifa_diaria_ruta_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.origen_id}-{self.destino_id} {self.fecha}: {self.precio_minimo}"
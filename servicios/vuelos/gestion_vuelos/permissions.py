@@ -0,0 +1,12 @@
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class EsServicioInterno(BasePermission):
+    """Solo otros servicios (con el token compartido) pueden llamar a la vista."""
+
+    def has_permission(self, request, view):
+        token = request.headers.get('X-Servicio-Token', '')
+        return hmac.compare_digest(token, settings.TOKEN_SERVICIOS_INTERNOS)
@@ -0,0 +1,93 @@
+"""
+Registro en memoria de los aeropuertos.
+
+Los aeropuertos casi nunca cambian, así que cada proceso mantiene una copia
+completa de la tabla: validar un código o listar aeropuertos no cuesta ninguna
+consulta. La copia se carga al arrancar el servidor (``precargar()``, desde
+``vuelos.wsgi`` y ``vuelos.asgi``), se descarta cuando se guarda o borra un
+``Aeropuerto`` (ver ``signals``) y se recarga igualmente cada
+``AEROPUERTOS_REFRESCO_SEGUNDOS`` para recoger cambios hechos desde otros
+procesos; si se descarta, la recarga la paga la siguiente petición que la use.
+
+No se precarga en ``AppConfig.ready()``: ``ready()`` se ejecuta también en
+``migrate`` o en los tests, a veces sobre una BD que aún no tiene la tabla.
+
+``version()`` identifica el contenido de la tabla (un hash de todas las filas):
+es la misma en todos los procesos que tengan la misma copia, y sirve como ETag
+del listado de aeropuertos.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .models import Aeropuerto
+
+CAMPOS = ('codigo', 'nombre', 'ciudad', 'pais')
+
+logger = logging.getLogger(__name__)
+
+
+def _clave(codigo):
+    # Igual que la caché de búsquedas (cache.normalizar): 'mad ' es MAD
+    return codigo.strip().upper()
+
+
+class _Instantanea:
+    def __init__(self, filas):
+        self.ids = {_clave(fila['codigo']): fila['id'] for fila in filas}
+        self.filas = [{campo: fila[campo] for campo in CAMPOS} for fila in filas]
+        self.version = hashlib.sha1(json.dumps(filas, sort_keys=True).encode()).hexdigest()
+        self.cargada = time.monotonic()
+
+
+class RegistroAeropuertos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._instantanea = None
+
+    def _actual(self):
+        instantanea = self._instantanea
+        refresco = getattr(settings, 'AEROPUERTOS_REFRESCO_SEGUNDOS', 300)
+        if instantanea is None or time.monotonic() - instantanea.cargada > refresco:
+            with self._lock:
+                instantanea = self._instantanea
+                if instantanea is None or time.monotonic() - instantanea.cargada > refresco:
+                    filas = list(Aeropuerto.objects.order_by('id').values('id', *CAMPOS))
+                    instantanea = self._instantanea = _Instantanea(filas)
+        return instantanea
+
+    def existe(self, codigo):
+        return _clave(codigo) in self._actual().ids
+
+    def id(self, codigo):
+        return self._actual().ids.get(_clave(codigo))
+
+    def lista(self):
+        """Filas con la misma forma que ``AeropuertoSerializer``."""
+        return self._actual().filas
+
+    def version(self):
+        return self._actual().version
+
+    def invalidar(self):
+        self._instantanea = None
+
+    def precargar(self):
+        """Carga la copia antes de la primera petición. Solo al arrancar el servidor."""
+        try:
+            self._actual()
+        except DatabaseError:
+            # BD sin migrar: se cargará con la primera petición
+            logger.warning('No se pudo precargar el registro de aeropuertos', exc_info=True)
+        finally:
+            # La conexión se abrió fuera de una petición: se cierra para que un
+            # fork posterior (p. ej. gunicorn --preload) no la comparta entre workers
+            connection.close()
+
+
+registro = RegistroAeropuertos()
@@ -0,0 +1,117 @@
+"""
+Representación JSON de vuelos sin pasar por los serializers de DRF.
+
+``VueloSerializer`` anida un serializer de aerolínea y dos de aeropuerto: por
+cada vuelo se construye una instancia del modelo (y tres más por el
+``select_related``) y se recorren una veintena de campos de serializer. En listados
+grandes eso es la mayor parte del tiempo de la respuesta.
+
+Aquí las filas salen de ``values_list()`` (tuplas, sin instancias) y cada una
+se convierte en el mismo diccionario que ``VueloSerializer(...).data``, con
+los mismos formatos de DRF para fechas, duraciones y decimales. Las filas
+tienen nombre (``named=True``) para que ``KeysetPagination`` (ver
+``compartido.paginacion``) pueda leer de ellas los valores del cursor.
+``JSONRapidoRenderer`` codifica con orjson.
+
+La salida es idéntica byte a byte a la de ``VueloSerializer`` más
+``JSONRenderer`` (ver tests); si cambia el serializer hay que cambiar también
+``vuelo()``.
+"""
+import decimal
+
+from django.utils import timezone
+from django.utils.duration import duration_string
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - sin orjson se usa el renderer de DRF
+    orjson = None
+
+COLUMNAS = (
+    'id', 'codigo_vuelo',
+    'aerolinea__codigo', 'aerolinea__nombre',
+    'origen__codigo', 'origen__nombre', 'origen__ciudad', 'origen__pais',
+    'destino__codigo', 'destino__nombre', 'destino__ciudad', 'destino__pais',
+    'fecha_salida', 'fecha_llegada', 'duracion', 'asientos_disponibles', 'precio_base',
+)
+
+# Mismo redondeo que serializers.DecimalField(max_digits=10, decimal_places=2)
+_CENTIMOS = decimal.Decimal('.1') ** 2
+_CONTEXTO = decimal.Context(prec=10, rounding=decimal.ROUND_HALF_EVEN)
+_N = len(COLUMNAS)
+
+
+def filas(queryset, *extra):
+    """
+    Las columnas de ``vuelo()`` para un queryset de ``Vuelo``, sin instancias
+    del modelo. Las columnas ``extra`` van al final y no salen en el JSON.
+    """
+    return queryset.values_list(*COLUMNAS, *extra, named=True)
+
+
+def _fecha(valor, zona):
+    # serializers.DateTimeField: zona horaria actual e ISO 8601 con 'Z' para UTC
+    if not valor:
+        return None
+    texto = valor.astimezone(zona).isoformat()
+    return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+
+
+def _precio(valor):
+    return f'{valor.quantize(_CENTIMOS, context=_CONTEXTO):f}'
+
+
+def vuelo(fila, zona=None):
+    """El diccionario de ``VueloSerializer`` para una fila de ``filas()``."""
+    # Leer la zona horaria actual cuesta más que formatear la fecha: en
+    # listados se lee una vez para todas las filas (ver vuelos())
+    zona = zona or timezone.get_current_timezone()
+    if len(fila) > _N:
+        fila = fila[:_N]
+    (
+        id_, codigo_vuelo,
+        aerolinea_codigo, aerolinea_nombre,
+        origen_codigo, origen_nombre, origen_ciudad, origen_pais,
+        destino_codigo, destino_nombre, destino_ciudad, destino_pais,
+        fecha_salida, fecha_llegada, duracion, asientos_disponibles, precio_base,
+    ) = fila
+    return {
+        'id': id_,
+        'codigo_vuelo': codigo_vuelo,
+        'aerolinea': {'codigo': aerolinea_codigo, 'nombre': aerolinea_nombre},
+        'origen': {'codigo': origen_codigo, 'nombre': origen_nombre, 'ciudad': origen_ciudad, 'pais': origen_pais},
+        'destino': {
+            'codigo': destino_codigo, 'nombre': destino_nombre, 'ciudad': destino_ciudad, 'pais': destino_pais,
+        },
+        'fecha_salida': _fecha(fecha_salida, zona),
+        'fecha_llegada': _fecha(fecha_llegada, zona),
+        'duracion': duration_string(duracion),
+        'asientos_disponibles': asientos_disponibles,
+        'precio_base': _precio(precio_base),
+    }
+
+
+def vuelos(filas_):
+    zona = timezone.get_current_timezone()
+    return [vuelo(fila, zona) for fila in filas_]
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` con orjson. Mismos bytes que el original para los datos de
+    estas vistas (compacto, UTF-8 sin escapar, U+2028/U+2029 escapados); con
+    sangría, sin orjson o con tipos que orjson no admite se usa el original.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -20,4 +20,11 @@ class VueloSerializer(serializers.ModelSerializer):
         model = Vuelo
         fields = ['id', 'codigo_vuelo', 'aerolinea', 'origen', 'destino', 
                  'fecha_salida', 'fecha_llegada', 'duracion', 
-                 'asientos_disponibles', 'precio_base']
\ No newline at end of file
+                 'asientos_disponibles', 'precio_base']
+
+# Máximo de asientos de una reserva (ReservaSerializer.validate_asientos en
+# reservas): ni una retención ni una liberación pueden mover más que eso
+MAX_ASIENTOS_RESERVA = 10
+
+class AsientosSerializer(serializers.Serializer):
+    asientos = serializers.IntegerField(min_value=1, max_value=MAX_ASIENTOS_RESERVA)
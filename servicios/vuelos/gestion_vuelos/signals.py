@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, tarifas
+from .conexiones import grafo
+from .models import Aeropuerto, Vuelo
+from .registro import registro
+
+
+def _ruta(vuelo):
+    return (vuelo.origen.codigo, vuelo.destino.codigo, vuelo.fecha_salida)
+
+
+@receiver(pre_save, sender=Vuelo)
+def recordar_ruta_anterior(sender, instance, **kwargs):
+    # Si el vuelo cambia de ruta o de fecha también hay que invalidar la anterior
+    instance._ruta_anterior = None
+    if instance.pk:
+        instance._ruta_anterior = (
+            Vuelo.objects.filter(pk=instance.pk)
+            .values_list('origen__codigo', 'destino__codigo', 'fecha_salida')
+            .first()
+        )
+
+
+def _invalidar_busquedas(*rutas):
+    # Tras el commit: una búsqueda simultánea que lea las filas antiguas las
+    # guarda bajo la generación anterior, que ya no se usa
+    for ruta in rutas:
+        transaction.on_commit(lambda ruta=ruta: cache.invalidar(*ruta))
+
+
+@receiver(post_save, sender=Vuelo)
+def invalidar_busquedas_al_guardar(sender, instance, **kwargs):
+    rutas = [_ruta(instance)]
+    anterior = getattr(instance, '_ruta_anterior', None)
+    if anterior and anterior != rutas[0]:
+        rutas.append(anterior)
+    # El calendario de tarifas se recalcula en la misma transacción que el vuelo
+    for ruta in rutas:
+        tarifas.recalcular(*ruta)
+    _invalidar_busquedas(*rutas)
+    transaction.on_commit(lambda: grafo.actualizar_vuelo(instance))
+
+
+@receiver(post_delete, sender=Vuelo)
+def invalidar_busquedas_al_borrar(sender, instance, **kwargs):
+    ruta = _ruta(instance)
+    tarifas.recalcular(*ruta)
+    _invalidar_busquedas(ruta)
+    vuelo_id = instance.pk
+    transaction.on_commit(lambda: grafo.quitar_vuelo(vuelo_id))
+
+
+@receiver(post_save, sender=Aeropuerto)
+@receiver(post_delete, sender=Aeropuerto)
+def refrescar_registro_aeropuertos(sender, **kwargs):
+    # Tras el commit, para que la recarga vea el cambio. Los resultados de
+    # búsqueda guardados llevan el nombre y la ciudad: se invalidan todos
+    transaction.on_commit(registro.invalidar)
+    transaction.on_commit(cache.invalidar_todo)
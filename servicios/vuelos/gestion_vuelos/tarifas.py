@@ -0,0 +1,87 @@
+"""
+Calendario de tarifas: precio mínimo y asientos libres por ruta y día.
+
+``TarifaDiaria`` guarda una fila por ruta y día de salida con vuelos, de forma
+que un calendario entero es un único rango sobre su índice único
+``(origen, destino, fecha)``. La fila de un día se recalcula entera a partir de
+los vuelos de ese día (una consulta agregada sobre el índice de ``Vuelo``)
+cada vez que uno de ellos se guarda o se borra (``signals``), en la misma
+transacción que el cambio. El recálculo bloquea primero la fila del día: dos
+cambios simultáneos sobre vuelos distintos de la misma ruta y día se
+recalculan uno detrás de otro, y el segundo ya ve el primero.
+
+Retener y liberar asientos (``inventario``) es mucho más frecuente y no abre
+transacciones: un único ``UPDATE`` suma la diferencia a ``asientos`` (exacto
+aunque haya retenciones simultáneas) y vuelve a leer el precio mínimo en una
+subconsulta, por si el vuelo se ha agotado o vuelve a tener plazas.
+
+Lo que se haga con ``update()`` o ``bulk_create()`` no pasa por aquí; para
+eso está ``recalcular_tarifas``.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .fechas import inicio_dia
+from .models import Aeropuerto, TarifaDiaria, Vuelo
+from .registro import registro
+
+
+def _id_aeropuerto(codigo):
+    # El registro puede no conocer aún un aeropuerto creado en esta misma transacción
+    return registro.id(codigo) or Aeropuerto.objects.filter(codigo=codigo).values_list('id', flat=True).first()
+
+
+def agregados():
+    """Expresiones de los campos de ``TarifaDiaria`` sobre un conjunto de vuelos."""
+    return {
+        'vuelos': Count('id'),
+        'asientos': Coalesce(Sum('asientos_disponibles'), 0),
+        'precio_minimo': Min('precio_base', filter=Q(asientos_disponibles__gt=0)),
+    }
+
+
+def _vuelos_del_dia(origen_id, destino_id, dia):
+    return Vuelo.objects.filter(
+        origen_id=origen_id, destino_id=destino_id,
+        fecha_salida__gte=inicio_dia(dia), fecha_salida__lt=inicio_dia(dia + timedelta(days=1)),
+    )
+
+
+def recalcular(origen, destino, fecha_salida):
+    """Recalcula la fila de la ruta (códigos de aeropuerto) para el día de ``fecha_salida``."""
+    origen_id, destino_id = _id_aeropuerto(origen), _id_aeropuerto(destino)
+    if origen_id is None or destino_id is None:
+        return
+    dia = timezone.localdate(fecha_salida)
+    with transaction.atomic():
+        fila = TarifaDiaria.objects.filter(origen_id=origen_id, destino_id=destino_id, fecha=dia)
+        list(fila.select_for_update())
+        datos = _vuelos_del_dia(origen_id, destino_id, dia).aggregate(**agregados())
+        if datos['vuelos']:
+            TarifaDiaria.objects.update_or_create(
+                origen_id=origen_id, destino_id=destino_id, fecha=dia, defaults=datos,
+            )
+        else:
+            fila.delete()
+
+
+def ajustar_asientos(origen, destino, fecha_salida, diferencia):
+    """Suma ``diferencia`` a los asientos del día tras retener o liberar asientos de un vuelo."""
+    origen_id, destino_id = _id_aeropuerto(origen), _id_aeropuerto(destino)
+    dia = timezone.localdate(fecha_salida)
+    precio_minimo = (
+        _vuelos_del_dia(origen_id, destino_id, dia)
+        .filter(asientos_disponibles__gt=0)
+        .order_by('precio_base')
+        .values('precio_base')[:1]
+    )
+    actualizadas = TarifaDiaria.objects.filter(origen_id=origen_id, destino_id=destino_id, fecha=dia).update(
+        asientos=F('asientos') + diferencia, precio_minimo=Subquery(precio_minimo),
+    )
+    if not actualizadas:
+        # Día cargado sin pasar por las señales: se crea la fila completa
+        recalcular(origen, destino, fecha_salida)
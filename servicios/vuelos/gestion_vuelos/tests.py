@@ -1,3 +1,739 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from urllib.parse import unquote
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import cache
+from .conexiones import grafo
+from .fechas import MAX_FLEXIBILIDAD, inicio_dia, rango_busqueda
+from .inventario import liberar_asientos, retener_asientos
+from .models import Aerolinea, Aeropuerto, TarifaDiaria, Vuelo
+from .registro import registro
+from .representacion import JSONRapidoRenderer, filas, vuelos
+from .serializers import VueloSerializer
+from .views import VuelosLoteView
+
+
+class RetencionAsientosConcurrenteTest(TransactionTestCase):
+    """Muchas retenciones simultáneas sobre el mismo vuelo nunca lo sobrevenden."""
+
+    ASIENTOS = 60
+    HILOS = 16
+    INTENTOS_POR_HILO = 20
+
+    def setUp(self):
+        origen = Aeropuerto.objects.create(codigo='MAD', nombre='Barajas', ciudad='Madrid', pais='España')
+        destino = Aeropuerto.objects.create(codigo='BCN', nombre='El Prat', ciudad='Barcelona', pais='España')
+        aerolinea = Aerolinea.objects.create(codigo='IB', nombre='Iberia')
+        salida = timezone.now() + timedelta(days=3)
+        self.vuelo = Vuelo.objects.create(
+            codigo_vuelo='IB1000', aerolinea=aerolinea, origen=origen, destino=destino,
+            fecha_salida=salida, fecha_llegada=salida + timedelta(hours=1),
+            duracion=timedelta(hours=1), asientos_disponibles=self.ASIENTOS,
+            precio_base='100.00',
+        )
+        self.url = f'/api/vuelos/{self.vuelo.id}/asientos/retener/'
+
+    def _retener(self, resultados, asientos):
+        client = Client(HTTP_X_SERVICIO_TOKEN=settings.TOKEN_SERVICIOS_INTERNOS)
+        try:
+            for _ in range(self.INTENTOS_POR_HILO):
+                try:
+                    response = client.post(self.url, {'asientos': asientos}, content_type='application/json')
+                except OperationalError:
+                    # La BD de tests de SQLite (en memoria, caché compartida) puede
+                    # rechazar escrituras concurrentes ("table is locked") sin que
+                    # quede claro si el UPDATE llegó a aplicarse: resultado incierto
+                    resultados.append((None, asientos))
+                    continue
+                resultados.append((response.status_code, asientos))
+        finally:
+            connection.close()
+
+    def test_retenciones_concurrentes_no_sobrevenden(self):
+        resultados = []
+        hilos = [
+            threading.Thread(target=self._retener, args=(resultados, 1 + i % 3))
+            for i in range(self.HILOS)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        vendidos = sum(asientos for codigo, asientos in resultados if codigo == 200)
+        inciertos = sum(asientos for codigo, asientos in resultados if codigo is None)
+        self.vuelo.refresh_from_db()
+
+        self.assertTrue(all(codigo in (200, 409, None) for codigo, _ in resultados))
+        self.assertGreaterEqual(self.vuelo.asientos_disponibles, 0)
+        # Cada retención confirmada descontó sus asientos, y nada más que eso
+        # (salvo las inciertas) se descontó del vuelo
+        self.assertLessEqual(self.vuelo.asientos_disponibles, self.ASIENTOS - vendidos)
+        self.assertGreaterEqual(self.vuelo.asientos_disponibles, self.ASIENTOS - vendidos - inciertos)
+        # Hay mucha más demanda que asientos: las retenciones rechazadas son por falta de plazas
+        self.assertIn(409, [codigo for codigo, _ in resultados])
+
+    def test_retencion_requiere_token_interno(self):
+        response = Client().post(self.url, {'asientos': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_liberar_devuelve_asientos(self):
+        client = Client(HTTP_X_SERVICIO_TOKEN=settings.TOKEN_SERVICIOS_INTERNOS)
+        client.post(self.url, {'asientos': 5}, content_type='application/json')
+        client.post(f'/api/vuelos/{self.vuelo.id}/asientos/liberar/', {'asientos': 2}, content_type='application/json')
+        self.vuelo.refresh_from_db()
+        self.assertEqual(self.vuelo.asientos_disponibles, self.ASIENTOS - 3)
+
+    def test_liberar_no_supera_el_maximo_de_una_reserva(self):
+        client = Client(HTTP_X_SERVICIO_TOKEN=settings.TOKEN_SERVICIOS_INTERNOS)
+        response = client.post(
+            f'/api/vuelos/{self.vuelo.id}/asientos/liberar/', {'asientos': 11}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.vuelo.refresh_from_db()
+        self.assertEqual(self.vuelo.asientos_disponibles, self.ASIENTOS)
+
+
+class BusquedaCacheTest(TestCase):
+    def setUp(self):
+        registro.invalidar()
+        self.addCleanup(registro.invalidar)
+        caches[cache.CACHE_ALIAS].clear()
+        self.addCleanup(caches[cache.CACHE_ALIAS].clear)
+        self.madrid = Aeropuerto.objects.create(codigo='MAD', nombre='Barajas', ciudad='Madrid', pais='España')
+        self.barcelona = Aeropuerto.objects.create(codigo='BCN', nombre='El Prat', ciudad='Barcelona', pais='España')
+        self.sevilla = Aeropuerto.objects.create(codigo='SVQ', nombre='San Pablo', ciudad='Sevilla', pais='España')
+        aerolinea = Aerolinea.objects.create(codigo='IB', nombre='Iberia')
+        salida = timezone.now() + timedelta(days=3)
+        self.fecha = timezone.localdate(salida).isoformat()
+        self.vuelo = Vuelo.objects.create(
+            codigo_vuelo='IB0300', aerolinea=aerolinea, origen=self.madrid, destino=self.barcelona,
+            fecha_salida=salida, fecha_llegada=salida + timedelta(hours=1),
+            duracion=timedelta(hours=1), asientos_disponibles=100, precio_base='100.00',
+        )
+        self.params = {'origen': 'MAD', 'destino': 'BCN', 'fecha': self.fecha}
+
+    def buscar(self, params=None):
+        response = Client().get('/api/vuelos/', params or self.params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def contadores(self):
+        snapshot = cache.estadisticas.snapshot()
+        return snapshot['hits'], snapshot['misses']
+
+    def test_acierto_y_fallo(self):
+        hits, misses = self.contadores()
+        self.assertEqual(len(self.buscar()), 1)
+        self.assertEqual(self.contadores(), (hits, misses + 1))
+
+        # Mismos parámetros en otro orden, con espacios y en minúsculas: misma entrada
+        with self.assertNumQueries(0):
+            resultados = self.buscar({'fecha': f' {self.fecha}', 'destino': 'bcn', 'origen': 'mad '})
+        self.assertEqual(resultados[0]['codigo_vuelo'], 'IB0300')
+        self.assertEqual(self.contadores(), (hits + 1, misses + 1))
+
+        # Otra búsqueda es otra entrada
+        self.buscar({'origen': 'MAD', 'destino': 'BCN'})
+        self.assertEqual(self.contadores(), (hits + 1, misses + 2))
+
+    def test_guardar_invalida(self):
+        self.buscar()
+        self.buscar({'origen': 'MAD'})
+        self.vuelo.precio_base = '80.00'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vuelo.save()
+            # Antes del commit se sigue sirviendo la entrada anterior
+            self.assertEqual(self.buscar()[0]['precio_base'], '100.00')
+        self.assertEqual(self.buscar()[0]['precio_base'], '80.00')
+        self.assertEqual(self.buscar({'origen': 'MAD'})[0]['precio_base'], '80.00')
+
+    def test_cambio_de_ruta_invalida_la_anterior(self):
+        self.buscar()
+        self.vuelo.destino = self.sevilla
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vuelo.save()
+        self.assertEqual(self.buscar(), [])
+        self.assertEqual(len(self.buscar({**self.params, 'destino': 'SVQ'})), 1)
+
+    def test_borrar_invalida(self):
+        self.buscar()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vuelo.delete()
+        self.assertEqual(self.buscar(), [])
+
+    def test_cambio_de_asientos_invalida(self):
+        self.buscar()
+        retener_asientos(self.vuelo.id, 30)
+        self.assertEqual(self.buscar()[0]['asientos_disponibles'], 70)
+        liberar_asientos(self.vuelo.id, 10)
+        self.assertEqual(self.buscar()[0]['asientos_disponibles'], 80)
+        # Un vuelo sin asientos libres deja de aparecer
+        retener_asientos(self.vuelo.id, 80)
+        self.assertEqual(self.buscar(), [])
+
+    def test_otra_ruta_sigue_en_cache(self):
+        otro = {'origen': 'MAD', 'destino': 'SVQ', 'fecha': self.fecha}
+        self.buscar(otro)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vuelo.save()
+        hits, misses = self.contadores()
+        self.buscar(otro)
+        self.assertEqual(self.contadores(), (hits + 1, misses))
+
+    def test_cambio_de_aeropuerto_invalida_todo(self):
+        self.buscar()
+        self.barcelona.nombre = 'Josep Tarradellas'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.barcelona.save()
+        self.assertEqual(self.buscar()[0]['destino']['nombre'], 'Josep Tarradellas')
+
+
+class RegistroAeropuertosTest(TestCase):
+    def setUp(self):
+        registro.invalidar()
+        self.addCleanup(registro.invalidar)
+        Aeropuerto.objects.create(codigo='MAD', nombre='Barajas', ciudad='Madrid', pais='España')
+        Aeropuerto.objects.create(codigo='BCN', nombre='El Prat', ciudad='Barcelona', pais='España')
+
+    def test_precargar(self):
+        # La conexión la cierra el arranque del servidor; aquí es la del test
+        with mock.patch('gestion_vuelos.registro.connection') as conexion:
+            registro.precargar()
+        conexion.close.assert_called_once_with()
+        with self.assertNumQueries(0):
+            self.assertTrue(registro.existe('MAD'))
+
+    def test_listado_y_validacion_sin_consultas(self):
+        barcelona = Aeropuerto.objects.get(codigo='BCN').id
+        registro.lista()
+        with self.assertNumQueries(0):
+            response = Client().get('/api/aeropuertos/')
+            self.assertEqual([a['codigo'] for a in response.data], ['MAD', 'BCN'])
+            response = Client().get('/api/aeropuertos/', {'search': 'barc'})
+            self.assertEqual([a['codigo'] for a in response.data], ['BCN'])
+            response = Client().get('/api/vuelos/', {'origen': 'XXX'})
+            self.assertEqual(response.status_code, 400)
+            response = Client().get('/api/vuelos/', {'origen': 'MAD', 'destino': 'ZZZ'})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(registro.id('bcn'), barcelona)
+
+    def test_cambios_se_aplican_tras_el_commit(self):
+        registro.lista()
+        with self.captureOnCommitCallbacks(execute=True):
+            Aeropuerto.objects.create(codigo='VLC', nombre='Manises', ciudad='Valencia', pais='España')
+            # Hasta el commit se sigue sirviendo la copia anterior
+            self.assertFalse(registro.existe('VLC'))
+        self.assertTrue(registro.existe('VLC'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Aeropuerto.objects.filter(codigo='MAD').delete()
+        self.assertFalse(registro.existe('MAD'))
+        self.assertEqual(Client().get('/api/vuelos/', {'origen': 'MAD'}).status_code, 400)
+
+
+class RangoFechasTest(SimpleTestCase):
+    def rango(self, **params):
+        return rango_busqueda(params)
+
+    def test_dia_semiabierto(self):
+        desde, hasta = self.rango(fecha='2030-05-10')
+        self.assertEqual(desde, datetime(2030, 5, 10, tzinfo=dt_timezone.utc))
+        self.assertEqual(hasta, datetime(2030, 5, 11, tzinfo=dt_timezone.utc))
+
+    def test_flexibilidad(self):
+        desde, hasta = self.rango(fecha='2030-05-10', flexibilidad='2')
+        self.assertEqual((desde.date(), hasta.date()), (date(2030, 5, 8), date(2030, 5, 13)))
+        # Por encima del máximo se recorta a ±MAX_FLEXIBILIDAD; negativa o inválida, 0
+        desde, hasta = self.rango(fecha='2030-05-10', flexibilidad='30')
+        self.assertEqual(hasta - desde, timedelta(days=2 * MAX_FLEXIBILIDAD + 1))
+        for valor in ('-3', 'dos', ''):
+            desde, hasta = self.rango(fecha='2030-05-10', flexibilidad=valor)
+            self.assertEqual(hasta - desde, timedelta(days=1))
+
+    def test_fecha_desde_y_fecha_hasta(self):
+        desde, hasta = self.rango(fecha_desde='2030-05-10', fecha_hasta='2030-05-12')
+        self.assertEqual((desde.date(), hasta.date()), (date(2030, 5, 10), date(2030, 5, 13)))
+        self.assertEqual(self.rango(fecha_desde='2030-05-10')[1], None)
+        self.assertEqual(self.rango(fecha_hasta='2030-05-12')[0], None)
+        # fecha tiene prioridad sobre el rango
+        desde, hasta = self.rango(fecha='2030-06-01', fecha_desde='2030-05-10', fecha_hasta='2030-05-12')
+        self.assertEqual(desde.date(), date(2030, 6, 1))
+
+    def test_fechas_invalidas_se_ignoran(self):
+        for valor in ('2030-02-30', '10/05/2030', '2030-5-10x', ''):
+            self.assertEqual(self.rango(fecha=valor), (None, None))
+            self.assertEqual(self.rango(fecha_desde=valor, fecha_hasta=valor), (None, None))
+        desde, hasta = self.rango(fecha_desde='2030-05-10', fecha_hasta='mañana')
+        self.assertEqual((desde.date(), hasta), (date(2030, 5, 10), None))
+
+    @override_settings(TIME_ZONE='Europe/Madrid')
+    def test_cambios_de_hora(self):
+        # Último domingo de marzo: el día local dura 23 horas; el de octubre, 25
+        desde, hasta = self.rango(fecha='2030-03-31')
+        self.assertEqual(desde, datetime(2030, 3, 30, 23, tzinfo=dt_timezone.utc))
+        self.assertEqual(hasta, datetime(2030, 3, 31, 22, tzinfo=dt_timezone.utc))
+        desde, hasta = self.rango(fecha='2030-10-27')
+        # Misma tzinfo: la resta de datetimes sería de hora de pared, no de tiempo real
+        self.assertEqual(hasta.timestamp() - desde.timestamp(), 25 * 3600)
+        desde, hasta = self.rango(fecha_desde='2030-03-31', fecha_hasta='2030-10-27')
+        self.assertEqual(desde, datetime(2030, 3, 30, 23, tzinfo=dt_timezone.utc))
+        self.assertEqual(hasta, datetime(2030, 10, 27, 23, tzinfo=dt_timezone.utc))
+
+
+@override_settings(TIME_ZONE='Europe/Madrid')
+class BusquedaPorFechasTest(TestCase):
+    def setUp(self):
+        registro.invalidar()
+        self.addCleanup(registro.invalidar)
+        origen = Aeropuerto.objects.create(codigo='MAD', nombre='Barajas', ciudad='Madrid', pais='España')
+        destino = Aeropuerto.objects.create(codigo='BCN', nombre='El Prat', ciudad='Barcelona', pais='España')
+        aerolinea = Aerolinea.objects.create(codigo='IB', nombre='Iberia')
+        # 31 de marzo de 2030, el día del cambio a horario de verano
+        medianoche = inicio_dia(date(2030, 3, 31))
+        siguiente = inicio_dia(date(2030, 4, 1))
+        salidas = {
+            'ANTES': medianoche - timedelta(microseconds=1),
+            'INICIO': medianoche,
+            'FINAL': siguiente - timedelta(microseconds=1),
+            'DESPUES': siguiente,
+            'SEMANA': inicio_dia(date(2030, 4, 7)),
+            'FUERA': inicio_dia(date(2030, 4, 8)),
+        }
+        for codigo, salida in salidas.items():
+            Vuelo.objects.create(
+                codigo_vuelo=codigo, aerolinea=aerolinea, origen=origen, destino=destino,
+                fecha_salida=salida, fecha_llegada=salida + timedelta(hours=1),
+                duracion=timedelta(hours=1), asientos_disponibles=10, precio_base='100.00',
+            )
+
+    def codigos(self, **params):
+        response = Client().get('/api/vuelos/', {'origen': 'MAD', 'destino': 'BCN', **params})
+        self.assertEqual(response.status_code, 200)
+        return [vuelo['codigo_vuelo'] for vuelo in response.data['results']]
+
+    def test_dia_incluye_su_medianoche_y_no_la_siguiente(self):
+        self.assertEqual(self.codigos(fecha='2030-03-31'), ['INICIO', 'FINAL'])
+        self.assertEqual(self.codigos(fecha_desde='2030-03-31', fecha_hasta='2030-03-31'), ['INICIO', 'FINAL'])
+        self.assertEqual(self.codigos(fecha_hasta='2030-03-30'), ['ANTES'])
+
+    def test_flexibilidad_recortada(self):
+        self.assertEqual(
+            self.codigos(fecha='2030-03-31', flexibilidad='30'),
+            ['ANTES', 'INICIO', 'FINAL', 'DESPUES', 'SEMANA'],
+        )
+
+
+class VuelosLoteTest(TestCase):
+    def setUp(self):
+        origen = Aeropuerto.objects.create(codigo='MAD', nombre='Barajas', ciudad='Madrid', pais='España')
+        destino = Aeropuerto.objects.create(codigo='BCN', nombre='El Prat', ciudad='Barcelona', pais='España')
+        aerolinea = Aerolinea.objects.create(codigo='IB', nombre='Iberia')
+        salida = timezone.now() + timedelta(days=3)
+        self.vuelos = [
+            Vuelo.objects.create(
+                codigo_vuelo=f'IB{2000 + i}', aerolinea=aerolinea, origen=origen, destino=destino,
+                fecha_salida=salida, fecha_llegada=salida + timedelta(hours=1),
+                duracion=timedelta(hours=1), asientos_disponibles=100, precio_base='100.00',
+            )
+            for i in range(5)
+        ]
+
+    def test_varios_vuelos_en_una_consulta(self):
+        ids = [self.vuelos[3].id, self.vuelos[0].id, 999999, self.vuelos[3].id]
+        with self.assertNumQueries(1):
+            response = Client().get('/api/vuelos/lote/', {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([v['id'] for v in response.data], [self.vuelos[3].id, self.vuelos[0].id])
+        self.assertEqual(response.data[0]['origen']['codigo'], 'MAD')
+
+    def test_ids_invalidos(self):
+        for ids in ('1,dos', '1,0', '-3', '99999999999999999999999'):
+            self.assertEqual(Client().get('/api/vuelos/lote/', {'ids': ids}).status_code, 400, ids)
+        demasiados = ','.join(str(i) for i in range(VuelosLoteView.MAX_IDS + 1))
+        self.assertEqual(Client().get('/api/vuelos/lote/', {'ids': demasiados}).status_code, 400)
+
+    def test_metricas_por_endpoint(self):
+        ruta = 'ruta="api/vuelos/lote/"'
+        Client().get('/api/vuelos/lote/', {'ids': self.vuelos[0].id})
+        texto = Client().get('/metrics').content.decode()
+
+        self.assertIn('# TYPE http_peticion_segundos histogram', texto)
+        self.assertIn(f'http_peticion_segundos_count{{metodo="GET",{ruta},status="200"}}', texto)
+        self.assertRegex(texto, r'bd_consultas_por_peticion_bucket\{%s,le="1"\} [1-9]' % ruta)
+        self.assertIn(f'bd_consultas_total{{{ruta}}}', texto)
+
+
+@override_settings(CONEXIONES_MINIMO_MINUTOS=45, CONEXIONES_MINIMO_POR_AEROPUERTO={'MIA': 90},
+                   CONEXIONES_CAMBIO_AEROLINEA_MINUTOS=30)
+class ConexionesTest(TestCase):
+    def setUp(self):
+        grafo.invalidar()
+        self.addCleanup(grafo.invalidar)
+        self.aeropuertos = {
+            codigo: Aeropuerto.objects.create(codigo=codigo, nombre=codigo, ciudad=codigo, pais='-')
+            for codigo in ('MAD', 'LIS', 'MIA', 'BOG', 'LIM')
+        }
+        self.ib = Aerolinea.objects.create(codigo='IB', nombre='Iberia')
+        self.tp = Aerolinea.objects.create(codigo='TP', nombre='TAP')
+        self.manana = (timezone.now() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+
+    def _vuelo(self, codigo, origen, destino, salida_min, duracion_min, aerolinea=None, asientos=50):
+        salida = self.manana + timedelta(minutes=salida_min)
+        return Vuelo.objects.create(
+            codigo_vuelo=codigo, aerolinea=aerolinea or self.ib,
+            origen=self.aeropuertos[origen], destino=self.aeropuertos[destino],
+            fecha_salida=salida, fecha_llegada=salida + timedelta(minutes=duracion_min),
+            duracion=timedelta(minutes=duracion_min), asientos_disponibles=asientos, precio_base='100.00',
+        )
+
+    def _buscar(self, **params):
+        params = {'origen': 'MAD', 'destino': 'BOG', 'fecha': self.manana.date().isoformat(), **params}
+        response = Client().get('/api/vuelos/conexiones/', params)
+        self.assertEqual(response.status_code, 200)
+        return [[v['codigo_vuelo'] for v in it['vuelos']] for it in response.data['itinerarios']]
+
+    def test_tiempo_minimo_de_conexion(self):
+        self._vuelo('IB1', 'MAD', 'LIS', 0, 60)
+        self._vuelo('IB2', 'LIS', 'BOG', 60 + 30, 600)   # 30 minutos: no da tiempo
+        self._vuelo('IB3', 'LIS', 'BOG', 60 + 50, 600)   # 50 minutos: vale
+        self._vuelo('TP4', 'LIS', 'BOG', 60 + 60, 600, aerolinea=self.tp)  # cambio de aerolínea: 75 minutos
+        self._vuelo('TP5', 'LIS', 'BOG', 60 + 80, 600, aerolinea=self.tp)
+        self.assertEqual(self._buscar(), [['IB1', 'IB3'], ['IB1', 'TP5']])
+
+    def test_tiempo_minimo_por_aeropuerto_y_dos_escalas(self):
+        self._vuelo('IB1', 'MAD', 'LIS', 0, 60)
+        self._vuelo('IB2', 'LIS', 'MIA', 120, 480)
+        self._vuelo('IB3', 'MIA', 'BOG', 600 + 60, 180)   # 60 minutos en MIA (mínimo 90)
+        self._vuelo('IB4', 'MIA', 'BOG', 600 + 100, 180)
+        self._vuelo('IB5', 'MAD', 'BOG', 30, 660)
+
+        response = Client().get('/api/vuelos/conexiones/', {
+            'origen': 'MAD', 'destino': 'BOG', 'fecha': self.manana.date().isoformat(), 'pasajeros': 2,
+        })
+        itinerarios = response.data['itinerarios']
+        self.assertEqual([[v['codigo_vuelo'] for v in it['vuelos']] for it in itinerarios], [['IB5'], ['IB1', 'IB2', 'IB4']])
+        self.assertEqual(itinerarios[1]['escalas'], 2)
+        self.assertEqual(itinerarios[1]['precio_total'], '600.00')
+        self.assertEqual(itinerarios[1]['duracion_minutos'], 600 + 100 + 180)
+        self.assertEqual(self._buscar(escalas=1), [['IB5']])
+
+    def test_actualizacion_incremental(self):
+        self._vuelo('IB1', 'MAD', 'LIS', 0, 60)
+        self.assertEqual(self._buscar(), [])  # el grafo queda cargado
+
+        with self.captureOnCommitCallbacks(execute=True):
+            segundo = self._vuelo('IB2', 'LIS', 'BOG', 120, 600)
+        self.assertEqual(self._buscar(), [['IB1', 'IB2']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            segundo.fecha_salida = self.manana + timedelta(minutes=70)
+            segundo.save()
+        self.assertEqual(self._buscar(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            segundo.fecha_salida = self.manana + timedelta(minutes=120)
+            segundo.save()
+        self.assertEqual(self._buscar(), [['IB1', 'IB2']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            segundo.delete()
+        self.assertEqual(self._buscar(), [])
+
+    def test_asientos_retenidos(self):
+        primero = self._vuelo('IB1', 'MAD', 'LIS', 0, 60, asientos=3)
+        self._vuelo('IB2', 'LIS', 'BOG', 120, 600)
+        self.assertEqual(self._buscar(pasajeros=3), [['IB1', 'IB2']])
+
+        retener_asientos(primero.id, 2)
+        self.assertEqual(self._buscar(pasajeros=3), [])
+        self.assertEqual(self._buscar(pasajeros=1), [['IB1', 'IB2']])
+
+    def test_codigos_invalidos(self):
+        response = Client().get('/api/vuelos/conexiones/', {'origen': 'MAD', 'destino': 'XXX'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Client().get('/api/vuelos/conexiones/', {'origen': 'MAD'}).status_code, 400)
+
+
+class CalendarioTarifasTest(TestCase):
+    def setUp(self):
+        self.origen = Aeropuerto.objects.create(codigo='MAD', nombre='Barajas', ciudad='Madrid', pais='España')
+        self.destino = Aeropuerto.objects.create(codigo='BCN', nombre='El Prat', ciudad='Barcelona', pais='España')
+        self.aerolinea = Aerolinea.objects.create(codigo='IB', nombre='Iberia')
+        self.dia = timezone.localdate() + timedelta(days=5)
+        registro.invalidar()
+        self.addCleanup(registro.invalidar)
+
+    def _vuelo(self, codigo, dia, hora, precio, asientos=10):
+        salida = inicio_dia(dia) + timedelta(hours=hora)
+        return Vuelo.objects.create(
+            codigo_vuelo=codigo, aerolinea=self.aerolinea, origen=self.origen, destino=self.destino,
+            fecha_salida=salida, fecha_llegada=salida + timedelta(hours=1),
+            duracion=timedelta(hours=1), asientos_disponibles=asientos, precio_base=precio,
+        )
+
+    def _calendario(self, **params):
+        response = Client().get('/api/vuelos/calendario/', {'origen': 'MAD', 'destino': 'BCN', **params})
+        self.assertEqual(response.status_code, 200)
+        return {dia['fecha']: dia for dia in response.data['dias']}
+
+    def test_resumen_por_dia_en_una_consulta(self):
+        self._vuelo('IB1', self.dia, 8, '120.00')
+        self._vuelo('IB2', self.dia, 20, '80.00', asientos=4)
+        self._vuelo('IB3', self.dia + timedelta(days=1), 23, '95.50')
+
+        registro.lista()  # el registro de aeropuertos ya cargado, como en un proceso en marcha
+        with self.assertNumQueries(1):
+            dias = self._calendario(fecha_desde=self.dia.isoformat(), fecha_hasta=(self.dia + timedelta(days=2)).isoformat())
+        self.assertEqual(list(dias), [(self.dia + timedelta(days=i)).isoformat() for i in range(3)])
+        self.assertEqual(dias[self.dia.isoformat()], {
+            'fecha': self.dia.isoformat(), 'precio_minimo': '80.00', 'asientos_disponibles': 14, 'vuelos': 2,
+        })
+        self.assertEqual(dias[(self.dia + timedelta(days=1)).isoformat()]['precio_minimo'], '95.50')
+        self.assertEqual(dias[(self.dia + timedelta(days=2)).isoformat()]['vuelos'], 0)
+        self.assertIsNone(dias[(self.dia + timedelta(days=2)).isoformat()]['precio_minimo'])
+
+    def test_se_mantiene_al_cambiar_los_vuelos(self):
+        barato = self._vuelo('IB1', self.dia, 8, '80.00', asientos=2)
+        self._vuelo('IB2', self.dia, 20, '120.00')
+        clave = self.dia.isoformat()
+
+        # Sin asientos, el vuelo no cuenta para el precio mínimo
+        retener_asientos(barato.id, 2)
+        self.assertEqual(self._calendario()[clave]['precio_minimo'], '120.00')
+        self.assertEqual(self._calendario()[clave]['asientos_disponibles'], 10)
+        liberar_asientos(barato.id, 1)
+        self.assertEqual(self._calendario()[clave]['precio_minimo'], '80.00')
+
+        # Un cambio de fecha mueve el vuelo de un día a otro
+        barato.refresh_from_db()
+        barato.fecha_salida += timedelta(days=1)
+        barato.save()
+        dias = self._calendario()
+        self.assertEqual(dias[clave]['vuelos'], 1)
+        self.assertEqual(dias[(self.dia + timedelta(days=1)).isoformat()]['precio_minimo'], '80.00')
+
+        barato.delete()
+        self.assertFalse(TarifaDiaria.objects.filter(fecha=self.dia + timedelta(days=1)).exists())
+
+    def test_recalcular_tarifas(self):
+        self._vuelo('IB1', self.dia, 8, '80.00')
+        Vuelo.objects.update(precio_base='60.00')  # update() no pasa por las señales
+        call_command('recalcular_tarifas', stdout=StringIO())
+        self.assertEqual(self._calendario()[self.dia.isoformat()]['precio_minimo'], '60.00')
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(Client().get('/api/vuelos/calendario/', {'origen': 'MAD'}).status_code, 400)
+        self.assertEqual(Client().get('/api/vuelos/calendario/', {'origen': 'MAD', 'destino': 'XXX'}).status_code, 400)
+        response = Client().get('/api/vuelos/calendario/', {
+            'origen': 'MAD', 'destino': 'BCN', 'fecha_hasta': (self.dia + timedelta(days=200)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class RepresentacionRapidaTest(TestCase):
+    """La serialización con values_list()/orjson produce los mismos bytes que VueloSerializer."""
+
+    def setUp(self):
+        registro.invalidar()
+        self.addCleanup(registro.invalidar)
+        self.origen = Aeropuerto.objects.create(
+            codigo='GRU', nombre='São Paulo–Guarulhos "Cumbica"', ciudad='São Paulo\u2028', pais='Brasil',
+        )
+        self.destino = Aeropuerto.objects.create(codigo='NRT', nombre='成田国際空港', ciudad='Tōkyō\t/\\', pais='日本')
+        aerolinea = Aerolinea.objects.create(codigo='LA', nombre='LATAM ✈\x01')
+        salida = timezone.now().replace(microsecond=123456) + timedelta(days=2)
+        casos = [
+            (timedelta(days=1, hours=2, minutes=3, seconds=4, microseconds=5), '1234.50', 7),
+            (timedelta(hours=23, minutes=59), '99999999.99', 1),
+            (timedelta(minutes=45), Decimal('0.1'), 200),
+        ]
+        for i, (duracion, precio, asientos) in enumerate(casos):
+            Vuelo.objects.create(
+                codigo_vuelo=f'LA{8000 + i}', aerolinea=aerolinea, origen=self.origen, destino=self.destino,
+                fecha_salida=salida + timedelta(hours=i), fecha_llegada=salida + timedelta(hours=i) + duracion,
+                duracion=duracion, asientos_disponibles=asientos, precio_base=precio,
+            )
+
+    def _original(self, datos):
+        return JSONRenderer().render(datos)
+
+    def test_mismos_bytes_que_el_serializer(self):
+        queryset = Vuelo.objects.order_by('id')
+        original = self._original(VueloSerializer(queryset.select_related('origen', 'destino', 'aerolinea'), many=True).data)
+        self.assertEqual(JSONRapidoRenderer().render(vuelos(filas(queryset))), original)
+        self.assertIn(b'\\u2028', original)
+
+    @override_settings(TIME_ZONE='America/Guayaquil')
+    def test_mismos_bytes_con_otra_zona_horaria(self):
+        vuelo = Vuelo.objects.order_by('id').first()
+        with timezone.override('America/Guayaquil'):
+            original = self._original(VueloSerializer(vuelo).data)
+            self.assertEqual(JSONRapidoRenderer().render(vuelos(filas(Vuelo.objects.filter(id=vuelo.id)))[0]), original)
+        self.assertIn(b'-05:00', original)
+
+    def test_vistas(self):
+        queryset = Vuelo.objects.order_by('fecha_salida', 'id').select_related('origen', 'destino', 'aerolinea')
+        esperado = VueloSerializer(queryset, many=True).data
+
+        response = Client().get('/api/vuelos/', {'origen': 'GRU', 'destino': 'NRT'})
+        self.assertEqual(response.content, self._original({'next': None, 'results': esperado}))
+        response = Client().get(f'/api/vuelos/{esperado[1]["id"]}/')
+        self.assertEqual(response.content, self._original(esperado[1]))
+        self.assertEqual(Client().get('/api/vuelos/999999/').status_code, 404)
+        # Con sangría (p. ej. la API navegable) se usa el renderer de DRF
+        response = Client().get('/api/vuelos/lote/', {'ids': esperado[0]['id']}, HTTP_ACCEPT='application/json; indent=2')
+        self.assertEqual(response.content, JSONRenderer().render([esperado[0]], 'application/json; indent=2'))
+
+
+class PeticionesCondicionalesTest(TestCase):
+    def setUp(self):
+        registro.invalidar()
+        self.addCleanup(registro.invalidar)
+        origen = Aeropuerto.objects.create(codigo='MAD', nombre='Barajas', ciudad='Madrid', pais='España')
+        destino = Aeropuerto.objects.create(codigo='BCN', nombre='El Prat', ciudad='Barcelona', pais='España')
+        aerolinea = Aerolinea.objects.create(codigo='IB', nombre='Iberia')
+        salida = timezone.now() + timedelta(days=3)
+        self.vuelo = Vuelo.objects.create(
+            codigo_vuelo='IB3000', aerolinea=aerolinea, origen=origen, destino=destino,
+            fecha_salida=salida, fecha_llegada=salida + timedelta(hours=1),
+            duracion=timedelta(hours=1), asientos_disponibles=100, precio_base='100.00',
+        )
+        self.url = f'/api/vuelos/{self.vuelo.id}/'
+
+    def test_detalle(self):
+        response = Client().get(self.url)
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertIn('Last-Modified', response)
+
+        # Solo se lee la versión del vuelo
+        with self.assertNumQueries(1):
+            response = Client().get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        response = Client().get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        # Retener asientos (un update()) también cambia la versión
+        retener_asientos(self.vuelo.id, 2)
+        response = Client().get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['asientos_disponibles'], 98)
+
+        self.assertEqual(Client().get('/api/vuelos/999999/', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_busqueda(self):
+        params = {'origen': 'MAD', 'destino': 'BCN'}
+        etag = Client().get('/api/vuelos/', params)['ETag']
+
+        # Acierto de caché: ni BD ni serialización
+        with self.assertNumQueries(0):
+            response = Client().get('/api/vuelos/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.vuelo.precio_base = '90.00'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vuelo.save()
+        response = Client().get('/api/vuelos/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['precio_base'], '90.00')
+
+    def test_aeropuertos(self):
+        etag = Client().get('/api/aeropuertos/')['ETag']
+        with self.assertNumQueries(0):
+            response = Client().get('/api/aeropuertos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(Client().get('/api/aeropuertos/', {'search': 'madrid'})['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Aeropuerto.objects.filter(codigo='BCN').update(nombre='Josep Tarradellas')
+            Aeropuerto.objects.get(codigo='BCN').save()
+        response = Client().get('/api/aeropuertos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class PaginacionCursorTest(TestCase):
+    def setUp(self):
+        registro.invalidar()
+        self.addCleanup(registro.invalidar)
+        caches[cache.CACHE_ALIAS].clear()
+        self.addCleanup(caches[cache.CACHE_ALIAS].clear)
+        origen = Aeropuerto.objects.create(codigo='MAD', nombre='Barajas', ciudad='Madrid', pais='España')
+        destino = Aeropuerto.objects.create(codigo='BCN', nombre='El Prat', ciudad='Barcelona', pais='España')
+        aerolinea = Aerolinea.objects.create(codigo='IB', nombre='Iberia')
+        base = (timezone.now() + timedelta(days=3)).replace(microsecond=0)
+        # Empates en fecha_salida y en precio_base: el desempate es el id
+        salidas_y_precios = [
+            (0, '100.00'), (0, '100.00'), (0, '90.00'), (1, '100.00'), (1, '100.00'),
+            (1, '100.00'), (2, '80.00'), (2, '100.00'), (3, '90.00'),
+        ]
+        self.vuelos = [
+            Vuelo.objects.create(
+                codigo_vuelo=f'IB{i:04d}', aerolinea=aerolinea, origen=origen, destino=destino,
+                fecha_salida=base + timedelta(hours=horas), fecha_llegada=base + timedelta(hours=horas + 1),
+                duracion=timedelta(hours=1), asientos_disponibles=100, precio_base=precio,
+            )
+            for i, (horas, precio) in enumerate(salidas_y_precios)
+        ]
+
+    def recorrer(self, **params):
+        ids, url, params = [], '/api/vuelos/', {'page_size': 2, **params}
+        while url:
+            response = Client().get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [vuelo['id'] for vuelo in response.data['results']]
+            # El enlace siguiente ya lleva todos los parámetros
+            url, params = response.data['next'], None
+        return ids
+
+    def test_recorrido_con_empates_devuelve_cada_vuelo_una_vez(self):
+        ordenaciones = {
+            None: lambda v: (v.fecha_salida, v.id),
+            'precio_base': lambda v: (Decimal(v.precio_base), v.id),
+            '-precio_base': lambda v: (-Decimal(v.precio_base), -v.id),
+            '-fecha_salida': lambda v: (-v.fecha_salida.timestamp(), -v.id),
+        }
+        for ordering, clave in ordenaciones.items():
+            with self.subTest(ordering=ordering):
+                ids = self.recorrer(**({'ordering': ordering} if ordering else {}))
+                self.assertEqual(ids, [v.id for v in sorted(self.vuelos, key=clave)])
+
+    def test_cursor_alterado_responde_400(self):
+        response = Client().get('/api/vuelos/', {'page_size': 2})
+        cursor = response.data['next'].split('cursor=')[1].split('&')[0]
+        datos = json.loads(base64.urlsafe_b64decode(unquote(cursor)))
+
+        def codificar(valor):
+            return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode()
+
+        alterados = {
+            'no es base64': '%%%',
+            'no es JSON': base64.urlsafe_b64encode(b'{roto').decode(),
+            'no es un objeto': codificar([1, 2]),
+            'otra ordenación': codificar({**datos, 'o': ['precio_base', 'id']}),
+            'fecha inválida': codificar({**datos, 'p': ['ayer', datos['p'][1]]}),
+            'id fuera de rango': codificar({**datos, 'p': [datos['p'][0], 2 ** 70]}),
+        }
+        for caso, alterado in alterados.items():
+            with self.subTest(caso):
+                response = Client().get('/api/vuelos/', {'page_size': 2, 'cursor': alterado})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['detail'], 'Cursor inválido')
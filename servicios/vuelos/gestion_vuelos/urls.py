@@ -1,8 +1,19 @@
 from django.urls import path
-from .views import BusquedaVuelosView, VueloDetailView, AeropuertoListView
+from .views import (
+    BusquedaVuelosView, VueloDetailView, VuelosLoteView, AeropuertoListView, EstadisticasCacheView,
+    AsientosDisponiblesView, RetencionAsientosView, LiberacionAsientosView, ConexionesView,
+    CalendarioTarifasView,
+)
 
 urlpatterns = [
     path('vuelos/', BusquedaVuelosView.as_view(), name='busqueda-vuelos'),
+    path('vuelos/lote/', VuelosLoteView.as_view(), name='lote-vuelos'),
+    path('vuelos/conexiones/', ConexionesView.as_view(), name='conexiones-vuelos'),
+    path('vuelos/calendario/', CalendarioTarifasView.as_view(), name='calendario-tarifas'),
     path('vuelos/<int:id>/', VueloDetailView.as_view(), name='detalle-vuelo'),
+    path('vuelos/<int:id>/asientos/', AsientosDisponiblesView.as_view(), name='asientos-vuelo'),
+    path('vuelos/<int:id>/asientos/retener/', RetencionAsientosView.as_view(), name='retener-asientos'),
+    path('vuelos/<int:id>/asientos/liberar/', LiberacionAsientosView.as_view(), name='liberar-asientos'),
     path('aeropuertos/', AeropuertoListView.as_view(), name='lista-aeropuertos'),
+    path('estadisticas/cache/', EstadisticasCacheView.as_view(), name='estadisticas-cache'),
 ]
\ No newline at end of file
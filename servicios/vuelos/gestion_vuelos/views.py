@@ -1,41 +1,58 @@
 from rest_framework import generics, filters, status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Vuelo, Aeropuerto
-from .serializers import VueloSerializer, AeropuertoSerializer
+from compartido.paginacion import KeysetPagination
+from .models import Vuelo, Aeropuerto, TarifaDiaria
+from .serializers import VueloSerializer, AeropuertoSerializer, AsientosSerializer
+from .permissions import EsServicioInterno
+from .inventario import retener_asientos, liberar_asientos
+from .registro import registro
+from .fechas import rango_busqueda, parsear_fecha
+from .conexiones import grafo
+from . import cache, condicional, representacion
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from datetime import datetime
+
+# Vistas que devuelven vuelos: JSON con orjson (ver gestion_vuelos.representacion)
+RENDERERS_VUELOS = [representacion.JSONRapidoRenderer, BrowsableAPIRenderer]
 
 class BusquedaVuelosView(generics.ListAPIView):
     serializer_class = VueloSerializer
+    renderer_classes = RENDERERS_VUELOS
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['fecha_salida', 'precio_base']
+    ordering = ['fecha_salida', 'id']
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
+        params = self.request.query_params
+        ahora = timezone.now()
+
+        # Rango semiabierto sobre fecha_salida (ver gestion_vuelos.fechas)
+        desde, hasta = rango_busqueda(params)
         queryset = Vuelo.objects.filter(
-            fecha_salida__gte=timezone.now(),
+            fecha_salida__gte=max(desde, ahora) if desde else ahora,
             asientos_disponibles__gt=0
         ).select_related('origen', 'destino', 'aerolinea')
-        
-        # Filtro por código de aeropuerto de origen
-        origen_code = self.request.query_params.get('origen')
+        if hasta:
+            queryset = queryset.filter(fecha_salida__lt=hasta)
+
+        # Filtros por aeropuerto sobre las FK, usando los ids del registro: así
+        # origen_id, destino_id y fecha_salida forman un rango del índice compuesto
+        origen_code = params.get('origen')
         if origen_code:
-            queryset = queryset.filter(origen__codigo=origen_code)
-        
-        # Filtro por código de aeropuerto de destino
-        destino_code = self.request.query_params.get('destino')
+            queryset = queryset.filter(origen_id=registro.id(origen_code))
+
+        destino_code = params.get('destino')
         if destino_code:
-            queryset = queryset.filter(destino__codigo=destino_code)
-        
-        # Filtro por fecha
-        fecha = self.request.query_params.get('fecha')
-        if fecha:
-            try:
-                fecha_obj = datetime.strptime(fecha, '%Y-%m-%d').date()
-                queryset = queryset.filter(fecha_salida__date=fecha_obj)
-            except ValueError:
-                pass
-        
+            queryset = queryset.filter(destino_id=registro.id(destino_code))
+
         return queryset
 
     def list(self, request, *args, **kwargs):
@@ -44,33 +61,274 @@ class BusquedaVuelosView(generics.ListAPIView):
             origen_code = request.query_params.get('origen')
             destino_code = request.query_params.get('destino')
             
-            if origen_code and not Aeropuerto.objects.filter(codigo=origen_code).exists():
+            if origen_code and not registro.existe(origen_code):
                 return Response(
                     {"error": f"Código de aeropuerto de origen '{origen_code}' no válido"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
                 
-            if destino_code and not Aeropuerto.objects.filter(codigo=destino_code).exists():
+            if destino_code and not registro.existe(destino_code):
                 return Response(
                     {"error": f"Código de aeropuerto de destino '{destino_code}' no válido"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            return super().list(request, *args, **kwargs)
-            
+            # Resultados cacheados por parámetros normalizados (ver gestion_vuelos.cache),
+            # junto con su ETag (ver gestion_vuelos.condicional)
+            clave = cache.clave(cache.normalizar(request.query_params))
+            entrada = cache.obtener(clave)
+            if entrada is None:
+                # Filas de values_list() en lugar de instancias + VueloSerializer (misma salida)
+                filas = representacion.filas(self.filter_queryset(self.get_queryset()), 'actualizado')
+                pagina = self.paginate_queryset(filas)
+                response = self.get_paginated_response(representacion.vuelos(pagina))
+                entrada = (condicional.etag_vuelos(pagina, response.data['next']), response.data)
+                cache.guardar(clave, entrada)
+
+            etag, datos = entrada
+            return condicional.no_modificado(request, etag) or condicional.marcar(Response(datos), etag)
+
+        except APIException:
+            raise
         except Exception as e:
             return Response(
                 {"error": "Error procesando la solicitud", "details": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class ConexionesView(APIView):
+    """
+    Itinerarios directos y con escalas, ordenados por hora de llegada:
+    ``GET vuelos/conexiones/?origen=BCN&destino=EZE&fecha=2025-10-01``.
+
+    Acepta las mismas fechas que la búsqueda (``fecha`` + ``flexibilidad``,
+    ``fecha_desde``/``fecha_hasta``; por defecto las próximas 24 horas) para la
+    salida del primer vuelo, ``escalas`` (0 a 2), ``pasajeros`` y ``limite``.
+    """
+    MAX_ESCALAS = 2
+    MAX_LIMITE = 50
+    renderer_classes = RENDERERS_VUELOS
+
+    @staticmethod
+    def _entero(valor, defecto, minimo, maximo):
+        try:
+            return min(max(int(valor), minimo), maximo)
+        except (TypeError, ValueError):
+            return defecto
+
+    def get(self, request):
+        params = request.query_params
+        origen_code, destino_code = params.get('origen'), params.get('destino')
+        if not origen_code or not destino_code:
+            return Response(
+                {"error": "Los parámetros 'origen' y 'destino' son obligatorios"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        for campo, codigo in (('origen', origen_code), ('destino', destino_code)):
+            if not registro.existe(codigo):
+                return Response(
+                    {"error": f"Código de aeropuerto de {campo} '{codigo}' no válido"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        ahora = timezone.now()
+        desde, hasta = rango_busqueda(params)
+        desde = max(desde, ahora) if desde else ahora
+        hasta = hasta or desde + timedelta(days=1)
+        pasajeros = self._entero(params.get('pasajeros'), 1, 1, 100)
+        itinerarios = grafo.buscar(
+            registro.id(origen_code), registro.id(destino_code), desde, hasta,
+            escalas=self._entero(params.get('escalas'), self.MAX_ESCALAS, 0, self.MAX_ESCALAS),
+            pasajeros=pasajeros,
+            limite=self._entero(params.get('limite'), 20, 1, self.MAX_LIMITE),
+        )
+
+        # Los datos completos de todos los vuelos implicados, en una consulta
+        ids = {tramo.id for itinerario in itinerarios for tramo in itinerario}
+        filas = representacion.filas(Vuelo.objects.filter(id__in=ids))
+        por_id = {fila.id: representacion.vuelo(fila) for fila in filas}
+
+        resultados = []
+        for itinerario in itinerarios:
+            # Un vuelo borrado desde la última actualización del grafo descarta el itinerario
+            if any(tramo.id not in por_id for tramo in itinerario):
+                continue
+            resultados.append({
+                'escalas': len(itinerario) - 1,
+                'duracion_minutos': round((itinerario[-1].llegada - itinerario[0].salida) / 60),
+                'precio_total': str(sum((Decimal(tramo.precio) for tramo in itinerario), Decimal(0)) * pasajeros),
+                'vuelos': [por_id[tramo.id] for tramo in itinerario],
+            })
+        return Response({'itinerarios': resultados})
+
+class CalendarioTarifasView(APIView):
+    """
+    Precio mínimo y asientos libres por día de una ruta:
+    ``GET vuelos/calendario/?origen=MAD&destino=BCN&fecha_desde=2025-10-01&fecha_hasta=2025-10-31``.
+
+    Se lee de ``TarifaDiaria`` en una sola consulta. Por defecto, los próximos
+    31 días; se devuelven todos los días del rango, también los que no tienen vuelos.
+    """
+    MAX_DIAS = 92
+
+    def get(self, request):
+        params = request.query_params
+        origen_code, destino_code = params.get('origen'), params.get('destino')
+        if not origen_code or not destino_code:
+            return Response(
+                {"error": "Los parámetros 'origen' y 'destino' son obligatorios"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        for campo, codigo in (('origen', origen_code), ('destino', destino_code)):
+            if not registro.existe(codigo):
+                return Response(
+                    {"error": f"Código de aeropuerto de {campo} '{codigo}' no válido"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        hoy = timezone.localdate()
+        desde = max(parsear_fecha(params.get('fecha_desde')) or hoy, hoy)
+        hasta = parsear_fecha(params.get('fecha_hasta')) or desde + timedelta(days=30)
+        if (hasta - desde).days >= self.MAX_DIAS:
+            return Response(
+                {"error": f"Como máximo {self.MAX_DIAS} días por calendario"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filas = TarifaDiaria.objects.filter(
+            origen_id=registro.id(origen_code), destino_id=registro.id(destino_code),
+            fecha__gte=desde, fecha__lte=hasta,
+        ).values_list('fecha', 'precio_minimo', 'asientos', 'vuelos')
+        por_fecha = {fila[0]: fila for fila in filas}
+
+        dias = []
+        for i in range((hasta - desde).days + 1):
+            fecha = desde + timedelta(days=i)
+            _, precio, asientos, vuelos = por_fecha.get(fecha, (fecha, None, 0, 0))
+            dias.append({
+                'fecha': fecha.isoformat(),
+                'precio_minimo': None if precio is None else str(precio),
+                'asientos_disponibles': asientos,
+                'vuelos': vuelos,
+            })
+        return Response({'origen': origen_code, 'destino': destino_code, 'dias': dias})
+
 class VueloDetailView(generics.RetrieveAPIView):
     queryset = Vuelo.objects.all()
     serializer_class = VueloSerializer
+    renderer_classes = RENDERERS_VUELOS
     lookup_field = 'id'
 
+    def retrieve(self, request, *args, **kwargs):
+        vuelo = self.get_queryset().filter(id=kwargs['id'])
+        if condicional.es_condicional(request):
+            # Solo la versión: si el cliente ya la tiene, ni joins ni serialización
+            actualizado = vuelo.values_list('actualizado', flat=True).first()
+            if actualizado is not None:
+                response = condicional.no_modificado(
+                    request, condicional.etag_vuelo(kwargs['id'], actualizado), actualizado
+                )
+                if response is not None:
+                    return response
+
+        fila = get_object_or_404(representacion.filas(vuelo, 'actualizado'))
+        return condicional.marcar(
+            Response(representacion.vuelo(fila)), condicional.etag_vuelo(fila.id, fila.actualizado), fila.actualizado
+        )
+
+class VuelosLoteView(APIView):
+    """Varios vuelos en una sola petición: ``GET vuelos/lote/?ids=1,2,3``."""
+    MAX_IDS = 200
+    renderer_classes = RENDERERS_VUELOS
+
+    def get(self, request):
+        # Un id fuera del rango de la columna haría fallar la consulta (OverflowError)
+        _, maximo = connection.ops.integer_field_range(Vuelo._meta.pk.get_internal_type())
+        try:
+            ids = list(dict.fromkeys(
+                int(valor) for valor in request.query_params.get('ids', '').split(',') if valor.strip()
+            ))
+            if any(vuelo_id < 1 or (maximo is not None and vuelo_id > maximo) for vuelo_id in ids):
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": "El parámetro 'ids' debe ser una lista de enteros positivos separados por comas"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > self.MAX_IDS:
+            return Response(
+                {"error": f"Como máximo {self.MAX_IDS} vuelos por petición"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        por_id = {fila.id: fila for fila in representacion.filas(Vuelo.objects.filter(id__in=ids))}
+        # Mismo orden que los ids pedidos; los que no existen se omiten
+        encontrados = [por_id[vuelo_id] for vuelo_id in ids if vuelo_id in por_id]
+        return Response(representacion.vuelos(encontrados))
+
+class AsientosDisponiblesView(APIView):
+    """Solo el contador de asientos: lo que cambia de un vuelo entre dos consultas."""
+
+    def get(self, request, id):
+        asientos = Vuelo.objects.filter(pk=id).values_list('asientos_disponibles', flat=True).first()
+        if asientos is None:
+            return Response({'error': 'Vuelo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'id': id, 'asientos_disponibles': asientos})
+
+class RetencionAsientosView(APIView):
+    """Retiene asientos de un vuelo para una reserva (uso interno de reservas)."""
+    permission_classes = [EsServicioInterno]
+
+    def post(self, request, id):
+        serializer = AsientosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        asientos = serializer.validated_data['asientos']
+
+        if retener_asientos(id, asientos):
+            return Response({'vuelo_id': id, 'asientos': asientos})
+        if not Vuelo.objects.filter(pk=id).exists():
+            return Response({'error': 'Vuelo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(
+            {'error': 'No hay suficientes asientos disponibles'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+class LiberacionAsientosView(APIView):
+    """Devuelve al vuelo los asientos de una reserva cancelada (uso interno)."""
+    permission_classes = [EsServicioInterno]
+
+    def post(self, request, id):
+        serializer = AsientosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        asientos = serializer.validated_data['asientos']
+
+        if liberar_asientos(id, asientos):
+            return Response({'vuelo_id': id, 'asientos': asientos})
+        return Response({'error': 'Vuelo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+class EstadisticasCacheView(APIView):
+    def get(self, request):
+        return Response({'busqueda_vuelos': cache.estadisticas.snapshot()})
+
 class AeropuertoListView(generics.ListAPIView):
     queryset = Aeropuerto.objects.all()
     serializer_class = AeropuertoSerializer
     filter_backends = [filters.SearchFilter]
-    search_fields = ['codigo', 'nombre', 'ciudad', 'pais']
\ No newline at end of file
+    search_fields = ['codigo', 'nombre', 'ciudad', 'pais']
+
+    def list(self, request, *args, **kwargs):
+        # Se sirve desde el registro en memoria, sin consultar la BD.
+        # Misma semántica que SearchFilter: cada término debe aparecer en algún campo.
+        terminos = [t.lower() for t in filters.SearchFilter().get_search_terms(request)]
+        etag = condicional.etag(registro.version(), *terminos)
+        response = condicional.no_modificado(request, etag)
+        if response is not None:
+            return response
+
+        filas = registro.lista()
+        if terminos:
+            filas = [
+                fila for fila in filas
+                if all(any(t in fila[campo].lower() for campo in self.search_fields) for t in terminos)
+            ]
+        return condicional.marcar(Response(filas), etag)
\ No newline at end of file
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from compartido.basedatos import configuracion
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,7 +55,9 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    'compartido.trazas.TrazasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'compartido.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,14 +95,52 @@ WSGI_APPLICATION = 'vuelos.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil elegido con DB_PERFIL: sqlite (WAL, por defecto) o postgres (con pool).
+# Ver compartido.basedatos
 DATABASES = {
+    'default': configuracion(BASE_DIR, 'vuelos'),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Resultados de BusquedaVuelosView: LRU con TTL corto, invalidado por ruta y fecha
+    'busqueda_vuelos': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'busqueda-vuelos',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
 }
 
 
+# Token compartido con los demás servicios para los endpoints internos
+# (retención y liberación de asientos). Debe coincidir con el de reservas.
+TOKEN_SERVICIOS_INTERNOS = 'TokenServiciosInternos123'
+
+# Segundos tras los que cada proceso recarga su registro de aeropuertos
+# (los cambios hechos en el mismo proceso se aplican al instante)
+AEROPUERTOS_REFRESCO_SEGUNDOS = 300
+
+# Búsqueda de vuelos con escalas (ver gestion_vuelos.conexiones). Tiempo mínimo
+# de conexión, por defecto y por aeropuerto, recargo si se cambia de aerolínea
+# y espera máxima entre dos vuelos. El grafo en memoria se recarga entero cada
+# CONEXIONES_REFRESCO_SEGUNDOS para recoger cambios de otros procesos.
+CONEXIONES_MINIMO_MINUTOS = 45
+CONEXIONES_MINIMO_POR_AEROPUERTO = {}
+CONEXIONES_CAMBIO_AEROLINEA_MINUTOS = 30
+CONEXIONES_ESPERA_MAXIMA_HORAS = 24
+CONEXIONES_REFRESCO_SEGUNDOS = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -138,3 +181,14 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Trazas distribuidas (ver compartido.trazas). El contexto (cabecera traceparent)
+# se propaga siempre; los spans solo se registran si hay ARCHIVO (JSONL) o
+# COLECTOR (URL que recibe lotes por POST). MUESTREO solo se aplica a las
+# peticiones que no llegan a través del gateway.
+TRAZAS = {
+    'SERVICIO': 'vuelos',
+    'MUESTREO': float(os.environ.get('TRAZAS_MUESTREO', '1.0')),
+    'ARCHIVO': os.environ.get('TRAZAS_ARCHIVO'),
+    'COLECTOR': os.environ.get('TRAZAS_COLECTOR'),
+}
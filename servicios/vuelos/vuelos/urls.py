@@ -17,7 +17,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from compartido.metricas import vista_metricas
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', vista_metricas, name='metricas'),
     path('api/', include('gestion_vuelos.urls')),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vuelos.settings')
 
 application = get_wsgi_application()
+
+# Aeropuertos en memoria antes de la primera petición (ver gestion_vuelos.registro)
+from gestion_vuelos.registro import registro  # noqa: E402
+
+registro.precargar()